@@ -2,52 +2,92 @@
 
 The script expects ``show_id`` to be provided as a query parameter.  The
 configured tile for the show is looked up and the next episode is selected
-according to the global configuration.
+according to the global configuration; a channel tile (see
+:mod:`one_tap.channel`) plays its member shows in turn.  An optional
+``tap_id`` parameter correlates the latency spans of this press across
+processes.
+
+Every tap starts a fresh interpreter, so only the modules a tap needs are
+imported at the top.  In random mode, while the randomizer service runs,
+the episode it queued is opened without listing the share or reading the
+playback database: the service records the play once it starts.  The
+listing, selection and database modules are imported only when that fast
+path does not apply.
 """
 from __future__ import annotations
 
-import os
+import json
 import sys
+import time
 import urllib.parse
-from typing import Dict, List
+from typing import Dict, Sequence
 
-from one_tap import config, db, selection
+from one_tap import (
+    config,
+    eventtrace,
+    jsonrpc,
+    locks,
+    playback,
+    random_state,
+    shares,
+    tracing,
+)
+from one_tap import logging as one_tap_logging
 from one_tap.logging import get_logger
 
 try:  # pragma: no cover - depends on Kodi
     import xbmc  # type: ignore
-    import xbmcvfs  # type: ignore
+    import xbmcgui  # type: ignore
 except ImportError:  # pragma: no cover - desktop/dev
     xbmc = None  # type: ignore
-    xbmcvfs = None  # type: ignore
+    xbmcgui = None  # type: ignore
+
+# Home window properties handing the tap id to the randomizer service, which
+# receives ``onPlayBackStarted`` for the episode opened here.
+TAP_ID_PROPERTY = "one_tap.tap_id"
+TAP_STARTED_PROPERTY = "one_tap.tap_started"
+# Set by the randomizer service while it records plays handed over in
+# PENDING_PLAY_PROPERTY and publishes RESUME_PROPERTY for every show.
+SERVICE_READY_PROPERTY = "one_tap.service_ready"
+PENDING_PLAY_PROPERTY = "one_tap.pending_play"
+RESUME_PROPERTY = "one_tap.resume"
+# The channel tile being played, for the service to continue on auto-advance.
+CHANNEL_PROPERTY = "one_tap.channel"
+# Repeated presses of the same tile within this many seconds are dropped.
+TAP_DEBOUNCE_SECONDS = 10.0
 
 logger = get_logger("plugin.one_tap.play")
 
 
-def _list_episodes(path: str) -> List[str]:
+def _list_episodes(path: str) -> Sequence[str]:
     """Return a sorted list of episode files within ``path``."""
 
-    exts = {".mkv", ".mp4", ".avi"}
-    if xbmcvfs:
-        dirs, files = xbmcvfs.listdir(path)
-        episodes = [os.path.join(path, f) for f in files if os.path.splitext(f)[1].lower() in exts]
-    else:
-        episodes = [os.path.join(path, f) for f in os.listdir(path) if os.path.splitext(f)[1].lower() in exts]
-    episodes.sort()
-    return episodes
+    from one_tap import catalog
+
+    return catalog.episodes(path)
 
 
 def _get_params() -> Dict[str, str]:
-    if len(sys.argv) < 3:
-        return {}
-    qs = sys.argv[2][1:]
-    return {k: v[0] for k, v in urllib.parse.parse_qs(qs).items()}
+    """Parse ``RunScript`` arguments or a plugin URL query string."""
+
+    params: Dict[str, str] = {}
+    for arg in sys.argv[1:]:
+        qs = arg[1:] if arg.startswith("?") else arg
+        params.update({k: v[0] for k, v in urllib.parse.parse_qs(qs).items()})
+    return params
+
+
+def _publish_tap(tap_id: str, started: float) -> None:
+    if xbmcgui:  # pragma: no cover - depends on Kodi
+        window = xbmcgui.Window(10000)
+        window.setProperty(TAP_ID_PROPERTY, tap_id)
+        window.setProperty(TAP_STARTED_PROPERTY, repr(started))
 
 
 class AutoAdvancePlayer(xbmc.Player if xbmc else object):
     """Player that auto-advances episodes and tracks failures."""
 
-    def __init__(self, show_id: str, episodes: List[str], cfg: dict) -> None:
+    def __init__(self, show_id: str, episodes: Sequence[str], cfg: dict) -> None:
         if xbmc:
             super().__init__()
         self.show_id = show_id
@@ -64,6 +104,8 @@ class AutoAdvancePlayer(xbmc.Player if xbmc else object):
             self.active = False
             return
 
+        from one_tap import selection
+
         candidates = selection.episode_candidates(
             self.show_id, self.episodes, self.cfg.get("mode", "order"), self.cfg.get("random", {})
         )
@@ -73,6 +115,7 @@ class AutoAdvancePlayer(xbmc.Player if xbmc else object):
             try:
                 logger.info("Attempting to play %s", episode)
                 self.pending = episode
+                playback.opening(episode)
                 super().play(episode)
             except Exception as exc:  # pragma: no cover - runtime only
                 logger.error("Playback start failed for %s: %s", episode, exc)
@@ -85,21 +128,43 @@ class AutoAdvancePlayer(xbmc.Player if xbmc else object):
         self.active = False
         xbmc.executebuiltin("ActivateWindow(Home)")
 
-    # Player callbacks
+    # Player callbacks.  The randomizer service sees the same events, so each
+    # one is acted upon only if the shared state machine accepts it here.
+    def _playing_file(self) -> str | None:  # pragma: no cover - depends on Kodi
+        try:
+            return self.getPlayingFile()
+        except RuntimeError:
+            return self.pending
+
     def onPlayBackStarted(self) -> None:  # pragma: no cover - depends on Kodi
-        if self.pending:
+        eventtrace.record("plugin", "started", self.pending)
+        current = self._playing_file()
+        playback.transition(playback.STARTED, current)
+        # The service may have started something else after an advance.
+        if self.pending and current == self.pending:
+            from one_tap import db
+
             db.update_history(self.show_id, self.pending)
             self.failure_count = 0
             logger.info("Playing %s", self.pending)
+
     def onPlayBackEnded(self) -> None:  # pragma: no cover - depends on Kodi
+        eventtrace.record("plugin", "ended", self.pending)
+        if not playback.transition(playback.ENDED, self.pending):
+            return
         logger.info("Playback ended; advancing")
         self.play_next()
 
     def onPlayBackStopped(self) -> None:  # pragma: no cover - depends on Kodi
+        eventtrace.record("plugin", "stopped", self.pending)
+        playback.transition(playback.STOPPED, self.pending)
         logger.info("Playback stopped by user")
         self.active = False
 
     def onPlayBackError(self) -> None:  # pragma: no cover - depends on Kodi
+        eventtrace.record("plugin", "error", self.pending)
+        if not playback.transition(playback.ERROR, self.pending):
+            return
         logger.error("Playback error encountered")
         self.failure_count += 1
         self.pending = None
@@ -109,47 +174,281 @@ class AutoAdvancePlayer(xbmc.Player if xbmc else object):
         else:
             self.play_next()
 
+
 def main() -> None:
+    started = time.time()
     params = _get_params()
     show_id = params.get("show_id")
     if not show_id:
         logger.error("show_id parameter required")
         return
+    tap_id = params.get("tap_id") or tracing.new_tap_id()
+    tracing.set_tap_id(tap_id)
 
-    cfg = config.load_config()
+    with tracing.span("config_load"):
+        cfg = config.load_config()
+    one_tap_logging.configure(cfg)
+    eventtrace.configure(cfg)
+    shares.configure(cfg)
+    # The skin taps through RunScript; the service advances through RunPlugin.
+    advance = sys.argv[0].startswith("plugin://")
+    if not advance:
+        window = float(cfg.get("ui", {}).get("tap_debounce_seconds", TAP_DEBOUNCE_SECONDS))
+        if window > 0 and not locks.claim(f"tap:{show_id}", window):
+            eventtrace.record("plugin", "tap_ignored", show_id)
+            logger.info("Ignoring repeated tap for %s", show_id)
+            return
+    eventtrace.record("plugin", "advance" if advance else "tap", show_id)
     tile = next((t for t in cfg.get("tiles", []) if t.get("show_id") == show_id), None)
     if not tile:
         logger.error("show_id %s not found in config", show_id)
         return
 
-    episodes = _list_episodes(tile["path"])
+    if not advance:
+        from one_tap import budget
+
+        if budget.current():
+            budget.clear()  # a new tap ends the planned sequence
+    if tile.get("channel"):
+        _play_channel(show_id, tile, cfg, tap_id, started)
+        return
+    if not advance and _property(CHANNEL_PROPERTY):
+        xbmcgui.Window(10000).clearProperty(CHANNEL_PROPERTY)
+    if _play_preselected(show_id, tile, cfg, tap_id, started, advance):
+        return
+    _play_selected(show_id, tile, cfg, tap_id, started, advance)
+
+
+def _property(name: str) -> str:
+    if not xbmcgui:
+        return ""
+    return xbmcgui.Window(10000).getProperty(name)
+
+
+def _play_preselected(
+    show_id: str, tile: dict, cfg: dict, tap_id: str, started: float, advance: bool
+) -> bool:
+    """Open the episode the service queued for ``show_id``; return whether it did.
+
+    Only the queue head is trusted here: it was picked from the stored
+    listing and the history by the service, which also records the play.
+    """
+
+    if cfg.get("mode", "order") != "random" or _property(SERVICE_READY_PROPERTY) != "1":
+        return False
+    if not advance and tile.get("budget", cfg.get("budget")):
+        return False  # the sequence is planned from the stored durations
+    if advance:
+        from one_tap import budget
+
+        if budget.next_episode(show_id):
+            return False
+    resume_enabled = cfg.get("resume", {}).get("enabled", True)
+    if not advance and resume_enabled and _property(f"{RESUME_PROPERTY}.{show_id}"):
+        return False  # the stopped episode is looked up in the database
+    if not shares.available(tile["path"]):
+        return False
+    # Taken off the queue at once, so a refill by the service cannot race it.
+    episode = random_state.pop_first(show_id)
+    if not episode:
+        return False
+    target = episode
+    if cfg.get("cache", {}).get("enabled", False):
+        from one_tap import media_cache
+
+        target = media_cache.local_path(episode) or episode
+    _publish_tap(tap_id, started)
+    history_limit = cfg.get("history", {}).get("max", 0)
+    window = xbmcgui.Window(10000)
+    window.setProperty(
+        PENDING_PLAY_PROPERTY, json.dumps([show_id, episode, target, history_limit])
+    )
+    logger.info("Attempting to play preselected %s", episode)
+    playback.opening(target)
+    try:
+        with tracing.span("play_file"):
+            result = jsonrpc.play_file(target, resume=0.0)
+    except Exception as exc:  # pragma: no cover - runtime
+        logger.error("JSON-RPC failed for %s: %s", episode, exc)
+        result = {"error": str(exc)}
+    if result.get("error"):
+        window.clearProperty(PENDING_PLAY_PROPERTY)
+        logger.error("Kodi reported error for %s: %s", episode, result["error"])
+        from one_tap import db
+
+        db.record_failure(show_id, episode)
+        return False
+    if target != episode:
+        media_cache.touch(episode)
+    eventtrace.record("plugin", "preselected", episode)
+    logger.info("Playing %s", episode)
+    return True
+
+
+def _play_channel(show_id: str, tile: dict, cfg: dict, tap_id: str, started: float) -> None:
+    """Open the next episode of channel ``tile`` that starts."""
+
+    from one_tap import channel, db, media_cache
+
+    if xbmcgui:
+        xbmcgui.Window(10000).setProperty(CHANNEL_PROPERTY, show_id)
+    with tracing.span("episode_candidates"):
+        upcoming = channel.sequence(tile, cfg, available=shares.available)
+    _publish_tap(tap_id, started)
+    history_limit = cfg.get("history", {}).get("max", db.DEFAULT_MAX_HISTORY)
+    use_cache = cfg.get("cache", {}).get("enabled", False)
+    attempts = 0
+    for member_id, episode in upcoming:
+        if attempts >= 3:
+            break
+        attempts += 1
+        logger.info("Attempting to play %s", episode)
+        target = (media_cache.local_path(episode) if use_cache else None) or episode
+        playback.opening(target)
+        try:
+            with tracing.span("play_file"):
+                result = jsonrpc.play_file(target, resume=0.0)
+        except Exception as exc:  # pragma: no cover - runtime
+            logger.error("JSON-RPC failed for %s: %s", episode, exc)
+            continue
+        if result.get("error"):
+            logger.error("Kodi reported error for %s: %s", episode, result["error"])
+            db.record_failure(member_id, episode)
+            continue
+        # The member show's own ordered position moves on as well.
+        db.update_history(member_id, episode, max_history=history_limit)
+        channel.played(tile, cfg, member_id)
+        if target != episode:
+            media_cache.touch(episode)
+        logger.info("Playing %s", episode)
+        return
+
+    logger.error("Failed to start channel %s after %d attempts", show_id, attempts)
+    shares.publish_properties(cfg.get("tiles", []))
+
+
+def _play_selected(
+    show_id: str, tile: dict, cfg: dict, tap_id: str, started: float, advance: bool
+) -> None:
+    """List the tile, select candidates and open the first that starts."""
+
+    from one_tap import budget, catalog, db, media_cache, selection
+
+    with tracing.span("episode_listing"):
+        episodes = _list_episodes(tile["path"])
     if not episodes:
         logger.error("No episodes found for %s", tile["path"])
+        shares.publish_properties(cfg.get("tiles", []))
         return
 
-    candidates = selection.episode_candidates(
-        show_id, episodes, cfg.get("mode", "order"), cfg.get("random", {})
-    )
+    with tracing.span("episode_candidates"):
+        candidates = selection.episode_candidates(
+            show_id, episodes, cfg.get("mode", "order"), cfg.get("random", {})
+        )
+    # Random picks queued by the service come first so the episode it
+    # prefetched or cached is the one that plays.
+    preselected = None
+    if cfg.get("mode", "order") == "random":
+        for queued in random_state.get(show_id):
+            if queued in candidates:
+                preselected = queued
+                candidates = candidates.promote(queued)
+                break
+            random_state.consume_first(show_id, queued)
+    # A tap (not an advance) continues an episode that was stopped midway.
+    resumed = None
+    if not advance and cfg.get("resume", {}).get("enabled", True):
+        resumed = db.get_resume(show_id)
+        if resumed and resumed[0] in episodes:
+            candidates = candidates.promote(resumed[0])
+        else:
+            resumed = None
+    # A tile with a time budget plays the episodes that fit its window; the
+    # service advances through the rest of them.
+    plan = None
+    planned = None
+    seconds = None
+    if not advance:
+        seconds = budget.seconds_for(tile.get("budget", cfg.get("budget")), started)
+        if seconds:
+            plan = selection.fit_budget(
+                candidates,
+                catalog.durations(tile["path"]),
+                seconds,
+                contiguous=cfg.get("mode", "order") == "order",
+            )
+            if plan:
+                candidates = plan
+    else:
+        planned = budget.next_episode(show_id)
+        if planned and planned in candidates:
+            candidates = candidates.promote(planned)
+    # Opening files on a share that is known to be down would block; only
+    # episodes copied to the local media cache are tried then.
+    offline = not shares.available(tile["path"])
+    if offline:
+        local = [c for c in catalog.local_sources(tile["path"]) if c in candidates]
+        candidates = sorted(local, key=candidates.index)
+        if not candidates:
+            eventtrace.record("plugin", "share_offline", show_id)
+            logger.error("Share of %s is unavailable and nothing is cached", tile["path"])
+            shares.publish_properties(cfg.get("tiles", []))
+            return
+    _publish_tap(tap_id, started)
     history_limit = cfg.get("history", {}).get("max", db.DEFAULT_MAX_HISTORY)
+    use_cache = offline or cfg.get("cache", {}).get("enabled", False)
     attempts = 0
     for episode in candidates:
         if attempts >= 3:
             break
         attempts += 1
+        offset = resumed[1] if resumed and episode == resumed[0] else 0.0
         logger.info("Attempting to play %s", episode)
+        target = (media_cache.local_path(episode) if use_cache else None) or episode
+        playback.opening(target)
         try:
-            result = jsonrpc.play_file(episode)
+            with tracing.span("play_file"):
+                result = jsonrpc.play_file(target, resume=offset)
         except Exception as exc:  # pragma: no cover - runtime
             logger.error("JSON-RPC failed for %s: %s", episode, exc)
             continue
         if result.get("error"):
             logger.error("Kodi reported error for %s: %s", episode, result["error"])
+            db.record_failure(show_id, episode)
             continue
-        db.update_history(show_id, episode, max_history=history_limit)
+        if not offset:
+            # A resumed episode is already the latest history entry.
+            db.update_history(show_id, episode, max_history=history_limit)
+        if episode == preselected:
+            random_state.consume_first(show_id, episode)
+        if plan:
+            budget.start(show_id, plan[plan.index(episode) + 1:], started + seconds)
+        elif episode == planned:
+            budget.consume(episode)
+        if target != episode:
+            media_cache.touch(episode)
         logger.info("Playing %s", episode)
         return
 
     logger.error("Failed to start playback after %d attempts", attempts)
 
-if __name__ == "__main__":
+
+def _run() -> None:
+    """Run :func:`main`, under the profiler when enabled in the settings."""
+
+    if xbmc:  # pragma: no cover - depends on Kodi
+        import xbmcaddon  # type: ignore
+
+        addon = xbmcaddon.Addon()
+        if addon.getSetting("profile_enabled") == "true":
+            from one_tap import profiling
+
+            keep = int(addon.getSetting("profile_keep") or profiling.DEFAULT_KEEP)
+            trace_memory = addon.getSetting("profile_tracemalloc") == "true"
+            profiling.run(main, keep=keep, trace_memory=trace_memory)
+            return
     main()
+
+
+if __name__ == "__main__":
+    _run()
@@ -0,0 +1,108 @@
+"""Time-budgeted viewing: "about 45 minutes" or "until 8pm".
+
+A tile (or the whole configuration) may carry a ``budget`` block with
+either ``minutes`` or ``until`` (``"HH:MM"`` local time).  A tap on such a
+tile picks the episodes fitting the window with
+:func:`one_tap.selection.fit_budget` from the durations stored in the
+catalog and keeps the rest of the sequence as a plan in ``budget.json``.
+Auto-advance then plays the plan's episodes in turn and returns to Home
+once the plan is used up or its window has ended.
+"""
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from . import config, locks
+
+STATE_PATH = "special://profile/addon_data/plugin.one_tap.play/budget.json"
+
+
+class Plan(NamedTuple):
+    show_id: str
+    episodes: List[str]
+    ends_at: float
+
+
+def seconds_for(budget_cfg: Optional[Dict[str, Any]], now: Optional[float] = None) -> Optional[float]:
+    """Return the length of the window ``budget_cfg`` asks for, or ``None``.
+
+    An ``until`` time that already passed today means no budget.
+    """
+
+    if not budget_cfg:
+        return None
+    if "minutes" in budget_cfg:
+        return float(budget_cfg["minutes"]) * 60
+    if "until" in budget_cfg:
+        now = time.time() if now is None else now
+        start = datetime.fromtimestamp(now)
+        hour, minute = (int(part) for part in str(budget_cfg["until"]).split(":"))
+        end = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if end <= start:
+            return None
+        return (end - start) / timedelta(seconds=1)
+    return None
+
+
+def _path() -> Path:
+    return config._resolve(STATE_PATH)
+
+
+def current() -> Optional[Plan]:
+    """Return the active plan, including one whose window has ended."""
+
+    try:
+        data = json.loads(_path().read_text(encoding="utf-8"))
+        return Plan(data["show_id"], list(data["episodes"]), float(data["ends_at"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save(plan: Plan) -> None:
+    path = _path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(plan._asdict()), encoding="utf-8")
+
+
+def start(show_id: str, episodes: List[str], ends_at: float) -> None:
+    """Plan ``episodes`` of ``show_id`` to follow the one playing now."""
+
+    with locks.locked("budget"):
+        _save(Plan(show_id, list(episodes), ends_at))
+
+
+def next_episode(show_id: str) -> Optional[str]:
+    """Return the planned next episode of ``show_id``, if any."""
+
+    plan = current()
+    if plan is None or plan.show_id != show_id or not plan.episodes:
+        return None
+    return plan.episodes[0]
+
+
+def consume(episode: str) -> None:
+    """Drop ``episode`` from the head of the plan once it started."""
+
+    with locks.locked("budget"):
+        plan = current()
+        if plan and plan.episodes and plan.episodes[0] == episode:
+            _save(plan._replace(episodes=plan.episodes[1:]))
+
+
+def finished(now: Optional[float] = None) -> bool:
+    """Return whether a plan exists and nothing more of it should play."""
+
+    plan = current()
+    if plan is None:
+        return False
+    now = time.time() if now is None else now
+    return not plan.episodes or now >= plan.ends_at
+
+
+def clear() -> None:
+    with locks.locked("budget"):
+        _path().unlink(missing_ok=True)
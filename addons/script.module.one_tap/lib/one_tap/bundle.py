@@ -0,0 +1,75 @@
+"""Backup bundles holding the configuration and the playback database.
+
+A bundle is a zip file with ``manifest.json``, the caregiver
+``config.json`` and a consistent snapshot of ``one_tap.db`` taken with
+:func:`one_tap.db.backup`.  The snapshot is written to and read from the zip
+in chunks, so large histories never have to fit in memory.  Importing
+replaces the configuration and merges the snapshot into the local database
+with :func:`one_tap.db.merge_from`, so plays on the new box are kept.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from pathlib import Path
+
+from . import config, db
+from .logging import get_logger
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+CONFIG = "config.json"
+DATABASE = "one_tap.db"
+CHUNK_SIZE = 1024 * 1024
+
+logger = get_logger("one_tap.bundle")
+
+
+def _scratch() -> tempfile.TemporaryDirectory:
+    # Keep snapshots next to the database rather than on a small tmpfs.
+    parent = db._path().parent
+    parent.mkdir(parents=True, exist_ok=True)
+    return tempfile.TemporaryDirectory(dir=str(parent))
+
+
+def export_bundle(dest: Path) -> None:
+    """Write the configuration and a database snapshot to the zip ``dest``."""
+
+    with _scratch() as tmp:
+        snapshot = Path(tmp) / DATABASE
+        db.backup(snapshot)
+        manifest = {
+            "version": FORMAT_VERSION,
+            "id": uuid.uuid4().hex,
+            "created": time.time(),
+        }
+        with zipfile.ZipFile(dest, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(MANIFEST, json.dumps(manifest))
+            zf.writestr(CONFIG, json.dumps(config.load_config(), indent=2, sort_keys=True))
+            zf.write(snapshot, DATABASE)
+    logger.info("Backup bundle written to %s", dest)
+
+
+def import_bundle(src: Path) -> int:
+    """Restore the bundle ``src`` and return the number of history rows added."""
+
+    with zipfile.ZipFile(src) as zf:
+        manifest = json.loads(zf.read(MANIFEST))
+        if manifest.get("version", 0) > FORMAT_VERSION:
+            raise ValueError(f"unsupported bundle version {manifest.get('version')}")
+        cfg = json.loads(zf.read(CONFIG))
+        added = 0
+        if DATABASE in zf.namelist():
+            with _scratch() as tmp:
+                snapshot = Path(tmp) / DATABASE
+                with zf.open(DATABASE) as packed, snapshot.open("wb") as out:
+                    shutil.copyfileobj(packed, out, CHUNK_SIZE)
+                limit = cfg.get("history", {}).get("max", db.DEFAULT_MAX_HISTORY)
+                added = db.merge_from(snapshot, manifest.get("id") or str(src), int(limit))
+    config.save_config(cfg)
+    logger.info("Backup bundle imported from %s (%d history entries added)", src, added)
+    return added
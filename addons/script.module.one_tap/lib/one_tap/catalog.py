@@ -0,0 +1,210 @@
+"""Episode discovery for configured tiles.
+
+Listing a network share is often the slowest part of a tile press, so the
+randomizer service rescans every tile while idle and stores the listings in
+``catalog.json``.  :func:`episodes` serves a fresh stored listing and only
+falls back to listing the share when none is available.  Listings go
+through :mod:`one_tap.shares`; when the share is down an outdated stored
+listing, or else the episodes copied to the local media cache, is used.
+Tiles backed by the Kodi video library are listed through
+:mod:`one_tap.library`, and :func:`library_changed` applies the library's
+change notifications to their stored listings.  Listings read from
+``catalog.json`` stay in memory until :mod:`one_tap.invalidation` reports
+that another process stored a different one.  Episode durations probed
+by the service (:mod:`one_tap.durations`) are stored next to the listing.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from . import config, invalidation, library, media_cache, shares
+from .episodes import EpisodeList
+from .logging import get_logger
+
+EPISODE_EXTENSIONS = {".mkv", ".mp4", ".avi"}
+CACHE_PATH = "special://profile/addon_data/service.one_tap.random/catalog.json"
+# Stored listings older than this are ignored; the service rescans hourly.
+MAX_AGE = 2 * 3600
+
+logger = get_logger("one_tap.catalog")
+
+# (catalog file, tile path) -> (scan time, listing) of listings already read.
+_memo: Dict[Tuple[str, str], Tuple[float, EpisodeList]] = {}
+# (catalog file, tile path) -> {episode: seconds} already read.
+_durations: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+
+def _cache_path() -> Path:
+    return config._resolve(CACHE_PATH)
+
+
+def list_episodes(path: str) -> EpisodeList:
+    """Return a sorted list of episode files within ``path``."""
+
+    if library.is_library(path):
+        return EpisodeList.from_paths(library.refresh(path))
+    _dirs, files = shares.listdir(path)
+    names = sorted(
+        f for f in files if os.path.splitext(f)[1].lower() in EPISODE_EXTENSIONS
+    )
+    return EpisodeList.from_listing(path, names)
+
+
+def _load() -> Dict[str, Dict]:
+    try:
+        with _cache_path().open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def cached(path: str, max_age: float = MAX_AGE) -> Optional[EpisodeList]:
+    """Return the stored listing of ``path`` if it is younger than ``max_age``."""
+
+    invalidation.refresh()
+    key = (str(_cache_path()), path)
+    now = time.time()
+    memo = _memo.get(key)
+    if memo is None or now - memo[0] > max_age:
+        # Another process may have rescanned without changing the listing.
+        entry = _load().get(path)
+        if not entry or entry.get("episodes") is None:
+            return None
+        memo = _memo[key] = (entry.get("scanned", 0), EpisodeList.from_paths(entry["episodes"]))
+    if now - memo[0] > max_age:
+        return None
+    return memo[1]
+
+
+def forget(path: str = "") -> None:
+    """Drop the listing of tile ``path`` kept in memory, or all when empty."""
+
+    for memo in (_memo, _durations):
+        for key in [k for k in memo if not path or k[1] == path]:
+            del memo[key]
+
+
+def _write(data: Dict[str, Dict]) -> Path:
+    cache = _cache_path()
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, cache)
+    return cache
+
+
+def _store(path: str, found: EpisodeList) -> None:
+    data = _load()
+    previous = data.get(path, {})
+    episodes = list(found)
+    known = previous.get("durations", {})
+    if known:
+        kept = set(episodes)
+        known = {e: d for e, d in known.items() if e in kept}
+    data[path] = {"scanned": time.time(), "episodes": episodes, "durations": known}
+    changed = previous.get("episodes") != episodes
+    cache = _write(data)
+    if changed:
+        invalidation.publish(invalidation.CATALOG, path)
+    _memo[(str(cache), path)] = (data[path]["scanned"], found)
+    _durations[(str(cache), path)] = known
+
+
+def durations(path: str) -> Dict[str, float]:
+    """Return the known durations in seconds of the episodes of ``path``.
+
+    Episodes that could not be probed map to ``0``.
+    """
+
+    invalidation.refresh()
+    key = (str(_cache_path()), path)
+    if key not in _durations:
+        _durations[key] = _load().get(path, {}).get("durations", {})
+    return _durations[key]
+
+
+def store_durations(path: str, probed: Dict[str, float]) -> None:
+    """Add the ``probed`` episode durations of the stored listing of ``path``."""
+
+    data = _load()
+    entry = data.get(path)
+    if entry is None:
+        return
+    entry.setdefault("durations", {}).update(probed)
+    cache = _write(data)
+    _durations[(str(cache), path)] = entry["durations"]
+
+
+def rescan(path: str) -> EpisodeList:
+    """List ``path`` and store the result for :func:`cached`."""
+
+    found = list_episodes(path)
+    _store(path, found)
+    return found
+
+
+def library_changed(method: str, data: Dict[str, Any]) -> Optional[str]:
+    """Apply a ``VideoLibrary.OnUpdate``/``OnRemove`` notification.
+
+    Returns the path of the library tile whose stored listing changed.
+    """
+
+    item = data.get("item", data)
+    if item.get("type") != "episode" or "id" not in item:
+        return None
+    if method == "VideoLibrary.OnRemove":
+        path = library.removed(item["id"])
+    else:
+        path = library.updated(item["id"])
+    if path:
+        _store(path, EpisodeList.from_paths(library.episodes(path)))
+        logger.debug("Library episode %s changed %s", item["id"], path)
+    return path
+
+
+def owns(path: str, episode: str) -> bool:
+    """Return whether ``episode`` is one of the episodes of tile ``path``.
+
+    Library tiles are matched through their stored listing, as their
+    episodes live wherever the library's sources are.
+    """
+
+    if library.is_library(path):
+        found = cached(path, max_age=float("inf"))
+        return bool(found) and episode in found
+    return episode.startswith(os.path.join(path, ""))
+
+
+def local_sources(path: str) -> EpisodeList:
+    """Return the episodes of tile ``path`` copied to the local media cache."""
+
+    if library.is_library(path):
+        found = cached(path, max_age=float("inf"))
+        if not found:
+            return EpisodeList.from_paths([])
+        return EpisodeList.from_paths(s for s in media_cache.complete_sources() if s in found)
+    return EpisodeList.from_paths(media_cache.sources_under(path))
+
+
+def episodes(path: str) -> EpisodeList:
+    """Return the episodes of ``path``, from the stored listing when fresh."""
+
+    found = cached(path)
+    if found:
+        return found
+    try:
+        return list_episodes(path)
+    except OSError as exc:
+        logger.warning("Cannot list %s: %s", path, exc)
+    found = cached(path, max_age=float("inf"))
+    if found:
+        return found
+    return EpisodeList.from_paths(media_cache.sources_under(path))
+
+
+invalidation.subscribe(invalidation.CATALOG, forget)
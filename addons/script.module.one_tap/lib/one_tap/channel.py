@@ -0,0 +1,150 @@
+"""Channel tiles interleaving the episodes of several shows.
+
+A tile with a ``channel`` list instead of a ``path`` plays its member
+shows in turn, e.g. a cartoon, then a nature episode, then the cartoon
+again::
+
+    {"show_id": "mix", "label": "Mix", "channel": ["cartoon", {"show_id": "nature", "weight": 2}]}
+
+Members name other tiles by ``show_id``; a member without a tile of its
+own gives its ``path`` inline.  A member's weight defaults to its tile's
+comfort weight (see :func:`one_tap.selection.comfort_weight`).
+
+:func:`interleave` is a lazy weighted k-way merge of the members' candidate
+streams from :func:`one_tap.selection.episode_candidates`: every show has a
+pass value that grows by ``1 / weight`` per episode taken from it, and the
+show with the lowest pass plays next.  Only the head of each stream is
+pulled, so the combined library is never listed or shuffled.  The pass
+values are kept per channel in ``channels.json`` so the rotation continues
+across taps, while each show's own position advances in its history.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from . import catalog, config, locks, selection
+
+STATE_PATH = "special://profile/addon_data/plugin.one_tap.play/channels.json"
+
+
+def is_channel(tile: Dict[str, Any]) -> bool:
+    return bool(tile.get("channel"))
+
+
+def members(tile: Dict[str, Any], cfg: Dict[str, Any]) -> List[Tuple[Dict[str, Any], float]]:
+    """Return ``(member tile, weight)`` for every playable member of ``tile``."""
+
+    tiles = {t.get("show_id"): t for t in cfg.get("tiles", []) if t.get("show_id")}
+    random_cfg = cfg.get("random", {})
+    result = []
+    for entry in tile.get("channel", []):
+        if isinstance(entry, str):
+            entry = {"show_id": entry}
+        member = {**tiles.get(entry.get("show_id"), {}), **entry}
+        if not member.get("show_id") or not member.get("path") or is_channel(member):
+            continue
+        if "weight" in entry:
+            weight = float(entry["weight"])
+        else:
+            weight = selection.comfort_weight(member, random_cfg)
+        if weight > 0:
+            result.append((member, weight))
+    return result
+
+
+def interleave(
+    streams: Sequence[Tuple[str, Iterable[str], float]],
+    passes: Dict[str, float] | None = None,
+) -> Iterator[Tuple[str, str]]:
+    """Merge ``(show_id, episodes, weight)`` streams into ``(show_id, episode)``.
+
+    ``passes`` holds the starting pass value of each show (0 if missing);
+    ties go to the earlier stream.  A stream is pulled only when its show
+    is due and dropped once exhausted.
+    """
+
+    passes = passes or {}
+    heap = []
+    iterators = []
+    for index, (show_id, episodes, weight) in enumerate(streams):
+        iterators.append(iter(episodes))
+        heap.append((passes.get(show_id, 0.0), index, show_id, 1.0 / weight))
+    heapq.heapify(heap)
+    while heap:
+        current, index, show_id, step = heap[0]
+        episode = next(iterators[index], None)
+        if episode is None:
+            heapq.heappop(heap)
+            continue
+        heapq.heapreplace(heap, (current + step, index, show_id, step))
+        yield show_id, episode
+
+
+def _path() -> Path:
+    return config._resolve(STATE_PATH)
+
+
+def _load() -> Dict[str, Dict[str, float]]:
+    try:
+        with _path().open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def passes(channel_id: str) -> Dict[str, float]:
+    """Return the stored pass value of every member of ``channel_id``."""
+
+    return dict(_load().get(channel_id, {}))
+
+
+def _candidates(member: Dict[str, Any], cfg: Dict[str, Any]) -> Iterator[str]:
+    # Listed only once the merge first asks this show for an episode.
+    episodes = catalog.episodes(member["path"])
+    if episodes:
+        yield from selection.episode_candidates(
+            member["show_id"], episodes, cfg.get("mode", "order"), cfg.get("random", {})
+        )
+
+
+def sequence(
+    tile: Dict[str, Any],
+    cfg: Dict[str, Any],
+    available: Callable[[str], bool] = lambda path: True,
+) -> Iterator[Tuple[str, str]]:
+    """Return the upcoming ``(show_id, episode)`` pairs of channel ``tile``.
+
+    Members whose share is not ``available`` are left out.
+    """
+
+    streams = [
+        (member["show_id"], _candidates(member, cfg), weight)
+        for member, weight in members(tile, cfg)
+        if available(member["path"])
+    ]
+    return interleave(streams, passes(tile["show_id"]))
+
+
+def played(tile: Dict[str, Any], cfg: Dict[str, Any], show_id: str) -> None:
+    """Advance the pass of ``show_id`` in channel ``tile`` after it started."""
+
+    weights = {member["show_id"]: weight for member, weight in members(tile, cfg)}
+    if show_id not in weights:
+        return
+    with locks.locked("channels"):
+        data = _load()
+        current = {s: p for s, p in data.get(tile["show_id"], {}).items() if s in weights}
+        current[show_id] = current.get(show_id, 0.0) + 1.0 / weights[show_id]
+        # Shows missing from the table have a pass of 0; keep values small.
+        floor = min(current.get(s, 0.0) for s in weights)
+        data[tile["show_id"]] = {s: p - floor for s, p in current.items()}
+        path = _path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
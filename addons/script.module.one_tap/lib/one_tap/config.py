@@ -4,12 +4,17 @@ This module reads the caregiver configuration JSON which defines the
 available tiles, playback mode, and other settings. It falls back to a
 reasonable default configuration if the file does not yet exist so that
 the add-ons can operate during early development.
+
+A loaded configuration is kept in memory until :mod:`one_tap.invalidation`
+reports that some process saved a new one, or the modification time or
+size of the file changed, so hand edits are picked up on the next read.
 """
 from __future__ import annotations
 
+import copy
 import json
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 try:  # Kodi runtime
     import xbmc  # type: ignore
@@ -24,6 +29,15 @@ except ImportError:  # Desktop/dev fallback
 # the current working directory which mirrors the runtime layout.
 CONFIG_PATH = "special://profile/addon_data/plugin.one_tap.play/config.json"
 
+# (mtime, size) and parsed configuration per resolved path, dropped on
+# ``config`` events.
+_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
 
 def _resolve(path: str) -> Path:
     """Resolve ``special://`` paths both inside and outside Kodi.
@@ -46,8 +60,14 @@ def load_config() -> Dict[str, Any]:
     :func:`save_config`.
     """
 
+    from . import invalidation
+
+    invalidation.refresh()
     path = _resolve(CONFIG_PATH)
-    if not path.exists():
+    try:
+        stamp = _stamp(path)
+    except OSError:
+        _cache.pop(str(path), None)
         return {
             "tiles": [],
             "mode": "order",
@@ -56,14 +76,38 @@ def load_config() -> Dict[str, Any]:
             "pin": "",
             "history": {"max": 50},
         }
+    cached = _cache.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return copy.deepcopy(cached[1])
     with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+        cfg = json.load(f)
+    _cache[str(path)] = (stamp, cfg)
+    return copy.deepcopy(cfg)
 
 
 def save_config(cfg: Dict[str, Any]) -> None:
-    """Persist configuration ``cfg`` to :data:`CONFIG_PATH`."""
+    """Persist configuration ``cfg`` to :data:`CONFIG_PATH`.
+
+    Schedule rules are compiled into ``schedule_table`` on the way; invalid
+    rules raise ``ValueError`` before anything is written.
+    """
+
+    cfg = {k: v for k, v in cfg.items() if k != "schedule_table"}
+    if cfg.get("schedule"):
+        from . import schedule
 
+        cfg["schedule_table"] = schedule.compile_rules(cfg["schedule"])
     path = _resolve(CONFIG_PATH)
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("w", encoding="utf-8") as f:
         json.dump(cfg, f, indent=2, sort_keys=True)
+    from . import invalidation
+
+    invalidation.publish(invalidation.CONFIG)
+    _cache[str(path)] = (_stamp(path), copy.deepcopy(cfg))
+
+
+def forget(_key: str = "") -> None:
+    """Drop the configuration kept in memory."""
+
+    _cache.clear()
@@ -2,38 +2,154 @@
 from __future__ import annotations
 
 import sqlite3
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
 
-import logging
-
-from . import config
+from . import config, invalidation, locks, tracing
+from .logging import get_logger
 
 # Path inside the add-on's profile directory where playback history is stored
 DB_PATH = "special://profile/addon_data/plugin.one_tap.play/one_tap.db"
 DEFAULT_MAX_HISTORY = 50
+# Rows deleted per transaction by :func:`purge_older_than`.
+PURGE_CHUNK = 500
 
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 
 def _path() -> Path:
     return config._resolve(DB_PATH)
 
 
+# Schema migrations, applied in order.  ``PRAGMA user_version`` records how
+# many have run so an up-to-date database costs one pragma read per connect.
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS history (
+        show_id TEXT NOT NULL,
+        episode TEXT NOT NULL,
+        played_at REAL DEFAULT (strftime('%s','now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_history_show ON history(show_id);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS resume (
+        show_id TEXT PRIMARY KEY,
+        episode TEXT NOT NULL,
+        position REAL NOT NULL,
+        total REAL,
+        updated_at REAL DEFAULT (strftime('%s','now'))
+    );
+    """,
+    # Play statistics are maintained by a trigger on every history insert so
+    # they survive ``history.max`` trimming; existing rows are counted once.
+    """
+    CREATE TABLE show_stats (
+        show_id TEXT PRIMARY KEY,
+        plays INTEGER NOT NULL DEFAULT 0,
+        last_played REAL,
+        failures INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE episode_stats (
+        show_id TEXT NOT NULL,
+        episode TEXT NOT NULL,
+        plays INTEGER NOT NULL DEFAULT 0,
+        last_played REAL,
+        failures INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (show_id, episode)
+    );
+    INSERT INTO show_stats(show_id, plays, last_played)
+        SELECT show_id, COUNT(*), MAX(played_at) FROM history GROUP BY show_id;
+    INSERT INTO episode_stats(show_id, episode, plays, last_played)
+        SELECT show_id, episode, COUNT(*), MAX(played_at)
+        FROM history GROUP BY show_id, episode;
+    CREATE TRIGGER history_stats AFTER INSERT ON history
+    BEGIN
+        INSERT OR IGNORE INTO show_stats(show_id) VALUES (NEW.show_id);
+        UPDATE show_stats SET plays = plays + 1, last_played = NEW.played_at
+            WHERE show_id = NEW.show_id;
+        INSERT OR IGNORE INTO episode_stats(show_id, episode)
+            VALUES (NEW.show_id, NEW.episode);
+        UPDATE episode_stats SET plays = plays + 1, last_played = NEW.played_at
+            WHERE show_id = NEW.show_id AND episode = NEW.episode;
+    END;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_history_played ON history(played_at);
+    """,
+    # Snapshots already merged by :func:`merge_from`.
+    """
+    CREATE TABLE merged_sources (
+        source_id TEXT PRIMARY KEY,
+        merged_at REAL DEFAULT (strftime('%s','now'))
+    );
+    """,
+    # Change log for :mod:`one_tap.sync`.  ``changes`` holds this box's
+    # events until they are published, ``sync_peers`` the last sequence
+    # number applied from every other box and ``history.device`` the box
+    # that recorded a play.
+    """
+    CREATE TABLE sync_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    INSERT INTO sync_meta VALUES ('device_id', lower(hex(randomblob(16))));
+    CREATE TABLE changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        show_id TEXT NOT NULL,
+        episode TEXT NOT NULL,
+        played_at REAL
+    );
+    CREATE TABLE sync_peers (device TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+    ALTER TABLE history ADD COLUMN device TEXT;
+    UPDATE history SET device = (SELECT value FROM sync_meta WHERE key = 'device_id');
+    """,
+]
+
+# Kinds of :class:`Change`.
+PLAY = "play"
+UNPLAY = "unplay"
+FAIL = "fail"
+
+_DEVICE = "(SELECT value FROM sync_meta WHERE key = 'device_id')"
+# History order: oldest play first, ties broken the same way on every box.
+_ORDER = "played_at, device, rowid"
+_ORDER_DESC = "played_at DESC, device DESC, rowid DESC"
+
+
+class PlayStats(NamedTuple):
+    """Aggregate counters for a show or an episode."""
+
+    key: str
+    plays: int
+    last_played: Optional[float]
+    failures: int
+
+
+class Change(NamedTuple):
+    """One entry of the change log exchanged by :mod:`one_tap.sync`."""
+
+    seq: int
+    kind: str
+    show_id: str
+    episode: str
+    played_at: Optional[float]
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(SCHEMA):
+        return
+    # Several add-ons may open an old database at the same time.
+    with locks.locked("db-schema"):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, script in enumerate(SCHEMA[version:], version + 1):
+            conn.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+
+
 def _connect() -> sqlite3.Connection:
     path = _path()
     path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(str(path))
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS history (
-            show_id TEXT NOT NULL,
-            episode TEXT NOT NULL,
-            played_at REAL DEFAULT (strftime('%s','now'))
-        )
-        """
-    )
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_show ON history(show_id)")
+    _migrate(conn)
     return conn
 
 
@@ -41,9 +157,9 @@ def get_history(show_id: str) -> List[str]:
     """Return playback history list for ``show_id``."""
 
     try:
-        with _connect() as conn:
+        with tracing.span("db_read"), _connect() as conn:
             rows = conn.execute(
-                "SELECT episode FROM history WHERE show_id=? ORDER BY rowid",
+                f"SELECT episode FROM history WHERE show_id=? ORDER BY {_ORDER}",
                 (show_id,),
             ).fetchall()
     except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
@@ -57,47 +173,553 @@ def update_history(
 ) -> None:
     """Append ``episode`` to the history for ``show_id`` keeping ``max_history`` entries."""
     try:
-        with _connect() as conn:
-            conn.execute(
-                "INSERT INTO history(show_id, episode) VALUES (?, ?)",
+        with tracing.span("db_write"), _connect() as conn:
+            rowid = conn.execute(
+                f"INSERT INTO history(show_id, episode, device) VALUES (?, ?, {_DEVICE})",
                 (show_id, episode),
-            )
+            ).lastrowid
             conn.execute(
-                """
-                DELETE FROM history
-                WHERE show_id=?
-                  AND rowid NOT IN (
-                    SELECT rowid FROM history WHERE show_id=? ORDER BY rowid DESC LIMIT ?
-                  )
-                """,
-                (show_id, show_id, max_history),
+                "INSERT INTO changes(kind, show_id, episode, played_at) "
+                "SELECT ?, show_id, episode, played_at FROM history WHERE rowid=?",
+                (PLAY, rowid),
             )
+            _trim(conn, show_id, max_history)
     except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
         logger.error("Failed to update history for %s: %s", show_id, exc)
 
 
-def remove_last_history(show_id: str) -> None:
-    """Remove the most recent history entry for ``show_id``."""
+def _trim(conn: sqlite3.Connection, show_id: str, max_history: int) -> None:
+    conn.execute(
+        f"""
+        DELETE FROM history
+        WHERE show_id=?
+          AND rowid NOT IN (
+            SELECT rowid FROM history WHERE show_id=? ORDER BY {_ORDER_DESC} LIMIT ?
+          )
+        """,
+        (show_id, show_id, max_history),
+    )
+
+
+def _count(
+    conn: sqlite3.Connection, show_id: str, episode: str, plays: int, failures: int
+) -> None:
+    """Add ``plays`` and ``failures`` to the statistics of ``episode``."""
+
+    for table, keys in (("show_stats", (show_id,)), ("episode_stats", (show_id, episode))):
+        columns = ("show_id", "episode")[: len(keys)]
+        conn.execute(
+            f"INSERT OR IGNORE INTO {table}({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(keys))})",
+            keys,
+        )
+        conn.execute(
+            f"UPDATE {table} SET plays = MAX(plays + ?, 0), failures = failures + ? "
+            f"WHERE {' AND '.join(f'{c}=?' for c in columns)}",
+            (plays, failures, *keys),
+        )
+
+
+def _log(
+    conn: sqlite3.Connection,
+    kind: str,
+    show_id: str,
+    episode: str,
+    played_at: Optional[float] = None,
+) -> None:
+    conn.execute(
+        "INSERT INTO changes(kind, show_id, episode, played_at) VALUES (?, ?, ?, ?)",
+        (kind, show_id, episode, played_at),
+    )
+
+
+def remove_last_history(show_id: str, failed: bool = True) -> Optional[str]:
+    """Remove the most recent history entry for ``show_id`` and return its episode.
+
+    The removed play is taken back out of the statistics and, when
+    ``failed``, counted as a failure of that episode instead.
+    """
 
     try:
         with _connect() as conn:
-            conn.execute(
-                "DELETE FROM history WHERE rowid = (SELECT MAX(rowid) FROM history WHERE show_id=?)",
+            row = conn.execute(
+                "SELECT rowid, episode, played_at FROM history "
+                f"WHERE show_id=? AND device IS {_DEVICE} ORDER BY rowid DESC LIMIT 1",
                 (show_id,),
-            )
+            ).fetchone()
+            if not row:
+                return None
+            rowid, episode, played_at = row
+            conn.execute("DELETE FROM history WHERE rowid=?", (rowid,))
+            _count(conn, show_id, episode, -1, int(failed))
+            _log(conn, UNPLAY, show_id, episode, played_at)
+            if failed:
+                _log(conn, FAIL, show_id, episode)
     except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
         logger.error("Failed to remove last history for %s: %s", show_id, exc)
+        return None
+    return episode
+
+
+def record_failure(show_id: str, episode: str) -> None:
+    """Count a failed attempt to play ``episode`` of ``show_id``."""
+
+    try:
+        with _connect() as conn:
+            _count(conn, show_id, episode, 0, 1)
+            _log(conn, FAIL, show_id, episode)
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to record failure for %s: %s", episode, exc)
+
+
+def show_stats() -> List[PlayStats]:
+    """Return play statistics for every show, most played first."""
+
+    try:
+        with tracing.span("db_read"), _connect() as conn:
+            rows = conn.execute(
+                "SELECT show_id, plays, last_played, failures FROM show_stats "
+                "ORDER BY plays DESC, show_id"
+            ).fetchall()
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to read show statistics: %s", exc)
+        return []
+    return [PlayStats(*r) for r in rows]
+
+
+def episode_stats(show_id: str) -> List[PlayStats]:
+    """Return play statistics for the episodes of ``show_id``, in file order."""
+
+    try:
+        with tracing.span("db_read"), _connect() as conn:
+            rows = conn.execute(
+                "SELECT episode, plays, last_played, failures FROM episode_stats "
+                "WHERE show_id=? ORDER BY episode",
+                (show_id,),
+            ).fetchall()
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to read episode statistics for %s: %s", show_id, exc)
+        return []
+    return [PlayStats(*r) for r in rows]
 
 
 def purge_history(show_id: Optional[str] = None) -> None:
-    """Remove history for ``show_id`` or all shows when ``show_id`` is ``None``."""
+    """Remove history and statistics for ``show_id``, or for all shows when ``None``."""
 
     try:
         with _connect() as conn:
-            if show_id is None:
-                conn.execute("DELETE FROM history")
-            else:
-                conn.execute("DELETE FROM history WHERE show_id=?", (show_id,))
+            for table in ("history", "show_stats", "episode_stats"):
+                if show_id is None:
+                    conn.execute(f"DELETE FROM {table}")
+                else:
+                    conn.execute(f"DELETE FROM {table} WHERE show_id=?", (show_id,))
     except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
         logger.error("Failed to purge history: %s", exc)
+        return
+    invalidation.publish(invalidation.HISTORY, show_id or "")
+
+
+def get_resume(show_id: str) -> Optional[Tuple[str, float]]:
+    """Return the ``(episode, position)`` where ``show_id`` was left, if any."""
+
+    try:
+        with _connect() as conn:
+            row = conn.execute(
+                "SELECT episode, position FROM resume WHERE show_id=?", (show_id,)
+            ).fetchone()
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to read resume point for %s: %s", show_id, exc)
+        return None
+    return (row[0], row[1]) if row else None
+
+
+def save_resume_points(
+    points: Iterable[Tuple[str, str, float, float]], cleared: Iterable[str] = ()
+) -> None:
+    """Store ``(show_id, episode, position, total)`` rows and drop ``cleared`` shows.
+
+    All changes are written in a single transaction.
+    """
+
+    try:
+        with tracing.span("db_write"), _connect() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO resume(show_id, episode, position, total)
+                VALUES (?, ?, ?, ?)
+                """,
+                points,
+            )
+            conn.executemany(
+                "DELETE FROM resume WHERE show_id=?", ((s,) for s in cleared)
+            )
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to store resume points: %s", exc)
+
+
+def purge_older_than(
+    days: float,
+    show_id: Optional[str] = None,
+    chunk: int = PURGE_CHUNK,
+    pause: float = 0.0,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> int:
+    """Delete history played more than ``days`` ago and return the row count.
 
+    Rows are removed in transactions of at most ``chunk`` rows using the
+    ``played_at`` index, sleeping ``pause`` seconds in between, so a long
+    purge never holds the write lock for long.  The latest entry of every
+    show is kept so ordered playback continues where it left off; the play
+    statistics are not affected.
+    """
+
+    cutoff = time.time() - days * 86400
+    try:
+        with _connect() as conn:
+            # Synced and restored plays are not in rowid order.
+            keep = [
+                r[0]
+                for r in conn.execute(
+                    "SELECT (SELECT rowid FROM history h WHERE h.show_id = s.show_id"
+                    f" ORDER BY {_ORDER_DESC} LIMIT 1)"
+                    " FROM (SELECT DISTINCT show_id FROM history) s"
+                )
+            ]
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to purge old history: %s", exc)
+        return 0
+    query = (
+        "DELETE FROM history WHERE rowid IN ("
+        " SELECT rowid FROM history WHERE played_at < ?"
+        f" AND rowid NOT IN ({', '.join('?' * len(keep))})"
+        + (" AND show_id = ?" if show_id is not None else "")
+        + " LIMIT ?)"
+    )
+    args = [cutoff, *keep] + ([show_id] if show_id is not None else []) + [chunk]
+    removed = 0
+    while True:
+        try:
+            with _connect() as conn:
+                deleted = conn.execute(query, args).rowcount
+        except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+            logger.error("Failed to purge old history: %s", exc)
+            break
+        removed += deleted
+        if deleted < chunk or (should_stop and should_stop()):
+            break
+        if pause:
+            time.sleep(pause)
+    if removed:
+        invalidation.publish(invalidation.HISTORY, show_id or "")
+    return removed
+
+
+def _maintenance(statement: str) -> None:
+    try:
+        conn = _connect()
+        try:
+            conn.execute(statement)
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Database maintenance %r failed: %s", statement, exc)
+
+
+def optimize() -> None:
+    """Refresh the query planner statistics."""
+
+    _maintenance("PRAGMA optimize")
+    _maintenance("ANALYZE")
+
+
+def checkpoint() -> None:
+    """Fold a write-ahead log back into the database file."""
+
+    _maintenance("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def vacuum() -> None:
+    """Rebuild the database file to release pages freed by purges."""
+
+    _maintenance("VACUUM")
+
+
+def backup(dest: Path, pages: int = 64, sleep: float = 0.01) -> None:
+    """Write a consistent snapshot of the database to ``dest``.
+
+    SQLite's online backup API copies ``pages`` pages per step and sleeps
+    ``sleep`` seconds in between, so playback can keep writing history while
+    the snapshot is taken.
+    """
+
+    src = _connect()
+    dst = sqlite3.connect(str(dest))
+    try:
+        src.backup(dst, pages=pages, sleep=sleep)
+    finally:
+        dst.close()
+        src.close()
+
+
+def merge_from(
+    snapshot: Path, source_id: str, max_history: int = DEFAULT_MAX_HISTORY
+) -> int:
+    """Merge history, statistics and resume points from ``snapshot``.
+
+    History rows missing locally are added and the history is put back into
+    ``played_at`` order so ordered playback continues from the most recent
+    play on either box; shows that gained rows keep ``max_history`` entries.
+    The snapshot's statistics are added to the local ones, minus the plays
+    both histories share, once per ``source_id``.  Local resume points win.
+    Returns the number of history rows added.
+    """
+
+    conn = _connect()
+    conn.isolation_level = None
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (str(snapshot),))
+        tables = {
+            r[0] for r in conn.execute("SELECT name FROM src.sqlite_master WHERE type='table'")
+        }
+        if "history" not in tables:
+            raise sqlite3.DatabaseError("snapshot has no history table")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seen = conn.execute(
+                "SELECT 1 FROM merged_sources WHERE source_id=?", (source_id,)
+            ).fetchone()
+            added = _merge_history(conn)
+            if not seen:
+                _merge_stats(conn, "episode_stats" in tables)
+                conn.execute("INSERT INTO merged_sources(source_id) VALUES (?)", (source_id,))
+            if added:
+                for (show_id,) in conn.execute(
+                    "SELECT DISTINCT show_id FROM temp.incoming"
+                ).fetchall():
+                    _trim(conn, show_id, max_history)
+            if "resume" in tables:
+                conn.execute(
+                    "INSERT OR IGNORE INTO main.resume"
+                    "(show_id, episode, position, total, updated_at) "
+                    "SELECT show_id, episode, position, total, updated_at FROM src.resume"
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("DETACH DATABASE src")
+    finally:
+        conn.close()
+    return added
+
+
+def _merge_history(conn: sqlite3.Connection) -> int:
+    """Add snapshot rows missing locally to ``temp.incoming`` and ``history``."""
+
+    columns = {r[1] for r in conn.execute("PRAGMA src.table_info(history)")}
+    device = "s.device" if "device" in columns else "NULL"
+    conn.execute(
+        f"""
+        CREATE TEMP TABLE incoming AS
+        SELECT s.show_id, s.episode, s.played_at, {device} AS device FROM src.history s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM main.history h
+            WHERE h.show_id = s.show_id AND h.episode = s.episode
+              AND h.played_at IS s.played_at
+        )
+        ORDER BY s.rowid
+        """
+    )
+    added = conn.execute("SELECT COUNT(*) FROM temp.incoming").fetchone()[0]
+    if not added:
+        return 0
+    # Rebuild history in play order.  The statistics trigger is dropped
+    # meanwhile; :func:`_merge_stats` accounts for the added plays.
+    trigger = conn.execute(
+        "SELECT sql FROM main.sqlite_master WHERE type='trigger' AND name='history_stats'"
+    ).fetchone()[0]
+    conn.execute(
+        """
+        CREATE TEMP TABLE merged AS
+        SELECT show_id, episode, played_at, device FROM (
+            SELECT rowid AS r, 0 AS o, show_id, episode, played_at, device FROM main.history
+            UNION ALL
+            SELECT rowid, 1, show_id, episode, played_at, device FROM temp.incoming
+        ) ORDER BY played_at, o, r
+        """
+    )
+    conn.execute("DROP TRIGGER main.history_stats")
+    conn.execute("DELETE FROM main.history")
+    conn.execute(
+        "INSERT INTO main.history(show_id, episode, played_at, device) "
+        "SELECT show_id, episode, played_at, device FROM temp.merged ORDER BY rowid"
+    )
+    conn.execute(trigger)
+    conn.execute("DROP TABLE temp.merged")
+    return added
+
+
+def _merge_stats(conn: sqlite3.Connection, has_stats: bool) -> None:
+    """Add the snapshot's plays that are not in the local history yet.
+
+    Without statistics in the snapshot only the added history rows count.
+    Otherwise its per-episode counters are added and the plays of its
+    history rows that were already present locally are subtracted again.
+    """
+
+    parts = [
+        "SELECT show_id, episode, COUNT(*) AS plays, 0 AS failures,"
+        " MAX(played_at) AS last_played FROM temp.incoming GROUP BY show_id, episode"
+    ]
+    if has_stats:
+        parts += [
+            "SELECT show_id, episode, plays, failures, last_played FROM src.episode_stats",
+            "SELECT show_id, episode, -COUNT(*), 0, NULL FROM src.history"
+            " GROUP BY show_id, episode",
+        ]
+    rows = conn.execute(
+        "SELECT show_id, episode, SUM(plays), SUM(failures), MAX(last_played) FROM ("
+        + " UNION ALL ".join(parts)
+        + ") GROUP BY show_id, episode"
+    ).fetchall()
+    shows: dict = {}
+    for show_id, _episode, plays, failures, last in rows:
+        total = shows.setdefault(show_id, [0, 0, None])
+        total[0] += plays
+        total[1] += failures
+        total[2] = max(total[2] or 0, last or 0)
+    for table, keys, values in (
+        ("episode_stats", ("show_id", "episode"), [tuple(r) for r in rows]),
+        ("show_stats", ("show_id",), [(k, *v) for k, v in shows.items()]),
+    ):
+        columns = ", ".join(keys)
+        marks = ", ".join("?" * len(keys))
+        where = " AND ".join(f"{k} = ?" for k in keys)
+        conn.executemany(
+            f"INSERT OR IGNORE INTO main.{table}({columns}) VALUES ({marks})",
+            (v[: len(keys)] for v in values),
+        )
+        conn.executemany(
+            f"""
+            UPDATE main.{table} SET
+                plays = plays + ?,
+                failures = failures + ?,
+                last_played = MAX(COALESCE(last_played, 0), COALESCE(?, 0))
+            WHERE {where}
+            """,
+            (v[len(keys):] + v[: len(keys)] for v in values),
+        )
+
+
+def device_id() -> str:
+    """Return the random identifier of this box's database."""
+
+    with _connect() as conn:
+        return conn.execute(f"SELECT {_DEVICE}").fetchone()[0]
+
+
+def pending_changes(limit: int = 10000) -> List[Change]:
+    """Return up to ``limit`` unpublished local changes, oldest first."""
+
+    try:
+        with _connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, kind, show_id, episode, played_at FROM changes "
+                "ORDER BY seq LIMIT ?",
+                (limit,),
+            ).fetchall()
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to read pending changes: %s", exc)
+        return []
+    return [Change(*r) for r in rows]
+
+
+def mark_published(seq: int) -> None:
+    """Drop local changes up to and including ``seq`` once they are shared."""
+
+    try:
+        with _connect() as conn:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (seq,))
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to mark changes as published: %s", exc)
+
+
+def prune_changes(keep: int = 0) -> int:
+    """Drop all but the newest ``keep`` unpublished changes; return how many went.
+
+    Without a sync folder nothing publishes the change log, so the service
+    prunes it while idle.
+    """
+
+    try:
+        with _connect() as conn:
+            cur = conn.execute(
+                "DELETE FROM changes WHERE seq NOT IN "
+                "(SELECT seq FROM changes ORDER BY seq DESC LIMIT ?)",
+                (keep,),
+            )
+            return cur.rowcount
+    except sqlite3.DatabaseError as exc:  # pragma: no cover - defensive
+        logger.error("Failed to prune changes: %s", exc)
+        return 0
+
+
+def peer_seq(device: str) -> int:
+    """Return the last sequence number applied from ``device``."""
+
+    with _connect() as conn:
+        row = conn.execute("SELECT seq FROM sync_peers WHERE device=?", (device,)).fetchone()
+    return row[0] if row else 0
+
+
+def apply_changes(
+    device: str, changes: Iterable[Change], max_history: int = DEFAULT_MAX_HISTORY
+) -> int:
+    """Apply ``changes`` of another box in one transaction; return how many.
+
+    Changes must come in sequence order.  Already applied ones are skipped
+    and application stops at the first gap, so a segment that has not been
+    shared yet is waited for instead of lost.  A play already present locally
+    (for example from a backup bundle) is not added or counted twice.
+    """
+
+    conn = _connect()
+    try:
+        with conn:
+            applied = start = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM sync_peers WHERE device=?", (device,)
+            ).fetchone()[0]
+            shows = set()
+            for change in changes:
+                if change.seq <= applied:
+                    continue
+                if change.seq != applied + 1:
+                    break
+                applied = change.seq
+                key = (change.show_id, change.episode, change.played_at)
+                if change.kind == PLAY:
+                    conn.execute(
+                        "INSERT INTO history(show_id, episode, played_at, device) "
+                        "SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM history"
+                        " WHERE show_id=? AND episode=? AND played_at IS ?)",
+                        (*key, device, *key),
+                    )
+                    shows.add(change.show_id)
+                elif change.kind == UNPLAY:
+                    conn.execute(
+                        "DELETE FROM history WHERE rowid = (SELECT rowid FROM history"
+                        " WHERE show_id=? AND episode=? AND played_at IS ? LIMIT 1)",
+                        key,
+                    )
+                    _count(conn, change.show_id, change.episode, -1, 0)
+                elif change.kind == FAIL:
+                    _count(conn, change.show_id, change.episode, 0, 1)
+            for show_id in shows:
+                _trim(conn, show_id, max_history)
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_peers(device, seq) VALUES (?, ?)",
+                (device, applied),
+            )
+    finally:
+        conn.close()
+    return applied - start
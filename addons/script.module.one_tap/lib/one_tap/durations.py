@@ -0,0 +1,195 @@
+"""Episode durations read from the container headers.
+
+Nothing but a few kilobytes of each file is read, so probing a whole show
+on a NAS stays cheap:
+
+* MP4 — the top-level atoms are walked header by header (see
+  :func:`one_tap.readahead.find_atom`) to the ``moov`` atom, whose ``mvhd``
+  child holds the time scale and duration;
+* Matroska — the first :data:`HEAD_BYTES` are parsed for the segment
+  ``Info`` element with its ``TimecodeScale`` and ``Duration``.  Files
+  written without a duration (e.g. recordings) are measured by the latest
+  cluster timestamp or cue point time found in the final
+  :data:`TAIL_BYTES`, which falls short by at most one cluster.
+
+The randomizer service probes episodes while idle and stores the results
+with :func:`one_tap.catalog.store_durations`, so taps never open files to
+learn their length.
+"""
+from __future__ import annotations
+
+import os
+import re
+import struct
+from typing import Optional, Tuple
+
+from . import vfs
+from .readahead import MP4_EXTENSIONS, find_atom
+
+HEAD_BYTES = 16 * 1024
+TAIL_BYTES = 16 * 1024
+MKV_EXTENSIONS = {".mkv", ".mka", ".webm"}
+
+# Matroska element IDs (marker bits included).
+EBML = 0x1A45DFA3
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+CLUSTER = 0x1F43B675
+CLUSTER_TIMESTAMP = 0xE7
+DEFAULT_TIMECODE_SCALE = 1_000_000  # nanoseconds per tick
+CLUSTER_ID = struct.pack(">I", CLUSTER)
+# A CuePoint whose first child is a CueTime of one to eight bytes.
+CUE_POINT = re.compile(rb"\xbb[\x81-\xff]\xb3([\x81-\x88])")
+
+
+def _vint(buf: bytes, pos: int, marker: bool = False) -> Tuple[int, int]:
+    """Decode the EBML variable size integer at ``pos``; return ``(value, length)``.
+
+    IDs keep their length ``marker`` bit; sizes of all ones (unknown) are
+    returned as ``-1``.
+    """
+
+    if pos >= len(buf) or buf[pos] == 0:
+        raise ValueError("invalid EBML integer")
+    first = buf[pos]
+    length = 9 - first.bit_length()
+    if pos + length > len(buf):
+        raise ValueError("truncated EBML integer")
+    value = first if marker else first & ((1 << (8 - length)) - 1)
+    for byte in buf[pos + 1:pos + length]:
+        value = value << 8 | byte
+    if not marker and value == (1 << (7 * length)) - 1:
+        value = -1
+    return value, length
+
+
+def _element(buf: bytes, pos: int) -> Tuple[int, int, int]:
+    """Return ``(id, size, data offset)`` of the element at ``pos``."""
+
+    element_id, id_len = _vint(buf, pos, marker=True)
+    size, size_len = _vint(buf, pos + id_len)
+    return element_id, size, pos + id_len + size_len
+
+
+def _uint(data: bytes) -> int:
+    return int.from_bytes(data, "big")
+
+
+def _mkv_info(buf: bytes) -> Tuple[Optional[float], int]:
+    """Return ``(duration in ticks, timecode scale)`` from the file head."""
+
+    scale = DEFAULT_TIMECODE_SCALE
+    element_id, size, pos = _element(buf, 0)
+    if element_id != EBML:
+        raise ValueError("not a Matroska file")
+    pos += size
+    element_id, _size, pos = _element(buf, pos)
+    if element_id != SEGMENT:
+        raise ValueError("no Matroska segment")
+    while pos < len(buf):
+        element_id, size, data = _element(buf, pos)
+        if element_id == CLUSTER or size < 0:
+            break
+        if element_id == INFO:
+            duration = None
+            child = data
+            while child < min(data + size, len(buf)):
+                child_id, child_size, child_data = _element(buf, child)
+                value = buf[child_data:child_data + child_size]
+                if child_id == TIMECODE_SCALE:
+                    scale = _uint(value)
+                elif child_id == DURATION and child_size in (4, 8):
+                    duration = struct.unpack(">f" if child_size == 4 else ">d", value)[0]
+                child = child_data + child_size
+            return duration, scale
+        pos = data + size
+    return None, scale
+
+
+def _last_timestamp(tail: bytes) -> Optional[int]:
+    """Return the latest cluster timestamp or cue time found in ``tail``."""
+
+    latest = None
+    pos = tail.rfind(CLUSTER_ID)
+    while pos >= 0:
+        try:
+            _cluster, _size, data = _element(tail, pos)
+            child_id, child_size, child_data = _element(tail, data)
+            if child_id == CLUSTER_TIMESTAMP:
+                latest = _uint(tail[child_data:child_data + child_size])
+                break
+        except ValueError:
+            pass
+        pos = tail.rfind(CLUSTER_ID, 0, pos)
+    for match in CUE_POINT.finditer(tail):
+        length = match.group(1)[0] & 0x0F
+        value = tail[match.end():match.end() + length]
+        if len(value) == length:
+            latest = max(latest or 0, _uint(value))
+    return latest
+
+
+def mkv_duration(f, size: int) -> Optional[float]:
+    """Return the duration in seconds of the open Matroska file ``f``."""
+
+    f.seek(0)
+    head = f.read(min(HEAD_BYTES, size))
+    try:
+        ticks, scale = _mkv_info(head)
+    except ValueError:
+        return None
+    if ticks is None:
+        start = max(size - TAIL_BYTES, 0)
+        f.seek(start)
+        ticks = _last_timestamp(f.read(size - start))
+    if ticks is None:
+        return None
+    return ticks * scale / 1e9
+
+
+def mp4_duration(f, size: int) -> Optional[float]:
+    """Return the duration in seconds of the open MP4 file ``f``."""
+
+    atom = find_atom(f, size, b"moov")
+    if not atom:
+        return None
+    offset, length = atom
+    pos = offset + 8
+    while pos + 8 <= offset + length:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        child_len, kind = struct.unpack(">I4s", header)
+        if child_len < 8:
+            return None
+        if kind == b"mvhd":
+            body = f.read(32)
+            if body[:1] == b"\x01":
+                if len(body) < 32:
+                    return None
+                timescale, duration = struct.unpack(">IQ", body[20:32])
+            else:
+                if len(body) < 20:
+                    return None
+                timescale, duration = struct.unpack(">II", body[12:20])
+            return duration / timescale if timescale else None
+        pos += child_len
+    return None
+
+
+def probe(path: str) -> Optional[float]:
+    """Return the duration of episode ``path`` in seconds, or ``None``."""
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in MP4_EXTENSIONS:
+        parse = mp4_duration
+    elif ext in MKV_EXTENSIONS:
+        parse = mkv_duration
+    else:
+        return None
+    size = vfs.stat(path)[0]
+    with vfs.open_read(path) as f:
+        return parse(f, size)
@@ -0,0 +1,197 @@
+"""Compact episode lists for boxes with little memory.
+
+A show folder listed as plain strings repeats the share and directory
+prefix in every path.  :class:`EpisodeList` keeps each directory once in
+an interned table and every file name as UTF-8 in one packed buffer, with
+the boundaries and directory of each entry in :mod:`array` columns.  Path
+strings are only built for the entries that are actually read.
+
+Slicing, :meth:`~EpisodeList.rotate`, :meth:`~EpisodeList.without`,
+:meth:`~EpisodeList.shuffled` and :meth:`~EpisodeList.promote` return views
+that share those buffers and only hold an index per entry, so selecting
+candidates never copies the names.
+"""
+from __future__ import annotations
+
+import os
+import random
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Union
+
+
+def _split(path: str) -> int:
+    """Return the index after the last path separator of ``path``."""
+
+    return max(path.rfind("/"), path.rfind("\\")) + 1
+
+
+class EpisodeList(Sequence):
+    """Read-only sequence of episode paths stored without per-path strings."""
+
+    __slots__ = ("_dirs", "_dir_index", "_dir_ids", "_names", "_offsets", "_view")
+
+    def __init__(
+        self,
+        dirs: List[str],
+        dir_index: Dict[str, int],
+        dir_ids: array,
+        names: bytes,
+        offsets: array,
+        view: Union[range, array],
+    ) -> None:
+        self._dirs = dirs
+        self._dir_index = dir_index
+        self._dir_ids = dir_ids
+        self._names = names
+        self._offsets = offsets
+        # Positions into the columns above, in list order.
+        self._view = view
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[str]) -> "EpisodeList":
+        """Pack ``paths``; an :class:`EpisodeList` is returned unchanged."""
+
+        if isinstance(paths, EpisodeList):
+            return paths
+        dirs: List[str] = []
+        dir_index: Dict[str, int] = {}
+        ids = []
+        names = []
+        for path in paths:
+            cut = _split(path)
+            directory = path[:cut]
+            number = dir_index.get(directory)
+            if number is None:
+                number = dir_index[directory] = len(dirs)
+                dirs.append(sys.intern(directory))
+            ids.append(number)
+            names.append(path[cut:])
+        return cls._pack(dirs, dir_index, array("I", ids), names)
+
+    @classmethod
+    def _pack(
+        cls, dirs: List[str], dir_index: Dict[str, int], dir_ids: array, names: List[str]
+    ) -> "EpisodeList":
+        encoded = [n.encode("utf-8") for n in names]
+        offsets = array("I", [0])
+        offsets.extend(accumulate(map(len, encoded)))
+        return cls(dirs, dir_index, dir_ids, b"".join(encoded), offsets, range(len(encoded)))
+
+    @classmethod
+    def from_listing(cls, path: str, names: Iterable[str]) -> "EpisodeList":
+        """Pack the files ``names`` of the directory ``path``."""
+
+        directory = sys.intern(os.path.join(path, ""))
+        names = list(names)
+        return cls._pack([directory], {directory: 0}, array("I", [0]) * len(names), names)
+
+    def _path(self, i: int) -> str:
+        name = self._names[self._offsets[i] : self._offsets[i + 1]]
+        return self._dirs[self._dir_ids[i]] + name.decode("utf-8")
+
+    def _with(self, view: Union[range, array]) -> "EpisodeList":
+        return EpisodeList(
+            self._dirs, self._dir_index, self._dir_ids, self._names, self._offsets, view
+        )
+
+    def _find(self, path: str) -> int:
+        """Return the column position of ``path``, or -1."""
+
+        cut = _split(path)
+        number = self._dir_index.get(path[:cut])
+        if number is None:
+            return -1
+        name = path[cut:].encode("utf-8")
+        offsets = self._offsets
+        pos = self._names.find(name)
+        while pos >= 0:
+            i = bisect_left(offsets, pos)
+            if (
+                i < len(offsets) - 1
+                and offsets[i] == pos
+                and offsets[i + 1] == pos + len(name)
+                and self._dir_ids[i] == number
+            ):
+                return i
+            pos = self._names.find(name, pos + 1)
+        return -1
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._with(self._view[key])
+        return self._path(self._view[key])
+
+    def __iter__(self) -> Iterator[str]:
+        for i in self._view:
+            yield self._path(i)
+
+    def __contains__(self, path: object) -> bool:
+        if not isinstance(path, str):
+            return False
+        try:
+            self.index(path)
+        except ValueError:
+            return False
+        return True
+
+    def index(self, path: str, start: int = 0, stop: int = sys.maxsize) -> int:
+        found = self._find(path)
+        if found < 0:
+            raise ValueError(f"{path!r} is not in the list")
+        pos = self._view.index(found)
+        if not start <= pos < stop:
+            raise ValueError(f"{path!r} is not in the list")
+        return pos
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (EpisodeList, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"<EpisodeList of {len(self)} episodes>"
+
+    def without(self, positions: Iterable[int]) -> "EpisodeList":
+        """Return a view leaving out the entries at ``positions``."""
+
+        view = array("I", self._view)
+        for i in sorted(set(positions), reverse=True):
+            del view[i]
+        return self._with(view)
+
+    def rotate(self, start: int) -> "EpisodeList":
+        """Return a view starting at ``start`` and wrapping around."""
+
+        view = array("I", self._view[start:])
+        view.extend(self._view[:start])
+        return self._with(view)
+
+    def shuffled(self) -> "EpisodeList":
+        """Return a view in random order."""
+
+        view = array("I", self._view)
+        random.shuffle(view)
+        return self._with(view)
+
+    def promote(self, path: str) -> "EpisodeList":
+        """Return a view with ``path`` moved to the front.
+
+        ``path`` may be one this view leaves out (e.g. a recently played
+        episode dropped by :meth:`without`) as long as the listing holds it.
+        """
+
+        found = self._find(path)
+        if found < 0:
+            raise ValueError(f"{path!r} is not in the list")
+        view = array("I", [found])
+        view.extend(i for i in self._view if i != found)
+        return self._with(view)
@@ -0,0 +1,91 @@
+r"""Compact recordings of player events for offline replay.
+
+When ``diagnostics.record_events`` is enabled in the configuration, taps and
+player callbacks are appended to a tab separated file, one line each::
+
+    <unix time>\t<source>\t<event>\t<detail>
+
+``detail`` is the show ID for ``tap`` (tile press), ``tap_ignored``
+(debounced press) and ``advance`` (service initiated) invocations of the
+playback controller and the playing file for player events.  The file is
+rotated once it reaches :data:`MAX_BYTES`, so two generations are kept at
+most.  ``tools/replay_events.py`` feeds a recording back through the real
+selection and history code.
+"""
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from . import config
+
+EVENTS_PATH = "special://profile/addon_data/service.one_tap.random/events.tsv"
+MAX_BYTES = 1024 * 1024
+
+_enabled = False
+
+
+class Event(NamedTuple):
+    time: float
+    source: str
+    event: str
+    detail: str
+
+
+def _path() -> Path:
+    return config._resolve(EVENTS_PATH)
+
+
+def configure(cfg: Dict[str, Any]) -> None:
+    """Enable recording according to the ``diagnostics`` block of ``cfg``."""
+
+    global _enabled
+    _enabled = bool(cfg.get("diagnostics", {}).get("record_events", False))
+
+
+def record(source: str, event: str, detail: Optional[str] = "") -> None:
+    """Append ``event`` if recording is enabled."""
+
+    if not _enabled:
+        return
+    detail = (detail or "").replace("\t", " ").replace("\n", " ")
+    line = f"{time.time():.3f}\t{source}\t{event}\t{detail}\n"
+    path = _path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rotate(MAX_BYTES)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError:  # pragma: no cover - recording must never break playback
+        pass
+
+
+def rotate(max_bytes: int = 0) -> bool:
+    """Start a new recording once the current one holds ``max_bytes`` or more."""
+
+    path = _path()
+    try:
+        if path.stat().st_size < max(max_bytes, 1):
+            return False
+        os.replace(path, path.with_suffix(".1.tsv"))
+    except OSError:
+        return False
+    return True
+
+
+def load(path: Path) -> List[Event]:
+    """Parse a recording written by :func:`record`."""
+
+    events = []
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 4:
+                continue
+            try:
+                events.append(Event(float(parts[0]), parts[1], parts[2], parts[3]))
+            except ValueError:
+                continue
+    return events
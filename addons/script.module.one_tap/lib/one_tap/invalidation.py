@@ -0,0 +1,209 @@
+"""Cross-process invalidation of cached state.
+
+The plugin, the randomizer service and the caregiver menu run in separate
+interpreters and each may keep shared state in memory.  Whenever one of
+them changes that state it calls :func:`publish` with a typed event:
+
+* :data:`CONFIG` — ``config.json`` was saved;
+* :data:`HISTORY` — the history of show ``key`` was purged (all shows when
+  ``key`` is empty);
+* :data:`CATALOG` — the stored listing of tile path ``key`` changed.
+
+Events are numbered and the last :data:`KEEP` are kept in
+``invalidation.json``; inside Kodi they are also broadcast with
+``JSONRPC.NotifyAll``.  A process with a monitor calls :func:`attach` and
+passes its notifications to :func:`handle_notification`.  Any other process
+calls :func:`refresh` before serving cached state, which reads the
+generation file only when it changed on disk.  Subscribers are called with
+the event's key and drop just those entries; a process that missed events
+is told to drop everything (an empty key) for every kind.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import config, jsonrpc, locks
+from .logging import get_logger
+
+try:  # pragma: no cover - depends on Kodi
+    import xbmc  # type: ignore
+except ImportError:  # pragma: no cover - desktop/dev
+    xbmc = None  # type: ignore
+
+STATE_PATH = "special://profile/addon_data/plugin.one_tap.play/invalidation.json"
+SENDER = "one_tap"
+MESSAGE = "one_tap.invalidate"
+KEEP = 64
+
+CONFIG = "config"
+HISTORY = "history"
+CATALOG = "catalog"
+KINDS = (CONFIG, HISTORY, CATALOG)
+
+logger = get_logger("one_tap.invalidation")
+
+_subscribers: Dict[str, List[Callable[[str], None]]] = {kind: [] for kind in KINDS}
+_lock = threading.RLock()
+# Generation of the last event applied in this process.
+_seen: Optional[int] = None
+# (path, mtime, size) of the generation file when it was last read.
+_stamp: Optional[Tuple[str, int, int]] = None
+_attached = False
+
+
+class Event(NamedTuple):
+    generation: int
+    kind: str
+    key: str
+
+
+def subscribe(kind: str, callback: Callable[[str], None]) -> None:
+    """Call ``callback(key)`` for every ``kind`` event."""
+
+    if kind not in KINDS:
+        raise ValueError(f"unknown event kind {kind!r}")
+    _subscribers[kind].append(callback)
+
+
+def unsubscribe(kind: str, callback: Callable[[str], None]) -> None:
+    if callback in _subscribers[kind]:
+        _subscribers[kind].remove(callback)
+
+
+def attach() -> None:
+    """Declare that this process forwards Kodi notifications to the bus."""
+
+    global _attached
+    poll()  # later notifications are numbered from here
+    _attached = True
+
+
+def detach() -> None:
+    global _attached
+    _attached = False
+
+
+def _path() -> Path:
+    return config._resolve(STATE_PATH)
+
+
+def _read() -> Dict[str, Any]:
+    try:
+        with _path().open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"generation": 0, "events": []}
+
+
+def _write(data: Dict[str, Any]) -> None:
+    path = _path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _dispatch(events: Iterable[Event]) -> None:
+    for event in events:
+        for callback in list(_subscribers.get(event.kind, ())):
+            try:
+                callback(event.key)
+            except Exception as exc:  # one broken subscriber must not block others
+                logger.error("Invalidation of %s %r failed: %s", event.kind, event.key, exc)
+
+
+def _apply(data: Dict[str, Any]) -> None:
+    global _seen
+    generation = data["generation"]
+    if _seen is None:
+        # Nothing is cached yet, so earlier events do not matter.
+        _seen = generation
+        return
+    if generation == _seen:
+        return
+    events = [Event(*e) for e in data["events"] if e[0] > _seen]
+    if generation < _seen or not events or events[0].generation != _seen + 1:
+        logger.debug("Missed invalidation events; dropping all cached state")
+        events = [Event(generation, kind, "") for kind in KINDS]
+    _seen = generation
+    _dispatch(events)
+
+
+def poll() -> None:
+    """Apply the events in the generation file that were not applied yet."""
+
+    global _stamp
+    path = _path()
+    try:
+        st = path.stat()
+        stamp = (str(path), st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = (str(path), 0, 0)
+    with _lock:
+        if stamp == _stamp:
+            return
+        _stamp = stamp
+        _apply(_read())
+
+
+def refresh() -> None:
+    """Catch up with other processes unless notifications arrive by themselves."""
+
+    if not _attached:
+        poll()
+
+
+def publish(kind: str, key: str = "") -> int:
+    """Record a ``kind`` event for ``key`` and tell every process about it."""
+
+    if kind not in KINDS:
+        raise ValueError(f"unknown event kind {kind!r}")
+    with locks.locked("invalidation"):
+        data = _read()
+        generation = data["generation"] + 1
+        data["generation"] = generation
+        data["events"] = (data["events"] + [[generation, kind, key]])[-KEEP:]
+        _write(data)
+    with _lock:
+        _apply(data)
+    if xbmc:
+        try:
+            jsonrpc.call(
+                "JSONRPC.NotifyAll",
+                {
+                    "sender": SENDER,
+                    "message": MESSAGE,
+                    "data": {"generation": generation, "kind": kind, "key": key},
+                },
+            )
+        except jsonrpc.KodiNotAvailable:  # pragma: no cover - defensive
+            pass
+    return generation
+
+
+def handle_notification(sender: str, method: str, data: str) -> bool:
+    """Apply a notification sent by :func:`publish`; return whether it was one."""
+
+    global _seen
+    if method != f"Other.{MESSAGE}":
+        return False
+    try:
+        payload = json.loads(data or "{}") or {}
+    except ValueError:
+        payload = {}
+    generation = payload.get("generation")
+    with _lock:
+        if _seen is not None and generation == _seen + 1 and payload.get("kind") in KINDS:
+            _seen = generation
+            _dispatch([Event(generation, payload["kind"], payload.get("key", ""))])
+        elif _seen is None or not isinstance(generation, int) or generation > _seen:
+            poll()
+    return True
+
+
+subscribe(CONFIG, config.forget)
@@ -30,7 +30,18 @@ def call(method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]
         return {}
 
 
-def play_file(path: str) -> Dict[str, Any]:
-    """Open ``path`` in Kodi's active player."""
-
-    return call("Player.Open", {"item": {"file": path}})
+def play_file(path: str, resume: float = 0.0) -> Dict[str, Any]:
+    """Open ``path`` in Kodi's active player, ``resume`` seconds in."""
+
+    params: Dict[str, Any] = {"item": {"file": path}}
+    if resume > 0:
+        seconds = int(resume)
+        params["options"] = {
+            "resume": {
+                "hours": seconds // 3600,
+                "minutes": seconds // 60 % 60,
+                "seconds": seconds % 60,
+                "milliseconds": int((resume - seconds) * 1000),
+            }
+        }
+    return call("Player.Open", params)
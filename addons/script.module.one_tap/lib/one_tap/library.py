@@ -0,0 +1,166 @@
+"""Episodes of tiles backed by Kodi's scraped video library.
+
+A tile whose ``path`` is ``library://tvshows/<tvshowid>`` lists the files of
+that TV show through ``VideoLibrary.GetEpisodes`` instead of a folder.  Only
+the fields in :data:`PROPERTIES` are requested, in pages of
+:data:`PAGE_SIZE`.  The episodes seen so far and the newest ``dateadded``
+value are kept per show in ``library/<tvshowid>.json``; later refreshes
+only ask for episodes added after that mark, and a full
+listing is fetched once :data:`FULL_REFRESH` has passed so removals that
+were missed are picked up.  Between refreshes the service applies
+``VideoLibrary.OnUpdate`` and ``OnRemove`` notifications with
+:func:`updated` and :func:`removed`.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import config, jsonrpc
+
+PREFIX = "library://tvshows/"
+STATE_DIR = "special://profile/addon_data/service.one_tap.random/library"
+PAGE_SIZE = 500
+PROPERTIES = ["file", "season", "episode", "dateadded"]
+FULL_REFRESH = 24 * 3600
+
+
+class LibraryUnavailable(OSError):
+    """Raised when the video library cannot be queried."""
+
+
+def is_library(path: str) -> bool:
+    return path.startswith(PREFIX)
+
+
+def _tvshowid(path: str) -> int:
+    return int(path[len(PREFIX):].strip("/"))
+
+
+def _state_path(tvshowid: int) -> Path:
+    return config._resolve(STATE_DIR) / f"{tvshowid}.json"
+
+
+def _load(tvshowid: int) -> Dict[str, Any]:
+    try:
+        with _state_path(tvshowid).open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"refreshed": 0, "since": "", "items": {}}
+
+
+def _save(tvshowid: int, state: Dict[str, Any]) -> None:
+    path = _state_path(tvshowid)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _call(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        response = jsonrpc.call(method, params)
+    except jsonrpc.KodiNotAvailable as exc:
+        raise LibraryUnavailable(str(exc)) from exc
+    if "error" in response:
+        raise LibraryUnavailable(f"{method} failed: {response['error']}")
+    return response.get("result") or {}
+
+
+def _fetch(tvshowid: int, since: str = "") -> Iterator[Dict[str, Any]]:
+    """Yield the episodes of ``tvshowid`` added after ``since``, page by page."""
+
+    start = 0
+    while True:
+        params: Dict[str, Any] = {
+            "tvshowid": tvshowid,
+            "properties": PROPERTIES,
+            "sort": {"method": "episode", "order": "ascending"},
+            "limits": {"start": start, "end": start + PAGE_SIZE},
+        }
+        if since:
+            params["filter"] = {"field": "dateadded", "operator": "after", "value": since}
+        result = _call("VideoLibrary.GetEpisodes", params)
+        page = result.get("episodes") or []
+        yield from page
+        start += len(page)
+        if not page or start >= result.get("limits", {}).get("total", 0):
+            return
+
+
+def _item(episode: Dict[str, Any]) -> List[Any]:
+    return [episode["file"], episode.get("season", 0), episode.get("episode", 0)]
+
+
+def _mark(since: str, episode: Dict[str, Any]) -> str:
+    # Only ``dateadded`` is filtered on; a later ``lastmodified`` of an old
+    # episode would skip episodes added before it.
+    return max(since, episode.get("dateadded") or "")
+
+
+def _ordered(items: Dict[str, List[Any]]) -> List[str]:
+    return [v[0] for v in sorted(items.values(), key=lambda v: (v[1], v[2], v[0]))]
+
+
+def refresh(path: str) -> List[str]:
+    """Bring the stored episodes of the library tile ``path`` up to date."""
+
+    tvshowid = _tvshowid(path)
+    state = _load(tvshowid)
+    now = time.time()
+    if not state["items"] or now - state.get("refreshed", 0) >= FULL_REFRESH:
+        state = {"refreshed": now, "since": "", "items": {}}
+    items = state["items"]
+    since = state["since"]
+    for episode in _fetch(tvshowid, since):
+        items[str(episode["episodeid"])] = _item(episode)
+        state["since"] = _mark(state["since"], episode)
+    _save(tvshowid, state)
+    return _ordered(items)
+
+
+def episodes(path: str) -> List[str]:
+    """Return the stored episodes of the library tile ``path``."""
+
+    return _ordered(_load(_tvshowid(path))["items"])
+
+
+def updated(episodeid: int) -> Optional[str]:
+    """Apply an ``OnUpdate`` of ``episodeid``; return the tile path it changed."""
+
+    details = _call(
+        "VideoLibrary.GetEpisodeDetails",
+        {"episodeid": episodeid, "properties": PROPERTIES + ["tvshowid"]},
+    ).get("episodedetails")
+    if not details:
+        return None
+    tvshowid = details["tvshowid"]
+    state = _load(tvshowid)
+    if not state["items"]:
+        return None  # not a show any tile refreshed
+    item = _item(details)
+    if state["items"].get(str(episodeid)) == item:
+        return None  # e.g. only the play count changed
+    state["items"][str(episodeid)] = item
+    state["since"] = _mark(state["since"], details)
+    _save(tvshowid, state)
+    return f"{PREFIX}{tvshowid}"
+
+
+def removed(episodeid: int) -> Optional[str]:
+    """Apply an ``OnRemove`` of ``episodeid``; return the tile path it changed."""
+
+    root = config._resolve(STATE_DIR)
+    if not root.exists():
+        return None
+    for state_file in root.glob("*.json"):
+        tvshowid = int(state_file.stem)
+        state = _load(tvshowid)
+        if state["items"].pop(str(episodeid), None) is not None:
+            _save(tvshowid, state)
+            return f"{PREFIX}{tvshowid}"
+    return None
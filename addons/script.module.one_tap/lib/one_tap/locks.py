@@ -0,0 +1,78 @@
+"""Cross-process locking and debouncing.
+
+Every tile press starts a separate playback controller process, so state
+shared between presses has to be coordinated through the filesystem.
+:func:`file_lock` holds an exclusive OS level lock on a lock file (``fcntl``
+on Linux/Android, ``msvcrt`` on Windows) which is released automatically if
+the holder dies.  :func:`claim` builds a debounce window on top of it.
+"""
+from __future__ import annotations
+
+import os
+import time
+import urllib.parse
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+    import msvcrt  # type: ignore
+
+LOCK_DIR = "special://profile/addon_data/plugin.one_tap.play/locks"
+
+
+def _dir() -> Path:
+    return config._resolve(LOCK_DIR)
+
+
+def _name(key: str) -> str:
+    return urllib.parse.quote(key, safe="")
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` for the duration of the block."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:  # pragma: no cover - Windows
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        yield
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def locked(key: str) -> Iterator[None]:
+    """Hold the named cross-process lock ``key``."""
+
+    with file_lock(_dir() / f"{_name(key)}.lock"):
+        yield
+
+
+def claim(key: str, window: float) -> bool:
+    """Return ``True`` unless ``key`` was claimed within the last ``window`` seconds.
+
+    The first caller of a burst wins and every other caller inside the
+    window is told to back off, no matter which process it runs in.
+    """
+
+    stamp = _dir() / f"{_name(key)}.stamp"
+    with locked(key):
+        now = time.time()
+        try:
+            last = float(stamp.read_text(encoding="ascii") or 0)
+        except (OSError, ValueError):
+            last = 0.0
+        if 0 <= now - last < window:
+            return False
+        stamp.write_text(repr(now), encoding="ascii")
+        return True
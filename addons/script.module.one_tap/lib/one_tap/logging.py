@@ -1,41 +1,154 @@
-"""Logging helper usable both inside and outside Kodi."""
+"""Logging helper usable both inside and outside Kodi.
+
+Messages take ``%``-style arguments which are only interpolated once a
+record passed the configured level, so disabled debug calls cost a single
+comparison.  Keyword arguments are appended as ``key=value`` fields.  When
+:func:`start_writer` has been called records are handed to a background
+thread, keeping ``xbmc.log`` I/O out of player callbacks.
+"""
 from __future__ import annotations
 
 import logging
+import queue
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
 try:  # pragma: no cover - depends on Kodi
     import xbmc  # type: ignore
 except ImportError:  # pragma: no cover - desktop/dev
     xbmc = None  # type: ignore
 
+DEFAULT_LEVEL = logging.INFO
+# Records queued for the writer thread before new ones are dropped.
+QUEUE_SIZE = 1000
+
+_level = DEFAULT_LEVEL
+_writer: Optional["_Writer"] = None
+
+Record = Tuple[int, str, str, Tuple[Any, ...], Dict[str, Any]]
+
+
+def _format(msg: str, args: Tuple[Any, ...], fields: Dict[str, Any]) -> str:
+    if args:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = " ".join([msg, *map(str, args)])
+    if fields:
+        msg += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+    return msg
+
+
+def _kodi_level(level: int) -> int:
+    if level >= logging.ERROR:
+        return getattr(xbmc, "LOGERROR", 3)
+    if level >= logging.WARNING:
+        return getattr(xbmc, "LOGWARNING", 2)
+    if level >= logging.INFO:
+        return getattr(xbmc, "LOGINFO", 1)
+    return getattr(xbmc, "LOGDEBUG", 0)
+
+
+def _emit(record: Record) -> None:
+    level, name, msg, args, fields = record
+    text = _format(msg, args, fields)
+    if xbmc:
+        xbmc.log(f"[{name}] {text}", _kodi_level(level))
+    else:
+        logging.getLogger(name).log(level, text)
+
+
+class _Writer(threading.Thread):
+    """Daemon thread formatting and writing queued records."""
+
+    def __init__(self) -> None:
+        super().__init__(name="one_tap.log", daemon=True)
+        self.queue: "queue.Queue[Optional[Record]]" = queue.Queue(QUEUE_SIZE)
+        self.dropped = 0
+
+    def put(self, record: Record) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self) -> None:
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            try:
+                _emit(record)
+            except Exception:  # pragma: no cover - never kill the writer
+                pass
+
+
+def set_level(level: Union[int, str]) -> None:
+    """Drop records below ``level`` (a number or name such as ``"debug"``)."""
+
+    global _level
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = DEFAULT_LEVEL
+    _level = level
+
+
+def configure(cfg: Dict[str, Any]) -> None:
+    """Apply the ``log`` block of the caregiver configuration."""
+
+    set_level(cfg.get("log", {}).get("level", DEFAULT_LEVEL))
+
+
+def start_writer() -> None:
+    """Write records from a background thread from now on."""
+
+    global _writer
+    if _writer is None:
+        _writer = _Writer()
+        _writer.start()
+
+
+def stop_writer(timeout: float = 5.0) -> None:
+    """Flush queued records and return to synchronous writing."""
+
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.queue.put(None)
+        writer.join(timeout)
+
 
 class Logger:
     """Small wrapper that mimics :mod:`logging` and ``xbmc.log``."""
 
     def __init__(self, name: str = "one_tap") -> None:
         self.name = name
-        if xbmc:
-            self._use_kodi = True
-        else:
-            self._use_kodi = False
-            self._logger = logging.getLogger(name)
 
-    def _log(self, level: int, msg: str) -> None:
-        if self._use_kodi:
-            xbmc.log(f"[{self.name}] {msg}", level)
+    def isEnabledFor(self, level: int) -> bool:
+        return level >= _level
+
+    def log(self, level: int, msg: str, *args: Any, **fields: Any) -> None:
+        if level < _level:
+            return
+        record = (level, self.name, msg, args, fields)
+        writer = _writer
+        if writer is not None:
+            writer.put(record)
         else:
-            self._logger.log(level, msg)
+            _emit(record)
 
-    def info(self, msg: str) -> None:
-        self._log(logging.INFO, msg)
+    def info(self, msg: str, *args: Any, **fields: Any) -> None:
+        self.log(logging.INFO, msg, *args, **fields)
 
-    def warning(self, msg: str) -> None:
-        self._log(logging.WARNING, msg)
+    def warning(self, msg: str, *args: Any, **fields: Any) -> None:
+        self.log(logging.WARNING, msg, *args, **fields)
 
-    def error(self, msg: str) -> None:
-        self._log(logging.ERROR, msg)
+    def error(self, msg: str, *args: Any, **fields: Any) -> None:
+        self.log(logging.ERROR, msg, *args, **fields)
 
-    def debug(self, msg: str) -> None:
-        self._log(logging.DEBUG, msg)
+    def debug(self, msg: str, *args: Any, **fields: Any) -> None:
+        self.log(logging.DEBUG, msg, *args, **fields)
 
 
 def get_logger(name: str = "one_tap") -> Logger:
@@ -0,0 +1,260 @@
+"""Local copies of upcoming episodes for boxes on slow networks.
+
+The randomizer service copies the next predicted episodes of each tile to
+local storage so high-bitrate files do not have to be streamed over Wi-Fi.
+Copies are written in chunks to a ``.part`` file and only renamed into place
+once their size matches the source, so the playback controller never opens a
+partial copy.  An interrupted copy keeps its ``.part`` file, named after the
+size and modification time of the source, and the next fill continues it.
+The modification time of a finished copy records when it was last played
+and drives least-recently-played eviction under the byte budget.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from . import config, vfs
+from .logging import get_logger
+
+CACHE_DIR = "special://profile/addon_data/service.one_tap.random/media_cache"
+INDEX_NAME = "index.json"
+DEFAULT_MAX_MB = 4096
+DEFAULT_EPISODES_PER_SHOW = 2
+CHUNK_SIZE = 1024 * 1024
+# Pause between chunks while something is playing.
+THROTTLE_DELAY = 0.5
+
+logger = get_logger("one_tap.media_cache")
+
+
+def _dir() -> Path:
+    return config._resolve(CACHE_DIR)
+
+
+def _local_name(source: str) -> str:
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:20]
+    return digest + os.path.splitext(source)[1].lower()
+
+
+def _load_index() -> Dict[str, Dict[str, float]]:
+    path = _dir() / INDEX_NAME
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable media cache index %s: %s", path, exc)
+        return {}
+
+
+def _save_index(index: Dict[str, Dict[str, float]]) -> None:
+    path = _dir() / INDEX_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+def _complete(entry: Dict[str, float], local: Path) -> bool:
+    try:
+        return local.stat().st_size == entry["size"]
+    except OSError:
+        return False
+
+
+def local_path(source: str) -> Optional[str]:
+    """Return the complete local copy of ``source`` if one exists."""
+
+    entry = _load_index().get(source)
+    if not entry:
+        return None
+    local = _dir() / _local_name(source)
+    return str(local) if _complete(entry, local) else None
+
+
+def source_for(path: str) -> Optional[str]:
+    """Return the source of ``path`` if it is a local copy, else ``None``."""
+
+    local = Path(path)
+    if local.parent != _dir():
+        return None
+    for source in _load_index():
+        if _local_name(source) == local.name:
+            return source
+    return None
+
+
+def complete_sources() -> List[str]:
+    """Return every source that has a complete local copy."""
+
+    return sorted(
+        source
+        for source, entry in _load_index().items()
+        if _complete(entry, _dir() / _local_name(source))
+    )
+
+
+def sources_under(folder: str) -> List[str]:
+    """Return the sources in ``folder`` that have a complete local copy."""
+
+    prefix = os.path.join(folder, "")
+    return [source for source in complete_sources() if source.startswith(prefix)]
+
+
+def touch(source: str) -> None:
+    """Mark the local copy of ``source`` as just played."""
+
+    local = _dir() / _local_name(source)
+    try:
+        now = time.time()
+        os.utime(local, (now, now))
+    except OSError:
+        pass
+
+
+def _part(dest: Path, size: int, mtime: float) -> Path:
+    return dest.with_name(f"{dest.name}.{size}-{int(mtime)}.part")
+
+
+def _copy(
+    source: str,
+    dest: Path,
+    part: Path,
+    should_throttle: Callable[[], bool],
+    should_abort: Callable[[], bool],
+    chunk_size: int,
+) -> bool:
+    """Stream ``source`` into ``dest`` chunk by chunk, continuing ``part``.
+
+    Returns ``False`` if aborted; the ``.part`` file is kept then.
+    """
+
+    for stale in dest.parent.glob(dest.name + ".*.part"):
+        if stale != part:
+            stale.unlink(missing_ok=True)
+    offset = part.stat().st_size if part.exists() else 0
+    with vfs.open_read(source) as src, part.open("ab") as out:
+        if offset:
+            src.seek(offset)
+        while True:
+            if should_abort():
+                return False
+            data = src.read(chunk_size)
+            if not data:
+                break
+            out.write(data)
+            if should_throttle():
+                time.sleep(THROTTLE_DELAY)
+    os.replace(part, dest)
+    return True
+
+
+def _evict(
+    index: Dict[str, Dict[str, float]], needed: int, max_bytes: int, keep: set
+) -> bool:
+    """Free space for ``needed`` bytes evicting least recently played files."""
+
+    root = _dir()
+    used = sum(e["size"] for e in index.values())
+    if used + needed <= max_bytes:
+        return True
+
+    def last_played(source: str) -> float:
+        try:
+            return (root / _local_name(source)).stat().st_mtime
+        except OSError:
+            return 0.0
+
+    for source in sorted((s for s in index if s not in keep), key=last_played):
+        (root / _local_name(source)).unlink(missing_ok=True)
+        used -= index.pop(source)["size"]
+        logger.info("Evicted cached copy of %s", source)
+        if used + needed <= max_bytes:
+            return True
+    return False
+
+
+def fill_steps(
+    sources: Iterable[str],
+    max_bytes: int,
+    should_throttle: Callable[[], bool] = lambda: False,
+    should_abort: Callable[[], bool] = lambda: False,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Optional[str]]:
+    """Ensure ``sources`` are cached in priority order within ``max_bytes``.
+
+    Existing copies are verified against the size and modification time of
+    their source and re-copied when either changed.  Yields after every
+    copy attempt: the source if it was copied, ``None`` if it failed.
+    """
+
+    wanted = list(dict.fromkeys(sources))
+    root = _dir()
+    root.mkdir(parents=True, exist_ok=True)
+    index = _load_index()
+    # Drop entries whose local copy went missing.
+    for source in [s for s, e in index.items() if not _complete(e, root / _local_name(s))]:
+        index.pop(source)
+    # Partial copies are only continued for sources still wanted.
+    prefixes = tuple(_local_name(s) + "." for s in wanted)
+    for part in root.glob("*.part"):
+        if not part.name.startswith(prefixes):
+            part.unlink(missing_ok=True)
+
+    for source in wanted:
+        if should_abort():
+            break
+        try:
+            size, mtime = vfs.stat(source)
+        except OSError as exc:
+            logger.warning("Cannot stat %s: %s", source, exc)
+            yield None
+            continue
+        entry = index.get(source)
+        if entry and entry["size"] == size and entry["mtime"] == mtime:
+            continue
+        if entry:
+            (root / _local_name(source)).unlink(missing_ok=True)
+            index.pop(source)
+        if not _evict(index, size, max_bytes, set(wanted)):
+            logger.info("Cache budget too small for %s", source)
+            continue
+        dest = root / _local_name(source)
+        try:
+            if not _copy(
+                source, dest, _part(dest, size, mtime), should_throttle, should_abort, chunk_size
+            ):
+                break
+        except OSError as exc:
+            logger.warning("Failed to cache %s: %s", source, exc)
+            yield None
+            continue
+        if dest.stat().st_size != size:
+            logger.warning("Cached copy of %s is incomplete", source)
+            dest.unlink(missing_ok=True)
+            yield None
+            continue
+        index[source] = {"size": size, "mtime": mtime}
+        _save_index(index)
+        yield source
+    _save_index(index)
+
+
+def fill(
+    sources: Iterable[str],
+    max_bytes: int,
+    should_throttle: Callable[[], bool] = lambda: False,
+    should_abort: Callable[[], bool] = lambda: False,
+    chunk_size: int = CHUNK_SIZE,
+) -> List[str]:
+    """Run :func:`fill_steps` to the end and return the sources copied."""
+
+    steps = fill_steps(sources, max_bytes, should_throttle, should_abort, chunk_size)
+    return [source for source in steps if source]
@@ -0,0 +1,104 @@
+"""Shared playback state machine for the auto-advance players.
+
+Both the playback controller and the randomizer service register a Kodi
+player and therefore receive every ``onPlayBack*`` callback.  Each player
+reports the event to :func:`transition` and only acts on it when the
+transition is accepted, so one real event leads to exactly one advance no
+matter how many players saw it.  The state is kept in a small JSON file
+guarded by :func:`one_tap.locks.locked` because the players live in
+different Python interpreters.
+
+The machine tracks a single item (the playing file)::
+
+    any --opening--> opening
+    idle/opening/ended/stopped/error --started--> playing
+    opening/playing --ended|stopped|error--> ended|stopped|error
+
+A repeated ``started`` for the playing item and any terminal event for an
+item that already finished, or that is not the current one, are rejected.
+Kodi fails a file it cannot open without reporting it as started, so a
+player that did not see the file start reports the ``error`` without an
+item and it applies to the file being opened; an ``error`` naming another
+file is a late report for the previous one and is rejected.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from . import config, locks
+
+STATE_PATH = "special://profile/addon_data/plugin.one_tap.play/playback.json"
+
+IDLE = "idle"
+OPENING = "opening"
+STARTED = "started"
+ENDED = "ended"
+STOPPED = "stopped"
+ERROR = "error"
+PLAYING = "playing"
+TERMINAL = (ENDED, STOPPED, ERROR)
+
+
+class State(NamedTuple):
+    state: str
+    item: str
+
+
+def _path() -> Path:
+    return config._resolve(STATE_PATH)
+
+
+def _load() -> State:
+    try:
+        data = json.loads(_path().read_text(encoding="utf-8"))
+        return State(data["state"], data["item"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return State(IDLE, "")
+
+
+def _save(state: State) -> None:
+    path = _path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(state._asdict()), encoding="utf-8")
+
+
+def current() -> State:
+    """Return the last accepted state."""
+
+    return _load()
+
+
+def opening(item: str) -> None:
+    """Record that ``item`` is about to be opened by a One-Tap component."""
+
+    with locks.locked("playback"):
+        _save(State(OPENING, item))
+
+
+def transition(event: str, item: Optional[str]) -> bool:
+    """Apply player ``event`` for ``item`` and return whether it is new.
+
+    ``item`` may be empty for terminal events when the player no longer
+    knows the file; the event then applies to the item being tracked.
+    """
+
+    if event != STARTED and event not in TERMINAL:
+        raise ValueError(f"unknown playback event: {event}")
+    with locks.locked("playback"):
+        state = _load()
+        if not item:
+            item = state.item
+        if event == STARTED:
+            if state.state == PLAYING and state.item == item:
+                return False
+            _save(State(PLAYING, item))
+            return True
+        if state.item == item and state.state in TERMINAL:
+            return False
+        if state.item != item and state.state != IDLE:
+            # A late report for a file that was already replaced.
+            return False
+        _save(State(event, item))
+        return True
@@ -0,0 +1,88 @@
+"""Opt-in profiling of single playback controller invocations.
+
+When enabled in the playback controller's settings each invocation runs
+under :mod:`cProfile` and, optionally, :mod:`tracemalloc`.  Every capture is
+stored in ``addon_data`` as ``<stamp>.pstats`` plus ``<stamp>.alloc.txt``
+with the top allocation sites, and only the newest captures are kept.  The
+profilers are imported on demand so disabled profiling costs nothing.
+"""
+from __future__ import annotations
+
+import io
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+from . import config
+
+PROFILE_DIR = "special://profile/addon_data/plugin.one_tap.play/profiles"
+DEFAULT_KEEP = 10
+TOP_ALLOCATIONS = 25
+
+_PSTATS = ".pstats"
+_ALLOC = ".alloc.txt"
+
+
+def _dir() -> Path:
+    return config._resolve(PROFILE_DIR)
+
+
+def run(func: Callable[[], Any], keep: int = DEFAULT_KEEP, trace_memory: bool = False) -> Any:
+    """Call ``func`` under the profiler and store the capture."""
+
+    import cProfile
+
+    root = _dir()
+    root.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+    if trace_memory:
+        import tracemalloc
+
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        profiler.dump_stats(str(root / (stamp + _PSTATS)))
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            top = snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            with (root / (stamp + _ALLOC)).open("w", encoding="utf-8") as f:
+                for stat in top:
+                    f.write(f"{stat}\n")
+        _rotate(keep)
+
+
+def list_captures() -> List[str]:
+    """Return the stored capture stamps, newest first."""
+
+    root = _dir()
+    if not root.exists():
+        return []
+    stamps = [p.name[: -len(_PSTATS)] for p in root.glob("*" + _PSTATS)]
+    return sorted(stamps, reverse=True)
+
+
+def _rotate(keep: int) -> None:
+    root = _dir()
+    for stamp in list_captures()[max(keep, 1):]:
+        for suffix in (_PSTATS, _ALLOC):
+            (root / (stamp + suffix)).unlink(missing_ok=True)
+
+
+def summary(stamp: str, limit: int = 20) -> str:
+    """Return a readable report for capture ``stamp``."""
+
+    import pstats
+
+    root = _dir()
+    out = io.StringIO()
+    stats = pstats.Stats(str(root / (stamp + _PSTATS)), stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+    alloc = root / (stamp + _ALLOC)
+    if alloc.exists():
+        out.write("\nTop allocations:\n")
+        out.write(alloc.read_text(encoding="utf-8"))
+    return out.getvalue()
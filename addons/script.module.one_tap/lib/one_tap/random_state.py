@@ -1,52 +1,170 @@
-"""Shared storage for pre-selected random episodes."""
+"""Shared storage for pre-selected random episodes.
+
+Every show has its own queue file under ``preselected/``: a fixed-width
+header holding the byte offset of the first unconsumed entry, followed by
+one episode per line.  :func:`pop_first` reads one line and rewrites the
+header in place under the show's cross-process lock, so consuming an entry
+costs the same no matter how many shows or entries exist.  Consumed lines
+are dropped by compacting the file once they make up most of it.
+"""
 from __future__ import annotations
 
 import json
+import os
+import urllib.parse
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from . import config
+from . import config, locks
+from .logging import get_logger
 
-# Location for pre-selected episode candidates
+QUEUE_DIR = "special://profile/addon_data/service.one_tap.random/preselected"
+# The single JSON file used before per-show queues; migrated on first use.
 PRESELECT_PATH = "special://profile/addon_data/service.one_tap.random/preselected.json"
+SUFFIX = ".queue"
+HEADER_SIZE = 13  # 12 digit offset plus newline
+# Compact once this many consumed bytes make up over half of a queue file.
+COMPACT_BYTES = 4096
+
+logger = get_logger("one_tap.random_state")
+
+_migrated = False
+
+
+def _dir() -> Path:
+    return config._resolve(QUEUE_DIR)
+
 
+def _queue(show_id: str) -> Path:
+    return _dir() / (urllib.parse.quote(show_id, safe="") + SUFFIX)
 
-def _path() -> Path:
-    return config._resolve(PRESELECT_PATH)
+
+def _header(offset: int) -> bytes:
+    return b"%012d\n" % offset
+
+
+def _migrate() -> None:
+    global _migrated
+    if _migrated:
+        return
+    legacy = config._resolve(PRESELECT_PATH)
+    if legacy.exists():
+        with locks.locked("preselect"):
+            try:
+                with legacy.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                for show_id, candidates in data.items():
+                    with locks.locked(f"preselect:{show_id}"):
+                        if candidates:
+                            _write(_queue(show_id), list(candidates))
+            except FileNotFoundError:
+                pass  # migrated by another process meanwhile
+            except (ValueError, AttributeError, TypeError) as exc:
+                # Queued picks are refilled by the service; drop them.
+                logger.warning("Discarding unreadable %s: %s", legacy, exc)
+            except OSError as exc:
+                logger.warning("Cannot migrate %s: %s", legacy, exc)
+                return  # retried on the next call
+            legacy.unlink(missing_ok=True)
+    _migrated = True
+
+
+def _write(path: Path, candidates: List[str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("wb") as f:
+        f.write(_header(HEADER_SIZE))
+        f.write("".join(f"{c}\n" for c in candidates).encode("utf-8"))
+    os.replace(tmp, path)
+
+
+def _read(path: Path) -> List[str]:
+    try:
+        with path.open("rb") as f:
+            offset = int(f.read(HEADER_SIZE) or HEADER_SIZE)
+            f.seek(offset)
+            data = f.read()
+    except (OSError, ValueError):
+        return []
+    return data.decode("utf-8").splitlines()
 
 
 def load() -> Dict[str, List[str]]:
-    path = _path()
-    if path.exists():
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    _migrate()
+    root = _dir()
+    if not root.exists():
+        return {}
+    data = {}
+    for path in root.glob("*" + SUFFIX):
+        items = _read(path)
+        if items:
+            data[urllib.parse.unquote(path.name[: -len(SUFFIX)])] = items
+    return data
 
 
 def save(data: Dict[str, List[str]]) -> None:
-    path = _path()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    _migrate()
+    current = load()
+    for show_id in current.keys() - data.keys():
+        set(show_id, [])
+    for show_id, candidates in data.items():
+        set(show_id, candidates)
 
 
 def get(show_id: str) -> List[str]:
-    return load().get(show_id, [])
+    _migrate()
+    return _read(_queue(show_id))
 
 
 def set(show_id: str, candidates: List[str]) -> None:
-    data = load()
-    data[show_id] = candidates
-    save(data)
+    _migrate()
+    path = _queue(show_id)
+    with locks.locked(f"preselect:{show_id}"):
+        if candidates:
+            _write(path, candidates)
+        else:
+            path.unlink(missing_ok=True)
 
 
-def consume_first(show_id: str) -> None:
-    data = load()
-    items = data.get(show_id)
-    if items:
-        items = items[1:]
-        if items:
-            data[show_id] = items
-        else:
-            data.pop(show_id, None)
-        save(data)
+def pop_first(show_id: str, expected: Optional[str] = None) -> Optional[str]:
+    """Atomically remove and return the first queued episode of ``show_id``.
+
+    With ``expected`` the head is only removed if it is that episode, so a
+    queue refilled by another process in the meantime is left alone.
+    """
+
+    _migrate()
+    path = _queue(show_id)
+    with locks.locked(f"preselect:{show_id}"):
+        try:
+            f = path.open("r+b")
+        except OSError:
+            return None
+        with f:
+            offset = int(f.read(HEADER_SIZE) or HEADER_SIZE)
+            f.seek(offset)
+            line = f.readline()
+            if not line:
+                return None
+            if expected is not None and line.decode("utf-8").rstrip("\n") != expected:
+                return None
+            offset += len(line)
+            size = f.seek(0, os.SEEK_END)
+            if offset >= size:
+                remaining: Optional[List[str]] = []
+            elif offset > COMPACT_BYTES and offset * 2 > size:
+                f.seek(offset)
+                remaining = f.read().decode("utf-8").splitlines()
+            else:
+                remaining = None
+                f.seek(0)
+                f.write(_header(offset))
+        if remaining == []:
+            path.unlink(missing_ok=True)
+        elif remaining is not None:
+            _write(path, remaining)
+    return line.decode("utf-8").rstrip("\n")
+
+
+def consume_first(show_id: str, expected: Optional[str] = None) -> None:
+    pop_first(show_id, expected)
@@ -0,0 +1,121 @@
+"""Background prefetching of upcoming episodes.
+
+Opening a file on a spun-down NAS can take several seconds.  Reading the
+start of the next predicted episode, and the container index Kodi needs
+before it can show the first frame, wakes the share and warms its caches
+ahead of the tap.  Reads are issued in small chunks with a pause in between
+and stop as soon as ``should_pause`` reports that playback has started so
+prefetching never competes with the stream being watched.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import time
+from typing import Callable, Optional, Tuple
+
+from . import vfs
+
+HEAD_BYTES = 4 * 1024 * 1024
+TAIL_BYTES = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+# Upper bound for a ``moov`` atom read; larger indexes are read partially.
+MAX_INDEX_BYTES = 8 * 1024 * 1024
+CHUNK_DELAY = 0.05
+
+MP4_EXTENSIONS = {".mp4", ".m4v", ".mov"}
+
+
+def _read_range(
+    f,
+    offset: int,
+    length: int,
+    should_pause: Callable[[], bool],
+    chunk_size: int,
+    delay: float,
+) -> bool:
+    """Read ``length`` bytes from ``offset`` discarding the data.
+
+    Returns ``False`` if ``should_pause`` requested an early stop.
+    """
+
+    f.seek(offset)
+    remaining = length
+    while remaining > 0:
+        if should_pause():
+            return False
+        data = f.read(min(chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        if delay:
+            time.sleep(delay)
+    return True
+
+
+def find_atom(f, size: int, name: bytes) -> Optional[Tuple[int, int]]:
+    """Return ``(offset, length)`` of top-level MP4 atom ``name``.
+
+    Only the eight byte atom headers are read, seeking over the payloads,
+    so locating a trailing ``moov`` costs a handful of small reads.
+    """
+
+    offset = 0
+    while offset + 8 <= size:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length, kind = struct.unpack(">I4s", header)
+        if length == 1:
+            ext = f.read(8)
+            if len(ext) < 8:
+                return None
+            length = struct.unpack(">Q", ext)[0]
+        elif length == 0:
+            length = size - offset
+        if length < 8:
+            return None
+        if kind == name:
+            return offset, length
+        offset += length
+    return None
+
+
+def prefetch(
+    path: str,
+    should_pause: Callable[[], bool] = lambda: False,
+    head_bytes: int = HEAD_BYTES,
+    tail_bytes: int = TAIL_BYTES,
+    chunk_size: int = CHUNK_SIZE,
+    delay: float = CHUNK_DELAY,
+) -> bool:
+    """Warm the start and container index of ``path``.
+
+    MP4 files have their ``moov`` atom located and read, wherever it sits in
+    the file.  Other containers keep their index (Matroska cues, AVI
+    ``idx1``) near the end so the last ``tail_bytes`` are read instead.
+
+    Returns ``True`` when the prefetch completed and ``False`` when it was
+    interrupted by ``should_pause``.
+    """
+
+    with vfs.open_read(path) as f:
+        size = vfs.stat(path)[0]
+        head = min(head_bytes, size)
+        if not _read_range(f, 0, head, should_pause, chunk_size, delay):
+            return False
+
+        if os.path.splitext(path)[1].lower() in MP4_EXTENSIONS:
+            atom = find_atom(f, size, b"moov")
+            if not atom:
+                return True
+            offset, length = atom
+            end = min(offset + length, offset + MAX_INDEX_BYTES)
+            start = max(offset, head)
+        else:
+            start = max(size - tail_bytes, head)
+            end = size
+        if start >= end:
+            return True
+        return _read_range(f, start, end - start, should_pause, chunk_size, delay)
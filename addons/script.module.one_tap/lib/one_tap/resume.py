@@ -0,0 +1,92 @@
+"""Write-behind tracking of where each show was left.
+
+The randomizer service samples the player position every
+:data:`SAMPLE_SECONDS` and hands it to a :class:`ResumeTracker`.  Samples
+only replace the show's entry in memory; :meth:`ResumeTracker.flush` writes
+the latest position of every show whose last write is at least
+``flush_seconds`` old in a single transaction, so a playing episode causes
+at most one SQLite write per show per interval.  A forced flush on stop and
+shutdown persists whatever is still pending.  ``on_flush`` is told about
+every batch written, e.g. to publish which shows can be resumed.
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import db
+
+SAMPLE_SECONDS = 10.0
+DEFAULT_FLUSH_SECONDS = 60.0
+# Positions this close to the start are not worth resuming.
+MIN_RESUME_SECONDS = 30.0
+# Episodes watched past this fraction count as finished.
+WATCHED_FRACTION = 0.92
+
+
+def resumable(position: float, total: float) -> bool:
+    """Return whether stopping at ``position`` of ``total`` seconds should resume."""
+
+    if position < MIN_RESUME_SECONDS:
+        return False
+    return total <= 0 or position < total * WATCHED_FRACTION
+
+
+class ResumeTracker:
+    """Coalesce position samples in memory and flush them in batches."""
+
+    def __init__(
+        self,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        on_flush: Optional[
+            Callable[[List[Tuple[str, str, float, float]], List[str]], None]
+        ] = None,
+    ) -> None:
+        self.flush_seconds = flush_seconds
+        self._clock = clock
+        self._on_flush = on_flush
+        # show_id -> (episode, position, total); ``None`` clears the show.
+        self._pending: Dict[str, Optional[Tuple[str, float, float]]] = {}
+        self._written: Dict[str, float] = {}
+
+    def sample(self, show_id: str, episode: str, position: float, total: float) -> None:
+        """Remember that ``episode`` of ``show_id`` is at ``position`` seconds."""
+
+        if resumable(position, total):
+            self._pending[show_id] = (episode, position, total)
+        else:
+            self._pending[show_id] = None
+
+    def finished(self, show_id: str) -> None:
+        """Forget the resume point of ``show_id`` once its episode ended."""
+
+        self._pending[show_id] = None
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self, force: bool = False) -> int:
+        """Write due samples (all of them when ``force``) and return the count."""
+
+        now = self._clock()
+        due = [
+            show_id
+            for show_id in self._pending
+            if force or now - self._written.get(show_id, -self.flush_seconds) >= self.flush_seconds
+        ]
+        if not due:
+            return 0
+        points = []
+        cleared = []
+        for show_id in due:
+            value = self._pending.pop(show_id)
+            self._written[show_id] = now
+            if value is None:
+                cleared.append(show_id)
+            else:
+                points.append((show_id, *value))
+        db.save_resume_points(points, cleared)
+        if self._on_flush:
+            self._on_flush(points, cleared)
+        return len(due)
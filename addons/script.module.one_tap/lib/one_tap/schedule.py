@@ -0,0 +1,148 @@
+"""Time-of-day schedules for the Home tile set.
+
+The configuration may list ``schedule`` rules, each showing some tiles
+during a daily time window::
+
+    "schedule": [
+      {"from": "06:00", "to": "11:00", "tiles": ["123", "456"]},
+      {"from": "19:00", "to": "06:00", "tiles": ["789"]}
+    ]
+
+A window may wrap past midnight and the first matching rule wins; outside
+every window all tiles are shown.  :func:`compile_rules` turns the rules
+into an interval table, stored as ``schedule_table`` by
+:func:`one_tap.config.save_config`: the sorted start minutes of the day's
+blocks, the tiles of each and a digest of the rules it was compiled from,
+so a hand edit of the rules is noticed.  :func:`block_at` finds the
+current block with a binary search and tells how long it lasts, so the
+skin service sets one timer for the next boundary instead of evaluating
+rules.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+Table = Dict[str, list]
+
+
+def _minute(text: str) -> int:
+    """Return the minute of the day of ``"HH:MM"``."""
+
+    try:
+        hour, minute = (int(part) for part in str(text).split(":"))
+    except ValueError:
+        raise ValueError(f"invalid time {text!r}, expected HH:MM") from None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"invalid time {text!r}, expected HH:MM")
+    return hour * 60 + minute
+
+
+def _covers(start: int, end: int, minute: int) -> bool:
+    if start < end:
+        return start <= minute < end
+    if start > end:  # wraps past midnight
+        return minute >= start or minute < end
+    return True
+
+
+def _digest(rules: Any) -> str:
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def compile_rules(rules: Sequence[Dict[str, Any]]) -> Table:
+    """Compile schedule ``rules`` into ``{"starts": [...], "tiles": [...]}``.
+
+    ``starts`` are ascending minutes of the day beginning with 0 and
+    ``tiles`` the show IDs of the block starting there (``None`` for all
+    tiles); ``rules`` holds the digest of the source rules.  Raises
+    ``ValueError`` for malformed rules.
+    """
+
+    windows = []
+    for rule in rules:
+        if not isinstance(rule, dict):
+            raise ValueError(f"schedule rule {rule!r} is not an object")
+        tiles = rule.get("tiles")
+        if not isinstance(tiles, list) or not all(isinstance(t, str) for t in tiles):
+            raise ValueError(f"schedule rule {rule!r} needs a list of tile show IDs")
+        windows.append((_minute(rule.get("from")), _minute(rule.get("to")), tiles))
+    points = sorted({0} | {w[0] for w in windows} | {w[1] for w in windows})
+    starts: List[int] = []
+    blocks: List[Optional[List[str]]] = []
+    for point in points:
+        tiles = next((list(w[2]) for w in windows if _covers(w[0], w[1], point)), None)
+        if blocks and blocks[-1] == tiles:
+            continue
+        starts.append(point)
+        blocks.append(tiles)
+    return {"starts": starts, "tiles": blocks, "rules": _digest(rules)}
+
+
+def table(cfg: Dict[str, Any]) -> Table:
+    """Return the compiled schedule of ``cfg``.
+
+    Rules edited by hand rather than through ``save_config`` are compiled
+    here; raises ``ValueError`` if they are malformed.
+    """
+
+    rules = cfg.get("schedule") or []
+    stored = cfg.get("schedule_table")
+    if stored and stored.get("rules") == _digest(rules):
+        return stored
+    if not isinstance(rules, list):
+        raise ValueError("schedule must be a list of rules")
+    return compile_rules(rules)
+
+
+def _minute_of(now: float) -> float:
+    local = time.localtime(now)
+    return local.tm_hour * 60 + local.tm_min + local.tm_sec / 60
+
+
+def _end(starts: List[int], index: int) -> int:
+    return starts[index + 1] if index + 1 < len(starts) else MINUTES_PER_DAY
+
+
+def block_at(table: Table, now: Optional[float] = None) -> Tuple[int, Optional[List[str]], float]:
+    """Return ``(index, show IDs, seconds left)`` of the block at ``now``."""
+
+    now = time.time() if now is None else now
+    minute = _minute_of(now)
+    starts = table["starts"]
+    index = bisect_right(starts, minute) - 1
+    return index, table["tiles"][index], (_end(starts, index) - minute) * 60
+
+
+def upcoming(
+    table: Table, now: Optional[float] = None
+) -> Optional[Tuple[float, Optional[List[str]]]]:
+    """Return ``(seconds until it starts, show IDs)`` of the next different block.
+
+    Returns ``None`` when the tile set never changes.
+    """
+
+    index, tiles, left = block_at(table, now)
+    starts, blocks = table["starts"], table["tiles"]
+    for step in range(1, len(starts) + 1):
+        following = (index + step) % len(starts)
+        if blocks[following] != tiles:
+            return left, blocks[following]
+        # The last block of the day continues after midnight.
+        left += (_end(starts, following) - starts[following]) * 60
+    return None
+
+
+def tiles_for(cfg: Dict[str, Any], show_ids: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+    """Return the configured tiles of ``show_ids`` in that order, or all of them."""
+
+    tiles = cfg.get("tiles", [])
+    if show_ids is None:
+        return tiles
+    by_id = {t.get("show_id"): t for t in tiles}
+    return [by_id[s] for s in show_ids if s in by_id]
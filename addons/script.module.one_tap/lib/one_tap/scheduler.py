@@ -0,0 +1,113 @@
+"""Idle-time job scheduler for the randomizer service.
+
+Maintenance jobs are generator functions: every ``yield`` ends one step,
+so a job can be sliced across several service ticks.  :meth:`Scheduler.run`
+is called whenever nothing is playing and advances due jobs in priority
+order (lowest number first) until the tick's time slice is used up or
+``should_yield`` reports that playback started; an interrupted job resumes
+at its next step on a later idle tick.  The time a job last completed is
+persisted in ``jobs.json`` so intervals survive restarts of Kodi.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from . import config
+from .logging import get_logger
+
+STATE_PATH = "special://profile/addon_data/service.one_tap.random/jobs.json"
+# Wall time spent on jobs per call of :meth:`Scheduler.run`.
+SLICE_SECONDS = 2.0
+
+logger = get_logger("one_tap.scheduler")
+
+
+class Job(NamedTuple):
+    name: str
+    interval: float
+    priority: int
+    run: Callable[[], Iterator[None]]
+
+
+def _path() -> Path:
+    return config._resolve(STATE_PATH)
+
+
+def load_state() -> Dict[str, float]:
+    """Return the persisted ``{job name: last completion time}`` mapping."""
+
+    path = _path()
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return {k: float(v) for k, v in json.load(f).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def _save_state(state: Dict[str, float]) -> None:
+    path = _path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class Scheduler:
+    """Run :class:`Job` steps in priority order while the box is idle."""
+
+    def __init__(
+        self,
+        jobs: List[Job],
+        should_yield: Callable[[], bool],
+        slice_seconds: float = SLICE_SECONDS,
+        clock: Callable[[], float] = time.time,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.jobs = sorted(jobs, key=lambda j: j.priority)
+        self.should_yield = should_yield
+        self.slice_seconds = slice_seconds
+        self._clock = clock
+        self._timer = timer
+        self.last_run = load_state()
+        self._active: Dict[str, Iterator[None]] = {}
+
+    def due(self) -> List[Job]:
+        """Return jobs that are in progress or whose interval elapsed."""
+
+        now = self._clock()
+        return [
+            job
+            for job in self.jobs
+            if job.name in self._active
+            or job.name not in self.last_run
+            or now - self.last_run[job.name] >= job.interval
+        ]
+
+    def run(self) -> Optional[str]:
+        """Advance due jobs for one time slice; return the interrupted job, if any."""
+
+        deadline = self._timer() + self.slice_seconds
+        for job in self.due():
+            steps = self._active.get(job.name)
+            if steps is None:
+                steps = self._active[job.name] = job.run()
+            while True:
+                if self.should_yield() or self._timer() >= deadline:
+                    return job.name
+                try:
+                    next(steps)
+                except StopIteration:
+                    break
+                except Exception as exc:  # pragma: no cover - keep the service alive
+                    logger.error("Job %s failed: %s", job.name, exc)
+                    break
+            del self._active[job.name]
+            self.last_run[job.name] = self._clock()
+            _save_state(self.last_run)
+            logger.debug("Job %s finished", job.name)
+        return None
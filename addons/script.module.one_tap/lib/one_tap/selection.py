@@ -1,10 +1,16 @@
 """Episode selection logic for One-Tap TV Launcher."""
 from __future__ import annotations
 
-import random
-from typing import Iterable, List
+from itertools import islice
+from typing import Dict, Iterable, List, Sequence
 
 from . import db
+from .episodes import EpisodeList
+
+# Assumed length of episodes of a show without any probed duration.
+DEFAULT_EPISODE_SECONDS = 22 * 60
+# Candidates considered when filling a time budget.
+BUDGET_SCAN = 200
 
 
 def episode_candidates(
@@ -12,7 +18,7 @@ def episode_candidates(
     episodes: Iterable[str],
     mode: str = "order",
     random_cfg: dict | None = None,
-) -> List[str]:
+) -> EpisodeList:
     """Return an ordered list of candidate episodes for playback.
 
     ``episodes`` should be an iterable of episode file paths sorted in the
@@ -20,11 +26,12 @@ def episode_candidates(
     mode the configuration in ``random_cfg`` is consulted which currently
     supports ``exclude_last_n``.
 
-    History is **not** updated here; the caller is responsible for recording
-    the successfully played episode.
+    The result is an :class:`~one_tap.episodes.EpisodeList` view, so no path
+    strings are copied.  History is **not** updated here; the caller is
+    responsible for recording the successfully played episode.
     """
 
-    eps: List[str] = list(episodes)
+    eps = EpisodeList.from_paths(episodes)
     if not eps:
         raise ValueError("No episodes available")
 
@@ -32,12 +39,11 @@ def episode_candidates(
     if mode == "random":
         random_cfg = random_cfg or {}
         exclude_n = int(random_cfg.get("exclude_last_n", 0))
-        recent = set(history[-exclude_n:])
-        candidates = [e for e in eps if e not in recent]
-        if not candidates:
-            candidates = eps
-        random.shuffle(candidates)
-        return candidates
+        recent = {eps.index(e) for e in set(history[-exclude_n:]) if e in eps}
+        candidates = eps
+        if recent and len(recent) < len(eps):
+            candidates = eps.without(recent)
+        return candidates.shuffled()
 
     # Ordered mode: start from the episode after the last one in history and
     # wrap around at the end of the list.
@@ -48,4 +54,47 @@ def episode_candidates(
         idx = 0
     if idx >= len(eps):
         idx = 0
-    return eps[idx:] + eps[:idx]
+    return eps.rotate(idx)
+
+
+def comfort_weight(tile: dict, random_cfg: dict | None = None) -> float:
+    """Return the weight of ``tile`` when picking among shows.
+
+    Tiles carry an optional ``weight`` which only counts while
+    ``use_comfort_weights`` is set in ``random_cfg``.
+    """
+
+    if (random_cfg or {}).get("use_comfort_weights"):
+        return float(tile.get("weight", 1))
+    return 1.0
+
+
+def fit_budget(
+    candidates: Sequence[str],
+    durations: Dict[str, float],
+    seconds: float,
+    contiguous: bool = True,
+) -> List[str]:
+    """Return the episodes of ``candidates`` to play within ``seconds``.
+
+    Candidates are taken in order while they fit in the remaining time.
+    With ``contiguous`` (ordered mode) the sequence stops at the first
+    episode that does not fit; otherwise it is skipped.  Episodes without a
+    known duration count as the median known one of the show.
+    """
+
+    known = sorted(d for d in durations.values() if d > 0)
+    typical = known[len(known) // 2] if known else DEFAULT_EPISODE_SECONDS
+    shortest = known[0] if known else typical
+    picked: List[str] = []
+    remaining = seconds
+    for episode in islice(candidates, BUDGET_SCAN):
+        length = durations.get(episode) or typical
+        if length <= remaining:
+            picked.append(episode)
+            remaining -= length
+        elif contiguous:
+            break
+        if remaining < shortest:
+            break
+    return picked
@@ -0,0 +1,240 @@
+"""Health tracking for the network shares episodes live on.
+
+A sleeping or unplugged NAS makes ``xbmcvfs.listdir`` and ``Player.Open``
+block for a long time before they fail.  Every share (``scheme://host``)
+gets a circuit breaker kept in ``shares.json`` so the plugin and the
+service agree on it:
+
+* listings run with a timeout of ``list_timeout_seconds``;
+* a failed listing is remembered for :data:`NEGATIVE_TTL` seconds and not
+  retried for that folder meanwhile;
+* ``failure_threshold`` failed listings in a row open the breaker, after
+  which the share is treated as unavailable without touching the network.
+  Errors opening or playing a single file are not counted, as a corrupt
+  or unsupported file says nothing about the share;
+* once the cooldown has passed one caller (across processes) may probe the
+  share again.  Success closes the breaker; another failure reopens it
+  with twice the cooldown, up to :data:`MAX_COOLDOWN`.
+
+Listings that time out keep running in a daemon thread; the breaker keeps
+such threads from piling up.  The breaker state of every tile's share is
+published as the ``one_tap.share_state.<show_id>`` Home window property
+(``closed``, ``open`` or ``half_open``) for the skin, and
+``one_tap.share_state`` holds ``open`` while any tile's share is down.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from . import config, locks, vfs
+from .logging import get_logger
+
+try:  # pragma: no cover - depends on Kodi
+    import xbmcgui  # type: ignore
+except ImportError:  # pragma: no cover - desktop/dev
+    xbmcgui = None  # type: ignore
+
+STATE_PATH = "special://profile/addon_data/plugin.one_tap.play/shares.json"
+DEFAULT_LIST_TIMEOUT = 5.0
+DEFAULT_FAILURE_THRESHOLD = 2
+DEFAULT_COOLDOWN = 60.0
+MAX_COOLDOWN = 15 * 60.0
+# Folders whose listing failed are not listed again for this long.
+NEGATIVE_TTL = 60.0
+PROPERTY = "one_tap.share_state"
+# Schemes that never live on a network share.
+LOCAL_SCHEMES = ("", "file", "special", "library")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = get_logger("one_tap.shares")
+
+_list_timeout = DEFAULT_LIST_TIMEOUT
+_failure_threshold = DEFAULT_FAILURE_THRESHOLD
+_cooldown = DEFAULT_COOLDOWN
+
+
+class ShareUnavailable(OSError):
+    """Raised instead of touching a share that is known to be down."""
+
+
+def configure(cfg: Dict[str, Any]) -> None:
+    """Apply the ``shares`` block of ``cfg``."""
+
+    global _list_timeout, _failure_threshold, _cooldown
+    shares_cfg = cfg.get("shares", {})
+    _list_timeout = float(shares_cfg.get("list_timeout_seconds", DEFAULT_LIST_TIMEOUT))
+    _failure_threshold = int(shares_cfg.get("failure_threshold", DEFAULT_FAILURE_THRESHOLD))
+    _cooldown = float(shares_cfg.get("cooldown_seconds", DEFAULT_COOLDOWN))
+
+
+def share_of(path: str) -> str:
+    """Return the ``scheme://host`` part of ``path``, or ``""`` for local files."""
+
+    parts = urllib.parse.urlsplit(path)
+    if not parts.netloc or parts.scheme in LOCAL_SCHEMES:
+        return ""
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _path() -> Path:
+    return config._resolve(STATE_PATH)
+
+
+def _load() -> Dict[str, Dict[str, Any]]:
+    try:
+        with _path().open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {"shares": {}, "paths": {}}
+    data.setdefault("shares", {})
+    data.setdefault("paths", {})
+    return data
+
+
+def _save(data: Dict[str, Dict[str, Any]]) -> None:
+    path = _path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _state(entry: Dict[str, Any], now: float) -> str:
+    until = entry.get("open_until")
+    if until is None:
+        return CLOSED
+    return OPEN if now < until else HALF_OPEN
+
+
+def state(path: str) -> str:
+    """Return the breaker state of the share holding ``path``."""
+
+    share = share_of(path)
+    if not share:
+        return CLOSED
+    return _state(_load()["shares"].get(share, {}), time.time())
+
+
+def available(path: str) -> bool:
+    """Return whether ``path``'s share may be accessed now.
+
+    While the breaker is half open only the first caller within a listing
+    timeout is let through to probe the share.
+    """
+
+    current = state(path)
+    if current == HALF_OPEN:
+        return locks.claim(f"share-probe:{share_of(path)}", _list_timeout)
+    return current == CLOSED
+
+
+def record_success(path: str) -> None:
+    """Close the breaker of ``path``'s share."""
+
+    share = share_of(path)
+    data = _load()
+    if not share or (share not in data["shares"] and path not in data["paths"]):
+        return
+    with locks.locked("shares"):
+        data = _load()
+        entry = data["shares"].pop(share, None)
+        data["paths"].pop(path, None)
+        _save(data)
+    if entry and "open_until" in entry:
+        logger.info("Share %s is reachable again", share)
+
+
+def record_failure(path: str, error: object = "") -> None:
+    """Count a failed access to ``path`` and open the breaker if needed."""
+
+    share = share_of(path)
+    if not share:
+        return
+    now = time.time()
+    with locks.locked("shares"):
+        data = _load()
+        entry = data["shares"].setdefault(share, {"failures": 0, "trips": 0})
+        entry["failures"] += 1
+        entry["error"] = str(error)
+        was = _state(entry, now)
+        if was == HALF_OPEN or (was == CLOSED and entry["failures"] >= _failure_threshold):
+            cooldown = min(_cooldown * 2 ** entry["trips"], MAX_COOLDOWN)
+            entry["open_until"] = now + cooldown
+            entry["trips"] += 1
+            logger.warning("Share %s unavailable for %.0f s: %s", share, cooldown, error)
+        _save(data)
+
+
+def _remember_failed_listing(path: str) -> None:
+    now = time.time()
+    with locks.locked("shares"):
+        data = _load()
+        data["paths"] = {p: t for p, t in data["paths"].items() if t > now}
+        data["paths"][path] = now + NEGATIVE_TTL
+        _save(data)
+
+
+def listdir(path: str, timeout: float | None = None) -> Tuple[List[str], List[str]]:
+    """List ``path`` like :func:`one_tap.vfs.listdir`, guarded by the breaker.
+
+    Raises :class:`ShareUnavailable` without touching the share when its
+    breaker is open or the folder failed to list recently, and when the
+    listing takes longer than ``timeout`` seconds.
+    """
+
+    share = share_of(path)
+    if not share:
+        return vfs.listdir(path)
+    if _load()["paths"].get(path, 0) > time.time():
+        raise ShareUnavailable(f"listing {path} failed recently")
+    if not available(path):
+        raise ShareUnavailable(f"share {share} is unavailable")
+    result: Dict[str, Any] = {}
+
+    def work() -> None:
+        try:
+            result["value"] = vfs.listdir(path)
+        except Exception as exc:  # handed to the caller below
+            result["error"] = exc
+
+    worker = threading.Thread(target=work, name="one_tap-listdir", daemon=True)
+    worker.start()
+    worker.join(_list_timeout if timeout is None else timeout)
+    if "value" in result:
+        record_success(path)
+        return result["value"]
+    error = result.get("error") or ShareUnavailable(f"listing {path} timed out")
+    record_failure(path, error)
+    _remember_failed_listing(path)
+    if isinstance(error, OSError):
+        raise error
+    raise ShareUnavailable(str(error))
+
+
+def publish_properties(tiles: List[Dict[str, Any]]) -> None:
+    """Expose the breaker state of every tile's share as window properties."""
+
+    if not xbmcgui:
+        return
+    window = xbmcgui.Window(10000)
+    data = _load()["shares"]
+    now = time.time()
+    any_open = False
+    for tile in tiles:
+        show_id = tile.get("show_id")
+        if not show_id:
+            continue
+        current = _state(data.get(share_of(tile.get("path", "")), {}), now)
+        any_open = any_open or current == OPEN
+        window.setProperty(f"{PROPERTY}.{show_id}", current)
+    window.setProperty(PROPERTY, OPEN if any_open else CLOSED)
@@ -0,0 +1,116 @@
+"""Delta sync of playback history between boxes through a shared folder.
+
+Every box records its plays, retracted plays and failures in the local
+``changes`` table with an increasing sequence number (see
+:func:`one_tap.db.pending_changes`).  :func:`publish` appends them to the
+shared folder as an immutable segment file named after the first and last
+sequence number it holds::
+
+    <folder>/<device id>/000000000001-000000000042.jsonl
+
+and :func:`pull` reads only the segments of other boxes that contain
+sequence numbers not applied yet.  A sync therefore moves the events since
+the last sync; databases are never copied.  Events of one box are applied
+in sequence order and history ties are broken by device id, so every box
+ends up with the same play order.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Iterator, List, Tuple
+
+from . import db, vfs
+from .logging import get_logger
+
+SEGMENT = re.compile(r"^(\d{12})-(\d{12})\.jsonl$")
+# Changes written per segment.
+SEGMENT_CHANGES = 10000
+
+logger = get_logger("one_tap.sync")
+
+
+def _segments(folder: str, device: str) -> List[Tuple[int, int, str]]:
+    try:
+        _dirs, files = vfs.listdir(os.path.join(folder, device))
+    except OSError:
+        return []
+    found = []
+    for name in files:
+        match = SEGMENT.match(name)
+        if match:
+            found.append((int(match.group(1)), int(match.group(2)), name))
+    found.sort()
+    return found
+
+
+def publish(folder: str) -> int:
+    """Write unpublished local changes to ``folder`` and return their count."""
+
+    device = db.device_id()
+    published = 0
+    while True:
+        changes = db.pending_changes(SEGMENT_CHANGES)
+        if not changes:
+            return published
+        target = os.path.join(folder, device)
+        vfs.makedirs(target)
+        name = f"{changes[0].seq:012d}-{changes[-1].seq:012d}.jsonl"
+        data = "".join(json.dumps(c._asdict()) + "\n" for c in changes)
+        vfs.write_atomic(os.path.join(target, name), data.encode("utf-8"))
+        db.mark_published(changes[-1].seq)
+        published += len(changes)
+        logger.debug("Published changes %s to %s", name, folder)
+
+
+def peers(folder: str) -> List[str]:
+    """Return the device ids of the other boxes sharing ``folder``."""
+
+    try:
+        dirs, _files = vfs.listdir(folder)
+    except OSError as exc:
+        logger.warning("Cannot list sync folder %s: %s", folder, exc)
+        return []
+    own = db.device_id()
+    return sorted(d for d in dirs if d != own)
+
+
+def pull_device(folder: str, device: str, max_history: int = db.DEFAULT_MAX_HISTORY) -> int:
+    """Apply the new changes ``device`` shared in ``folder``; return how many."""
+
+    applied = db.peer_seq(device)
+    total = 0
+    for first, last, name in _segments(folder, device):
+        if last <= applied:
+            continue
+        if first > applied + 1:
+            logger.warning("Missing changes %d-%d from %s", applied + 1, first - 1, device)
+            break
+        with vfs.open_read(os.path.join(folder, device, name)) as f:
+            lines = f.read().decode("utf-8").splitlines()
+        changes = [db.Change(**json.loads(line)) for line in lines if line]
+        count = db.apply_changes(device, changes, max_history)
+        total += count
+        applied += count
+        if applied < last:
+            break
+    if total:
+        logger.info("Applied %d history changes from %s", total, device)
+    return total
+
+
+def pull(folder: str, max_history: int = db.DEFAULT_MAX_HISTORY) -> int:
+    """Apply new changes of every other box in ``folder``; return how many."""
+
+    return sum(pull_device(folder, device, max_history) for device in peers(folder))
+
+
+def sync_steps(folder: str, max_history: int = db.DEFAULT_MAX_HISTORY) -> Iterator[None]:
+    """Publish and pull as a :mod:`one_tap.scheduler` job, one box per step."""
+
+    publish(folder)
+    yield
+    for device in peers(folder):
+        pull_device(folder, device, max_history)
+        yield
@@ -0,0 +1,173 @@
+"""Lightweight latency tracing from tile press to first frame.
+
+Each step of a tap is wrapped in a :func:`span` which records its wall-clock
+start and duration together with the *tap id* identifying the press.  The
+tap id travels between processes through the ``RunScript`` arguments and a
+Home window property, so spans from the playback controller and the
+randomizer service can be correlated.
+
+Spans are only recorded while a tap id is known, so unrelated work in the
+long-running service is not traced.  They are kept in memory and written by
+:func:`flush` into a fixed-size ring buffer file: an eight byte record
+counter followed by :data:`CAPACITY` fixed-width slots.  Old records are
+overwritten in place, so the file never grows.  Concurrent writers from
+different processes may occasionally overwrite each other's slot, which is
+acceptable for latency statistics.
+"""
+from __future__ import annotations
+
+import atexit
+import struct
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from . import config
+
+TRACE_PATH = "special://profile/addon_data/plugin.one_tap.play/trace.bin"
+CAPACITY = 2048
+
+_HEADER = struct.Struct("<Q")
+_RECORD = struct.Struct("<16s24sdd")
+
+_tap_id = ""
+_pending: List["Span"] = []
+
+
+class Span(NamedTuple):
+    tap_id: str
+    stage: str
+    start: float
+    duration: float
+
+
+def _path() -> Path:
+    return config._resolve(TRACE_PATH)
+
+
+def new_tap_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def set_tap_id(tap_id: str) -> None:
+    """Attribute spans recorded by this process to ``tap_id``."""
+
+    global _tap_id
+    _tap_id = tap_id
+
+
+def current_tap_id() -> str:
+    return _tap_id
+
+
+def record(stage: str, start: float, duration: float, tap_id: Optional[str] = None) -> None:
+    """Queue a finished span for the next :func:`flush`."""
+
+    tap_id = tap_id or _tap_id
+    if tap_id and len(_pending) < CAPACITY:
+        _pending.append(Span(tap_id, stage, start, duration))
+
+
+@contextmanager
+def span(stage: str, tap_id: Optional[str] = None) -> Iterator[None]:
+    """Time the enclosed block as ``stage``."""
+
+    if not (tap_id or _tap_id):
+        yield
+        return
+    start = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, start, time.perf_counter() - t0, tap_id)
+
+
+def flush() -> None:
+    """Append queued spans to the on-disk ring buffer."""
+
+    if not _pending:
+        return
+    spans = _pending[:]
+    del _pending[:]
+    path = _path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            path.write_bytes(_HEADER.pack(0))
+        with path.open("r+b") as f:
+            written = _HEADER.unpack(f.read(_HEADER.size) or _HEADER.pack(0))[0]
+            for s in spans:
+                f.seek(_HEADER.size + (written % CAPACITY) * _RECORD.size)
+                f.write(
+                    _RECORD.pack(
+                        s.tap_id.encode("ascii", "replace")[:16],
+                        s.stage.encode("ascii", "replace")[:24],
+                        s.start,
+                        s.duration,
+                    )
+                )
+                written += 1
+            f.seek(0)
+            f.write(_HEADER.pack(written))
+    except OSError:  # pragma: no cover - tracing must never break playback
+        pass
+
+
+atexit.register(flush)
+
+
+def read_spans() -> List[Span]:
+    """Return the spans stored in the ring buffer, oldest first."""
+
+    path = _path()
+    if not path.exists():
+        return []
+    data = path.read_bytes()
+    if len(data) < _HEADER.size:
+        return []
+    written = _HEADER.unpack_from(data)[0]
+    count = min(written, CAPACITY)
+    first = written - count
+    spans = []
+    for n in range(first, written):
+        offset = _HEADER.size + (n % CAPACITY) * _RECORD.size
+        if offset + _RECORD.size > len(data):
+            continue
+        tap_id, stage, start, duration = _RECORD.unpack_from(data, offset)
+        spans.append(
+            Span(
+                tap_id.rstrip(b"\0").decode("ascii"),
+                stage.rstrip(b"\0").decode("ascii"),
+                start,
+                duration,
+            )
+        )
+    return spans
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+
+def stage_percentiles(spans: Optional[List[Span]] = None) -> Dict[str, Dict[str, float]]:
+    """Return ``count``, ``p50``, ``p95`` and ``p99`` seconds per stage."""
+
+    by_stage: Dict[str, List[float]] = {}
+    for s in read_spans() if spans is None else spans:
+        by_stage.setdefault(s.stage, []).append(s.duration)
+    report = {}
+    for stage, values in by_stage.items():
+        values.sort()
+        report[stage] = {
+            "count": len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99),
+        }
+    return report
@@ -0,0 +1,99 @@
+"""File access helpers usable both inside and outside Kodi.
+
+Media usually lives on ``smb://`` or ``nfs://`` shares which only Kodi's
+``xbmcvfs`` can open.  During development the same calls fall back to the
+regular :mod:`os` functions so the shared logic can be exercised with local
+files.
+"""
+from __future__ import annotations
+
+import os
+from typing import List, Tuple
+
+try:  # pragma: no cover - depends on Kodi
+    import xbmcvfs  # type: ignore
+except ImportError:  # pragma: no cover - desktop/dev
+    xbmcvfs = None  # type: ignore
+
+
+class _KodiFile:
+    """Binary file object backed by :class:`xbmcvfs.File`."""
+
+    def __init__(self, path: str) -> None:
+        self._file = xbmcvfs.File(path)
+
+    def read(self, size: int = -1) -> bytes:
+        return bytes(self._file.readBytes(size if size >= 0 else 0))
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def size(self) -> int:
+        return self._file.size()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "_KodiFile":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def open_read(path: str):
+    """Open ``path`` for binary reading."""
+
+    if xbmcvfs:
+        return _KodiFile(path)
+    return open(path, "rb")
+
+
+def stat(path: str) -> Tuple[int, float]:
+    """Return ``(size, mtime)`` for ``path``."""
+
+    if xbmcvfs:
+        st = xbmcvfs.Stat(path)
+        return st.st_size(), float(st.st_mtime())
+    st = os.stat(path)
+    return st.st_size, st.st_mtime
+
+
+def listdir(path: str) -> Tuple[List[str], List[str]]:
+    """Return ``(dirs, files)`` contained in ``path``."""
+
+    if xbmcvfs:
+        return xbmcvfs.listdir(path)
+    dirs: List[str] = []
+    files: List[str] = []
+    for entry in os.scandir(path):
+        (dirs if entry.is_dir() else files).append(entry.name)
+    return dirs, files
+
+
+def makedirs(path: str) -> None:
+    """Create the directory ``path`` and any missing parents."""
+
+    if xbmcvfs:
+        xbmcvfs.mkdirs(path)
+        return
+    os.makedirs(path, exist_ok=True)
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write ``data`` to ``path`` so readers never see a partial file."""
+
+    tmp = path + ".tmp"
+    if xbmcvfs:
+        f = xbmcvfs.File(tmp, "w")
+        try:
+            f.write(bytearray(data))
+        finally:
+            f.close()
+        if xbmcvfs.exists(path):
+            xbmcvfs.delete(path)
+        xbmcvfs.rename(tmp, path)
+        return
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
@@ -2,10 +2,14 @@
 from __future__ import annotations
 
 import json
+import sqlite3
+import time
+import zipfile
 from pathlib import Path
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional
 
-from one_tap import config, db
+from one_tap import bundle, config, db, profiling, tracing
+from one_tap import logging as one_tap_logging
 from one_tap.logging import get_logger
 
 logger = get_logger("script.one_tap.caregiver")
@@ -57,6 +61,15 @@ def _select(title: str, options: List[str], get_input: Callable[[str], str]) ->
             return choice
 
 
+def _show_text(title: str, text: str) -> None:
+    """Display ``text`` in a dialog or print it outside Kodi."""
+
+    if xbmcgui:  # pragma: no cover - requires Kodi
+        xbmcgui.Dialog().textviewer(title, text)
+        return
+    print(f"{title}\n{text}")
+
+
 def verify_pin(get_pin: Callable[[str], str] = _prompt_pin) -> bool:
     """Return ``True`` if the caregiver PIN is valid or not set."""
 
@@ -214,9 +227,9 @@ def export_config(path: str) -> bool:
         with dest.open("w", encoding="utf-8") as f:
             json.dump(cfg, f, indent=2, sort_keys=True)
     except OSError as exc:  # pragma: no cover - depends on fs
-        logger.error(f"Failed to export configuration to {dest}: {exc}")
+        logger.error("Failed to export configuration to %s: %s", dest, exc)
         return False
-    logger.info(f"Configuration exported to {dest}")
+    logger.info("Configuration exported to %s", dest)
     return True
 
 
@@ -228,13 +241,85 @@ def import_config(path: str) -> bool:
         with src.open("r", encoding="utf-8") as f:
             cfg = json.load(f)
     except (OSError, ValueError) as exc:  # pragma: no cover - depends on fs
-        logger.error(f"Failed to import configuration from {src}: {exc}")
+        logger.error("Failed to import configuration from %s: %s", src, exc)
         return False
     config.save_config(cfg)
-    logger.info(f"Configuration imported from {src}")
+    logger.info("Configuration imported from %s", src)
+    return True
+
+
+def export_bundle(path: str) -> bool:
+    """Export configuration and playback history to the zip ``path``."""
+
+    dest = Path(path).expanduser()
+    try:
+        bundle.export_bundle(dest)
+    except (OSError, sqlite3.DatabaseError) as exc:  # pragma: no cover - depends on fs
+        logger.error("Failed to export backup bundle to %s: %s", dest, exc)
+        return False
+    return True
+
+
+def import_bundle(path: str) -> bool:
+    """Import a backup bundle, merging its history into the local one."""
+
+    src = Path(path).expanduser()
+    try:
+        bundle.import_bundle(src)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile, sqlite3.DatabaseError) as exc:
+        logger.error("Failed to import backup bundle from %s: %s", src, exc)
+        return False
     return True
 
 
+def latency_report() -> str:
+    """Return tap-to-first-frame latency percentiles per traced stage."""
+
+    report = tracing.stage_percentiles()
+    if not report:
+        return "No latency traces recorded yet."
+    lines = []
+    for stage, stats in sorted(report.items()):
+        lines.append(
+            f"{stage}: n={stats['count']} "
+            f"p50={stats['p50'] * 1000:.0f}ms "
+            f"p95={stats['p95'] * 1000:.0f}ms "
+            f"p99={stats['p99'] * 1000:.0f}ms"
+        )
+    return "\n".join(lines)
+
+
+def stats_report(show_id: Optional[str] = None) -> str:
+    """Return play counts per show, or per episode of ``show_id``."""
+
+    stats = db.episode_stats(show_id) if show_id else db.show_stats()
+    if not stats:
+        return "No plays recorded yet."
+    lines = []
+    for entry in stats:
+        last = (
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.last_played))
+            if entry.last_played
+            else "never"
+        )
+        lines.append(
+            f"{entry.key}: plays={entry.plays} failures={entry.failures} last={last}"
+        )
+    return "\n".join(lines)
+
+
+def show_profiles(get_input: Callable[[str], str] = _prompt) -> None:
+    """Let the caregiver browse stored profiling captures."""
+
+    captures = profiling.list_captures()
+    if not captures:
+        _show_text("Profiling captures", "No profiling captures recorded yet.")
+        return
+    choice = _select("Profiling captures", captures, get_input)
+    if choice >= 0:
+        _show_text(captures[choice], profiling.summary(captures[choice]))
+
+
 def menu(get_input: Callable[[str], str] = _prompt) -> None:
     """Display a simple graphical caregiver menu."""
 
@@ -246,6 +331,11 @@ def menu(get_input: Callable[[str], str] = _prompt) -> None:
                 "Purge playback history",
                 "Export configuration",
                 "Import configuration",
+                "Latency report",
+                "Profiling captures",
+                "Play statistics",
+                "Export backup (configuration and history)",
+                "Import backup (configuration and history)",
                 "Exit",
             ],
             get_input,
@@ -254,8 +344,17 @@ def menu(get_input: Callable[[str], str] = _prompt) -> None:
             configure(get_input)
         elif choice == 1:
             show_id = get_input("Show ID to purge (blank for all): ").strip()
-            db.purge_history(show_id or None)
-            logger.info("Playback history purged")
+            days = get_input("Only entries older than N days (blank for all): ").strip()
+            if days:
+                try:
+                    removed = db.purge_older_than(float(days), show_id or None)
+                except ValueError:
+                    logger.error("Invalid number of days: %s", days)
+                    continue
+                logger.info("Purged %d history entries older than %s days", removed, days)
+            else:
+                db.purge_history(show_id or None)
+                logger.info("Playback history purged")
         elif choice == 2:
             path = get_input("Export path: ").strip()
             if path:
@@ -264,6 +363,21 @@ def menu(get_input: Callable[[str], str] = _prompt) -> None:
             path = get_input("Import path: ").strip()
             if path:
                 import_config(path)
+        elif choice == 4:
+            _show_text("Latency report", latency_report())
+        elif choice == 5:
+            show_profiles(get_input)
+        elif choice == 6:
+            show_id = get_input("Show ID for episode details (blank for all): ").strip()
+            _show_text("Play statistics", stats_report(show_id or None))
+        elif choice == 7:
+            path = get_input("Backup path (.zip): ").strip()
+            if path:
+                export_bundle(path)
+        elif choice == 8:
+            path = get_input("Backup path (.zip): ").strip()
+            if path:
+                import_bundle(path)
         else:
             break
 
@@ -271,6 +385,7 @@ def menu(get_input: Callable[[str], str] = _prompt) -> None:
 def main() -> None:
     """Launch the caregiver menu after validating the PIN."""
 
+    one_tap_logging.configure(config.load_config())
     if not verify_pin():
         return
     menu()
@@ -1,10 +1,34 @@
 """Background service providing auto-advance and playback error handling."""
 from __future__ import annotations
 
+import json
 import random
+import time
 import urllib.parse
+from typing import Callable, Dict, Iterator, List, Sequence
 
-from one_tap import config, db
+from one_tap import (
+    budget,
+    catalog,
+    channel,
+    config,
+    db,
+    durations,
+    eventtrace,
+    invalidation,
+    media_cache,
+    playback,
+    random_state,
+    readahead,
+    resume,
+    schedule,
+    scheduler,
+    selection,
+    shares,
+    sync,
+    tracing,
+)
+from one_tap import logging as one_tap_logging
 from one_tap.logging import get_logger
 
 logger = get_logger("service.one_tap.random")
@@ -14,19 +38,81 @@ try:  # pragma: no cover - depends on Kodi
 except ImportError:  # pragma: no cover - desktop/dev
     xbmc = None  # type: ignore
 
+try:  # pragma: no cover - depends on Kodi
+    import xbmcgui  # type: ignore
+except ImportError:  # pragma: no cover - desktop/dev
+    xbmcgui = None  # type: ignore
+
+# Set by plugin.one_tap.play when it opens an episode.
+TAP_ID_PROPERTY = "one_tap.tap_id"
+TAP_STARTED_PROPERTY = "one_tap.tap_started"
+# While set the plugin opens queued random picks without touching the
+# database and hands the play over in PENDING_PLAY_PROPERTY; shows with a
+# resume point are flagged in RESUME_PROPERTY.<show_id>.
+SERVICE_READY_PROPERTY = "one_tap.service_ready"
+PENDING_PLAY_PROPERTY = "one_tap.pending_play"
+RESUME_PROPERTY = "one_tap.resume"
+# The channel tile being played; auto-advance continues it.
+CHANNEL_PROPERTY = "one_tap.channel"
+# Between chunks of a history purge the write lock is released this long.
+PURGE_PAUSE = 0.05
+# Random picks queued per show by the preselection job.
+PRESELECT_COUNT = 5
+# Episodes whose duration is probed per step of the duration job.
+DURATION_BATCH = 20
+# The tiles of the next schedule block are warmed this long before it
+# starts; the job checks more often than that.
+PREWARM_LEAD = 15 * 60
+PREWARM_INTERVAL = 10 * 60
+# Unpublished history changes kept while the sync folder is unreachable.
+PENDING_CHANGES = 50_000
+# Video library notifications that change the episodes of library tiles.
+LIBRARY_EVENTS = ("VideoLibrary.OnUpdate", "VideoLibrary.OnRemove")
+HOUR = 3600
+DAY = 24 * HOUR
+
 
 if xbmc:  # pragma: no cover - depends on Kodi
     class AutoAdvancePlayer(xbmc.Player):
-        """Player monitoring playback to auto-advance on completion or error."""
+        """Player monitoring playback to auto-advance on completion or error.
+
+        The playback controller's player receives the same callbacks; the
+        shared :mod:`one_tap.playback` state machine decides which of the
+        two acts on an event.
+        """
+
+        # Kodi no longer reports a playing file once playback ended or failed,
+        # so the last started file is remembered for those callbacks.
+        _last_file: str | None = None
+        # Whether a terminal callback for ``_last_file`` was seen; an error
+        # reported after that is for a file that never started.
+        _finished = False
+        # (playing file, episode, show ID) of the last position sample.
+        _sampled: tuple = (None, None, None)
+
+        def __init__(self, tracker: resume.ResumeTracker | None = None) -> None:
+            super().__init__()
+            self.tracker = tracker or resume.ResumeTracker()
+
+        def _playing_episode(self) -> str | None:
+            try:
+                current = self.getPlayingFile()
+            except RuntimeError:
+                current = self._last_file
+            if not current:
+                return None
+            return media_cache.source_for(current) or current
 
         def _current_show(self) -> str | None:
-            current = self.getPlayingFile()
+            return self._show_of(self._playing_episode())
+
+        def _show_of(self, current: str | None) -> str | None:
             if not current:
                 return None
             cfg = config.load_config()
             for tile in cfg.get("tiles", []):
                 path = tile.get("path")
-                if path and current.startswith(path):
+                if path and catalog.owns(path, current):
                     return tile.get("show_id")
             return None
 
@@ -43,42 +129,520 @@ if xbmc:  # pragma: no cover - depends on Kodi
             rand_cfg = cfg.get("random", {})
             if rand_cfg.get("use_comfort_weights"):
                 show_ids = [t["show_id"] for t in tiles]
-                weights = [float(t.get("weight", 1)) for t in tiles]
+                weights = [selection.comfort_weight(t, rand_cfg) for t in tiles]
                 return random.choices(show_ids, weights=weights, k=1)[0]
             return random.choice([t["show_id"] for t in tiles])
 
         def _play_next(self) -> None:
-            show_id = self._next_show()
+            if budget.finished():
+                budget.clear()
+                logger.info("Time budget used up; returning to Home")
+                xbmc.executebuiltin("ActivateWindow(Home)")
+                return
+            plan = budget.current()
+            channel_id = (
+                xbmcgui.Window(10000).getProperty(CHANNEL_PROPERTY) if xbmcgui else ""
+            )
+            show_id = plan.show_id if plan else channel_id or self._next_show()
             if not show_id:
                 return
-            xbmc.executebuiltin(
-                f'RunPlugin("plugin://plugin.one_tap.play?show_id={urllib.parse.quote_plus(show_id)}")'
+            query = urllib.parse.urlencode(
+                {"show_id": show_id, "tap_id": tracing.new_tap_id()}
             )
+            xbmc.executebuiltin(f'RunPlugin("plugin://plugin.one_tap.play?{query}")')
+
+        def sample_position(self) -> None:
+            """Hand the current playback position to the resume tracker."""
+
+            try:
+                playing = self.getPlayingFile()
+                position = self.getTime()
+                total = self.getTotalTime()
+            except RuntimeError:
+                return
+            # The show lookup reads the configuration; do it once per file.
+            if self._sampled[0] != playing:
+                self._sampled = (playing, self._playing_episode(), self._current_show())
+            _playing, episode, show_id = self._sampled
+            if episode and show_id:
+                self.tracker.sample(show_id, episode, position, total)
+
+        def onPlayBackStarted(self) -> None:  # type: ignore[override]
+            try:
+                self._last_file = self.getPlayingFile()
+            except RuntimeError:
+                self._last_file = None
+            self._finished = False
+            eventtrace.record("service", "started", self._last_file)
+            playback.transition(playback.STARTED, self._last_file)
+            if self._last_file:
+                shares.record_success(self._last_file)
+            if not xbmcgui:
+                return
+            window = xbmcgui.Window(10000)
+            pending = take_pending_play(window, self._last_file)
+            if pending:
+                show_id, episode, limit = pending
+                db.update_history(show_id, episode, max_history=limit or db.DEFAULT_MAX_HISTORY)
+            tap_id = window.getProperty(TAP_ID_PROPERTY)
+            started = window.getProperty(TAP_STARTED_PROPERTY)
+            if not tap_id or not started:
+                return
+            window.clearProperty(TAP_ID_PROPERTY)
+            window.clearProperty(TAP_STARTED_PROPERTY)
+            started_at = float(started)
+            tracing.record(
+                "playback_started", started_at, time.time() - started_at, tap_id
+            )
+            tracing.flush()
 
         def onPlayBackEnded(self) -> None:  # type: ignore[override]
+            eventtrace.record("service", "ended", self._last_file)
+            self._finished = True
+            if not playback.transition(playback.ENDED, self._last_file):
+                return
+            show_id = self._current_show()
+            if show_id:
+                self.tracker.finished(show_id)
+            self.tracker.flush(force=True)
             logger.info("Playback ended; starting next episode")
             self._play_next()
 
+        def onPlayBackStopped(self) -> None:  # type: ignore[override]
+            eventtrace.record("service", "stopped", self._last_file)
+            self._finished = True
+            playback.transition(playback.STOPPED, self._last_file)
+            # The position can no longer be read; keep the last sample.
+            self.tracker.flush(force=True)
+
         def onPlayBackError(self) -> None:  # type: ignore[override]
+            eventtrace.record("service", "error", self._last_file)
+            failed = None if self._finished else self._last_file
+            self._finished = True
+            if not playback.transition(playback.ERROR, failed):
+                return
+            # Without a started file the error is that of the file opened.
+            failed = failed or playback.current().item
             logger.error("Playback error encountered; skipping to next")
-            show_id = self._current_show()
-            if show_id:
+            if failed:
+                show_id = self._show_of(media_cache.source_for(failed) or failed)
+            else:
+                show_id = self._current_show()
+            pending = take_pending_play(xbmcgui.Window(10000), None) if xbmcgui else None
+            if pending:
+                # Handed over by the plugin and not recorded yet.
+                db.record_failure(pending[0], pending[1])
+            elif show_id:
+                # Undo the play recorded on open and count it as a failure.
                 db.remove_last_history(show_id)
             self._play_next()
 
+    class ServiceMonitor(xbmc.Monitor):
+        """Monitor passing notifications to the invalidation bus and the catalog."""
+
+        def onNotification(self, sender: str, method: str, data: str) -> None:  # type: ignore[override]
+            if invalidation.handle_notification(sender, method, data):
+                return
+            if method not in LIBRARY_EVENTS:
+                return
+            try:
+                catalog.library_changed(method, json.loads(data or "{}"))
+            except (OSError, ValueError) as exc:
+                logger.warning("Cannot apply %s: %s", method, exc)
+
+
+def take_pending_play(window, playing: str | None) -> tuple | None:
+    """Clear the play handed over by the plugin and return it if it is ``playing``.
+
+    Returns ``(show_id, episode, max_history)``; with ``playing`` ``None``
+    any pending play is returned.
+    """
+
+    raw = window.getProperty(PENDING_PLAY_PROPERTY)
+    if not raw:
+        return None
+    window.clearProperty(PENDING_PLAY_PROPERTY)
+    try:
+        show_id, episode, target, limit = json.loads(raw)
+    except ValueError:
+        return None
+    if playing is not None and playing != target:
+        return None  # something else was started meanwhile
+    return show_id, episode, limit
+
+
+def publish_resume_hints(points: Sequence[tuple], cleared: Sequence[str]) -> None:
+    """Flag the shows the plugin must look up a resume point for."""
+
+    if not xbmcgui:
+        return
+    window = xbmcgui.Window(10000)
+    for show_id, episode, *_rest in points:
+        window.setProperty(f"{RESUME_PROPERTY}.{show_id}", episode)
+    for show_id in cleared:
+        window.clearProperty(f"{RESUME_PROPERTY}.{show_id}")
+
+
+def _predict_upcoming(tile: dict, cfg: dict, count: int = 1) -> Sequence[str]:
+    """Return the next ``count`` episodes taps on ``tile`` are expected to start."""
+
+    show_id = tile.get("show_id")
+    path = tile.get("path")
+    if not show_id or not path:
+        return []
+    if cfg.get("mode", "order") == "random":
+        # Random picks are only predictable once they have been preselected.
+        return random_state.get(show_id)[:count]
+    episodes = catalog.episodes(path)
+    if not episodes:
+        return []
+    return selection.episode_candidates(show_id, episodes, "order")[:count]
+
+
+def warm_next_episodes(
+    cfg: dict, should_pause: Callable[[], bool], warmed: Dict[str, str]
+) -> None:
+    """Prefetch the predicted next episode of every tile.
+
+    ``warmed`` maps show IDs to the episode already prefetched so unchanged
+    predictions are not read again on every pass.
+    """
+
+    ra_cfg = cfg.get("readahead", {})
+    if not ra_cfg.get("enabled", True):
+        return
+    head_bytes = int(float(ra_cfg.get("head_mb", 4)) * 1024 * 1024)
+    for tile in cfg.get("tiles", []):
+        if should_pause():
+            return
+        show_id = tile.get("show_id")
+        try:
+            upcoming = _predict_upcoming(tile, cfg)
+            if not upcoming or warmed.get(show_id) == upcoming[0]:
+                continue
+            episode = upcoming[0]
+            if readahead.prefetch(episode, should_pause, head_bytes=head_bytes):
+                warmed[show_id] = episode
+                logger.debug("Prefetched %s", episode)
+        except (OSError, ValueError) as exc:
+            logger.warning("Readahead failed for %s: %s", show_id, exc)
+
+
+def fill_media_cache(
+    cfg: dict, should_throttle: Callable[[], bool], should_abort: Callable[[], bool]
+) -> Iterator[None]:
+    """Copy the upcoming episodes of every tile into the local media cache.
+
+    Yields after every file; copying slows down while ``should_throttle``
+    and stops, keeping the partial copy, once ``should_abort``.
+    """
+
+    cache_cfg = cfg.get("cache", {})
+    if not cache_cfg.get("enabled", False):
+        return
+    per_show = int(cache_cfg.get("episodes_per_show", media_cache.DEFAULT_EPISODES_PER_SHOW))
+    max_bytes = int(float(cache_cfg.get("max_mb", media_cache.DEFAULT_MAX_MB)) * 1024 * 1024)
+    # Interleave tiles so each show's next episode is cached before any
+    # show's second one when the budget runs short.
+    per_tile: List[Sequence[str]] = []
+    for tile in cfg.get("tiles", []):
+        try:
+            per_tile.append(_predict_upcoming(tile, cfg, per_show))
+        except (OSError, ValueError) as exc:
+            logger.warning("Cannot predict episodes for %s: %s", tile.get("show_id"), exc)
+    wanted = [eps[i] for i in range(per_show) for eps in per_tile if i < len(eps)]
+    for source in media_cache.fill_steps(wanted, max_bytes, should_throttle, should_abort):
+        if source:
+            logger.info("Cached %s locally", source)
+        yield
+
+
+def purge_old_history(cfg: dict, should_pause: Callable[[], bool]) -> None:
+    """Apply the ``history.retention_days`` age limit, if configured."""
+
+    days = float(cfg.get("history", {}).get("retention_days", 0) or 0)
+    if days <= 0:
+        return
+    removed = db.purge_older_than(days, pause=PURGE_PAUSE, should_stop=should_pause)
+    if removed:
+        logger.info("Removed %d history entries older than %g days", removed, days)
+
+
+def refill_preselection() -> Iterator[None]:
+    """Queue random picks for shows whose preselection ran out."""
+
+    cfg = config.load_config()
+    if cfg.get("mode", "order") != "random":
+        return
+    for tile in cfg.get("tiles", []):
+        show_id = tile.get("show_id")
+        path = tile.get("path")
+        if not show_id or not path or random_state.get(show_id):
+            continue
+        _preselect(show_id, path, cfg)
+        yield
+
+
+def _preselect(show_id: str, path: str, cfg: dict) -> None:
+    episodes = catalog.episodes(path)
+    if episodes:
+        picks = selection.episode_candidates(show_id, episodes, "random", cfg.get("random", {}))
+        random_state.set(show_id, picks[:PRESELECT_COUNT])
+
+
+def prewarm_schedule(now: float | None = None) -> Iterator[None]:
+    """Refresh the listings and random picks of the next schedule block's tiles.
+
+    Runs only within :data:`PREWARM_LEAD` of the block's start, so the
+    first taps after the Home screen switched find everything stored.
+    """
+
+    cfg = config.load_config()
+    if not cfg.get("schedule"):
+        return
+    try:
+        following = schedule.upcoming(schedule.table(cfg), now)
+    except ValueError as exc:
+        logger.warning("Invalid schedule: %s", exc)
+        return
+    if following is None or following[0] > PREWARM_LEAD:
+        return
+    members = []
+    for tile in schedule.tiles_for(cfg, following[1]):
+        if channel.is_channel(tile):
+            members.extend(member for member, _weight in channel.members(tile, cfg))
+        else:
+            members.append(tile)
+    for tile in members:
+        show_id = tile.get("show_id")
+        path = tile.get("path")
+        if not show_id or not path:
+            continue
+        try:
+            if catalog.cached(path, max_age=PREWARM_LEAD) is None:
+                catalog.rescan(path)
+            if cfg.get("mode", "order") == "random" and not random_state.get(show_id):
+                _preselect(show_id, path, cfg)
+        except OSError as exc:
+            logger.warning("Cannot prewarm %s: %s", path, exc)
+        yield
+
+
+def sync_history() -> Iterator[None]:
+    """Exchange history changes with the other boxes using ``sync.folder``."""
+
+    cfg = config.load_config()
+    folder = cfg.get("sync", {}).get("folder")
+    if not folder:
+        return
+    max_history = int(cfg.get("history", {}).get("max", db.DEFAULT_MAX_HISTORY))
+    yield from sync.sync_steps(folder, max_history)
+
+
+def rescan_catalog() -> Iterator[None]:
+    """Refresh the stored episode listing of every tile, one share per step."""
+
+    for tile in config.load_config().get("tiles", []):
+        path = tile.get("path")
+        if not path:
+            continue
+        try:
+            catalog.rescan(path)
+        except OSError as exc:
+            logger.warning("Cannot rescan %s: %s", path, exc)
+        yield
+
+
+def probe_durations() -> Iterator[None]:
+    """Read the duration of every stored episode not probed yet."""
+
+    for tile in config.load_config().get("tiles", []):
+        path = tile.get("path")
+        if not path:
+            continue
+        episodes = catalog.cached(path, max_age=float("inf"))
+        if not episodes:
+            continue
+        known = catalog.durations(path)
+        missing = [e for e in episodes if e not in known]
+        for start in range(0, len(missing), DURATION_BATCH):
+            probed = {}
+            for episode in missing[start:start + DURATION_BATCH]:
+                try:
+                    probed[episode] = durations.probe(episode) or 0.0
+                except (OSError, ValueError, RuntimeError) as exc:
+                    logger.debug("Cannot read the duration of %s: %s", episode, exc)
+                    probed[episode] = 0.0
+            catalog.store_durations(path, probed)
+            yield
+
+
+def maintain_database() -> Iterator[None]:
+    # Only publishing to a sync folder empties the change log; keep it
+    # bounded without one or while the folder cannot be reached.
+    folder = config.load_config().get("sync", {}).get("folder")
+    dropped = db.prune_changes(PENDING_CHANGES if folder else 0)
+    if dropped and folder:
+        logger.warning("Dropped %d history changes not yet shared", dropped)
+    yield
+    db.checkpoint()
+    yield
+    db.optimize()
+
+
+def vacuum_database() -> Iterator[None]:
+    db.vacuum()
+    yield
+
+
+def rotate_logs() -> Iterator[None]:
+    # Rotating here keeps the size limit from being hit inside a callback.
+    if eventtrace.rotate(eventtrace.MAX_BYTES // 2):
+        logger.info("Rotated the player event recording")
+    yield
+
+
+def apply_config(cfg: dict) -> None:
+    """Apply the parts of ``cfg`` the service keeps in module state."""
+
+    one_tap_logging.configure(cfg)
+    eventtrace.configure(cfg)
+    shares.configure(cfg)
+
+
+def watch_invalidations(warmed: Dict[str, str]) -> Callable[[], None]:
+    """Keep the service's state in step with changes made by other processes.
+
+    Returns a function that stops watching.
+    """
+
+    def config_changed(_key: str) -> None:
+        apply_config(config.load_config())
+
+    def history_purged(show_id: str) -> None:
+        # The predicted next episodes of the show have changed.
+        if show_id:
+            warmed.pop(show_id, None)
+        else:
+            warmed.clear()
+
+    def catalog_updated(path: str) -> None:
+        # Queued picks are opened unchecked and may have been removed.
+        for tile in config.load_config().get("tiles", []):
+            show_id = tile.get("show_id")
+            if show_id and (not path or tile.get("path") == path):
+                warmed.pop(show_id, None)
+                random_state.set(show_id, [])
+
+    handlers = [
+        (invalidation.CONFIG, config_changed),
+        (invalidation.HISTORY, history_purged),
+        (invalidation.CATALOG, catalog_updated),
+    ]
+    for kind, handler in handlers:
+        invalidation.subscribe(kind, handler)
+
+    def unwatch() -> None:
+        for kind, handler in handlers:
+            invalidation.unsubscribe(kind, handler)
+
+    return unwatch
+
+
+def maintenance_jobs(
+    should_pause: Callable[[], bool], should_abort: Callable[[], bool] = lambda: False
+) -> List[scheduler.Job]:
+    """Return the idle-time jobs of the service, most important first.
+
+    ``should_abort`` reports that Kodi is shutting down.
+    """
+
+    def retention() -> Iterator[None]:
+        purge_old_history(config.load_config(), should_pause)
+        yield
+
+    def cache_media() -> Iterator[None]:
+        # A copy under way when playback starts continues throttled.
+        yield from fill_media_cache(config.load_config(), should_pause, should_abort)
+
+    return [
+        scheduler.Job("preselect", 10 * 60, 0, refill_preselection),
+        scheduler.Job("schedule_prewarm", PREWARM_INTERVAL, 1, prewarm_schedule),
+        scheduler.Job("history_sync", 15 * 60, 2, sync_history),
+        scheduler.Job("catalog_rescan", HOUR, 3, rescan_catalog),
+        scheduler.Job("media_cache", 10 * 60, 4, cache_media),
+        scheduler.Job("duration_probe", HOUR, 5, probe_durations),
+        scheduler.Job("history_retention", DAY, 6, retention),
+        scheduler.Job("db_maintenance", DAY, 7, maintain_database),
+        scheduler.Job("log_rotation", HOUR, 8, rotate_logs),
+        scheduler.Job("db_vacuum", 7 * DAY, 9, vacuum_database),
+    ]
+
 
 def run() -> None:
+    cfg = config.load_config()
+    apply_config(cfg)
+    one_tap_logging.start_writer()
     logger.info("Randomizer service starting")
     if xbmc:
-        player = AutoAdvancePlayer()
-        monitor = xbmc.Monitor()
+        resume_cfg = cfg.get("resume", {})
+        tracker = resume.ResumeTracker(
+            float(resume_cfg.get("flush_seconds", resume.DEFAULT_FLUSH_SECONDS)),
+            on_flush=publish_resume_hints,
+        )
+        track_resume = resume_cfg.get("enabled", True)
+        player = AutoAdvancePlayer(tracker)
+        monitor = ServiceMonitor()
+        invalidation.attach()
+        warmed: Dict[str, str] = {}
+        unwatch = watch_invalidations(warmed)
+        points, cleared = [], []
+        for tile in cfg.get("tiles", []):
+            show_id = tile.get("show_id")
+            if show_id:
+                point = db.get_resume(show_id)
+                if point:
+                    points.append((show_id, *point))
+                else:
+                    cleared.append(show_id)
+        publish_resume_hints(points, cleared)
+        if xbmcgui:
+            xbmcgui.Window(10000).setProperty(SERVICE_READY_PROPERTY, "1")
+
+        def should_pause() -> bool:
+            return player.isPlaying() or monitor.abortRequested()
+
+        jobs = scheduler.Scheduler(
+            maintenance_jobs(should_pause, monitor.abortRequested), should_pause
+        )
+        idle = 0.0
         while not monitor.abortRequested():
-            if monitor.waitForAbort(60):
+            if monitor.waitForAbort(resume.SAMPLE_SECONDS):
                 break
+            if player.isPlaying():
+                if track_resume:
+                    player.sample_position()
+            else:
+                jobs.run()
+            tracker.flush()
+            idle += resume.SAMPLE_SECONDS
+            if idle < 60:
+                continue
+            idle = 0.0
+            cfg = config.load_config()
+            shares.publish_properties(cfg.get("tiles", []))
+            if not player.isPlaying():
+                warm_next_episodes(cfg, should_pause, warmed)
+        tracker.flush(force=True)
+        if xbmcgui:
+            xbmcgui.Window(10000).clearProperty(SERVICE_READY_PROPERTY)
+        unwatch()
+        invalidation.detach()
         del player  # Keep player alive for callbacks
     else:
         logger.info("Kodi environment not available; service idle")
     logger.info("Randomizer service stopped")
+    one_tap_logging.stop_writer()
 
 
 if __name__ == "__main__":
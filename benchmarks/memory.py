@@ -0,0 +1,72 @@
+"""Memory held by episode listings, measured with :mod:`tracemalloc`.
+
+Compares a plain list of path strings with :class:`one_tap.episodes.EpisodeList`
+for a show folder and for the ordered candidate list built from it::
+
+    python benchmarks/memory.py --sizes 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap.episodes import EpisodeList  # noqa: E402
+
+FOLDER = "smb://nas/Shows/Bench"
+
+
+def _names(size: int) -> List[str]:
+    return [f"S{i // 100:03d}E{i % 100:02d}.mkv" for i in range(size)]
+
+
+def _retained(build: Callable[[], object]) -> int:
+    """Return the bytes still allocated by the object ``build`` returns."""
+
+    tracemalloc.start()
+    try:
+        kept = build()
+        current, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return current
+
+
+def measure(size: int) -> Dict[str, int]:
+    names = _names(size)
+    paths = [os.path.join(FOLDER, n) for n in names]
+    packed = EpisodeList.from_listing(FOLDER, names)
+    half = size // 2
+    return {
+        "list": _retained(lambda: [os.path.join(FOLDER, n) for n in names]),
+        "episode_list": _retained(lambda: EpisodeList.from_listing(FOLDER, names)),
+        "list_candidates": _retained(lambda: paths[half:] + paths[:half]),
+        "episode_list_candidates": _retained(lambda: packed.rotate(half)),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100000", help="comma separated episode counts")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    args = parser.parse_args(argv)
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        results[str(size)] = row = measure(size)
+        for name, value in row.items():
+            print(f"{name}[{size}]".ljust(40), f"{value / 1024:10.1f} KiB")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""Benchmarks for the One-Tap hot paths with baseline regression checks.
+
+Each case runs against synthetic libraries of 100, 10k and 100k episodes
+(and matching long playback histories) inside a temporary profile::
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --update-baseline   # record this box's numbers
+
+Results are written as JSON.  When a baseline file exists every case is
+compared against it and the script exits with status 1 if a median time
+regressed by more than ``--tolerance``.  Baselines are machine specific;
+record one per box type (e.g. on the ARM sticks) before comparing.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+sys.path.append(str(repo_root))
+
+from one_tap import config, db, random_state, selection  # noqa: E402
+from one_tap.episodes import EpisodeList  # noqa: E402
+from tools.fake_kodi import FakeKodi  # noqa: E402
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+DEFAULT_TOLERANCE = 0.25
+
+# A case receives the library size and returns ``(setup, operation)``.
+Case = Callable[[int, Path], Tuple[Callable[[], None], Callable[[], None]]]
+
+
+def _episodes(size: int) -> List[str]:
+    return [f"smb://nas/Shows/Bench/S{i // 100:03d}E{i % 100:02d}.mkv" for i in range(size)]
+
+
+def _fill_history(show_id: str, episodes: List[str]) -> None:
+    with db._connect() as conn:
+        conn.execute("DELETE FROM history")
+        conn.executemany(
+            "INSERT INTO history(show_id, episode) VALUES (?, ?)",
+            ((show_id, ep) for ep in episodes),
+        )
+
+
+def case_candidates_order(size: int, tmp: Path):
+    eps = _episodes(size)
+    # The catalog hands out packed listings.
+    packed = EpisodeList.from_paths(eps)
+
+    def setup() -> None:
+        _fill_history("bench", eps[: size // 2])
+
+    return setup, lambda: selection.episode_candidates("bench", packed, "order")
+
+
+def case_candidates_random(size: int, tmp: Path):
+    eps = _episodes(size)
+    packed = EpisodeList.from_paths(eps)
+
+    def setup() -> None:
+        _fill_history("bench", eps[: size // 2])
+
+    return setup, lambda: selection.episode_candidates(
+        "bench", packed, "random", {"exclude_last_n": 50}
+    )
+
+
+def case_update_history(size: int, tmp: Path):
+    eps = _episodes(size)
+
+    def setup() -> None:
+        _fill_history("bench", eps)
+
+    return setup, lambda: db.update_history("bench", eps[0], max_history=size)
+
+
+def case_get_history(size: int, tmp: Path):
+    eps = _episodes(size)
+
+    def setup() -> None:
+        _fill_history("bench", eps)
+
+    return setup, lambda: db.get_history("bench")
+
+
+def case_load_config(size: int, tmp: Path):
+    tiles = max(1, size // 100)
+
+    def setup() -> None:
+        config.save_config(
+            {
+                "tiles": [
+                    {"show_id": f"s{i}", "label": f"Show {i}", "path": f"smb://nas/{i}"}
+                    for i in range(tiles)
+                ],
+                "mode": "order",
+                "history": {"max": 50},
+            }
+        )
+
+    return setup, config.load_config
+
+
+def case_random_state(size: int, tmp: Path):
+    shows = max(1, size // 100)
+    eps = _episodes(100)
+
+    def setup() -> None:
+        random_state.save({f"s{i}": list(eps) for i in range(shows)})
+
+    def op() -> None:
+        random_state.set("s0", list(eps))
+        random_state.get("s0")
+        random_state.consume_first("s0")
+
+    return setup, op
+
+
+def case_list_episodes(size: int, tmp: Path):
+    kodi = FakeKodi(tmp / "kodi")
+    kodi.vfs.add_show("smb://nas/Shows/Bench", size)
+    plugin = {}
+
+    def setup() -> None:
+        if not plugin:
+            with kodi.installed():
+                plugin["mod"] = kodi.load_addon(
+                    repo_root / "addons" / "plugin.one_tap.play" / "default.py",
+                    "bench_plugin",
+                )
+
+    def op() -> None:
+        with kodi.installed():
+            plugin["mod"]._list_episodes("smb://nas/Shows/Bench")
+
+    return setup, op
+
+
+CASES: Dict[str, Case] = {
+    "selection.episode_candidates[order]": case_candidates_order,
+    "selection.episode_candidates[random]": case_candidates_random,
+    "db.update_history": case_update_history,
+    "db.get_history": case_get_history,
+    "config.load_config": case_load_config,
+    "random_state.set_get_consume": case_random_state,
+    "plugin._list_episodes": case_list_episodes,
+}
+
+
+def _measure(op: Callable[[], None], repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        op()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(
+    sizes=DEFAULT_SIZES, repeat: int = 5, only: Optional[List[str]] = None
+) -> Dict[str, Dict[str, float]]:
+    """Run the selected cases and return timings keyed by ``name[size]``."""
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        real_resolve = config._resolve
+        config._resolve = lambda p: tmp / Path(p).name
+        try:
+            for name, case in CASES.items():
+                if only and not any(o in name for o in only):
+                    continue
+                for size in sizes:
+                    setup, op = case(size, tmp)
+                    setup()
+                    op()  # warm up caches and lazy imports
+                    times = _measure(op, repeat)
+                    results[f"{name}[{size}]"] = {
+                        "median": statistics.median(times),
+                        "min": min(times),
+                        "repeat": repeat,
+                    }
+        finally:
+            config._resolve = real_resolve
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """Return descriptions of cases slower than ``baseline`` by ``tolerance``."""
+
+    regressions = []
+    for key, current in sorted(results.items()):
+        base = baseline.get(key)
+        if not base or base["median"] <= 0:
+            continue
+        ratio = current["median"] / base["median"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{key}: {current['median'] * 1000:.3f}ms vs "
+                f"{base['median'] * 1000:.3f}ms baseline ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark One-Tap hot paths")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="Comma separated library sizes",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--only", action="append", help="Run cases matching this text")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Allowed slowdown before failing (0.25 = 25%%)",
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Store results as the baseline"
+    )
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = run(sizes, args.repeat, args.only)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    for key, value in results.items():
+        print(f"{key:48} {value['median'] * 1000:10.3f} ms")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2, sort_keys=True))
+        print(f"Baseline written to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; skipping comparison")
+        return 0
+    baseline = json.loads(baseline_path.read_text())["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
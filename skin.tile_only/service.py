@@ -5,9 +5,15 @@ from __future__ import annotations
 Loads the caregiver configuration and exposes tile metadata as window
 properties for the Home screen.  This allows the skin's XML to remain
 simple and only display the configured tiles.
+
+With ``schedule`` rules in the configuration (see :mod:`one_tap.schedule`)
+the service stays resident and publishes the tiles of the current block,
+then sleeps until the next boundary.  A saved configuration is published
+at once and moves that single deadline.
 """
 
-from typing import Any, Dict
+import time
+from typing import Any, Callable, Dict, Optional
 
 try:  # Kodi runtime
     import xbmc  # type: ignore
@@ -16,19 +22,33 @@ except ImportError:  # pragma: no cover - outside Kodi
     xbmc = None  # type: ignore
     xbmcgui = None  # type: ignore
 
-from one_tap import config
+from one_tap import config, invalidation, schedule
 
 MAX_TILES = 12
+# Longest single wait, so a clock change or an earlier deadline set by a
+# configuration change is noticed within this many seconds.
+WAKE_SECONDS = 60.0
+
 
+def main(now: Optional[float] = None) -> Optional[float]:
+    """Populate Window(Home) properties for each tile of the current block.
 
-def main() -> None:
-    """Populate Window(Home) properties for each configured tile."""
+    Returns the seconds until the next block starts.
+    """
     if xbmcgui is None:
         # Running outside Kodi; nothing to do
-        return
+        return None
 
     cfg: Dict[str, Any] = config.load_config()
-    tiles = cfg.get("tiles", [])
+    try:
+        table = schedule.table(cfg)
+    except ValueError as exc:
+        # Showing every tile beats an empty Home screen.
+        if xbmc:
+            xbmc.log(f"One-Tap skin: ignoring invalid schedule: {exc}", xbmc.LOGERROR)
+        table = schedule.compile_rules([])
+    _index, show_ids, left = schedule.block_at(table, now)
+    tiles = schedule.tiles_for(cfg, show_ids)
     window = xbmcgui.Window(10000)  # Home window
 
     for i in range(1, MAX_TILES + 1):
@@ -42,7 +62,44 @@ def main() -> None:
     window.setProperty("tile.count", str(len(tiles)))
     if xbmc:
         xbmc.log("One-Tap skin properties initialized", xbmc.LOGINFO)
+    return left
+
+
+if xbmc:  # pragma: no cover - depends on Kodi
+    class SkinMonitor(xbmc.Monitor):
+        """Monitor passing notifications to the invalidation bus."""
+
+        def onNotification(self, sender: str, method: str, data: str) -> None:  # type: ignore[override]
+            invalidation.handle_notification(sender, method, data)
+
+
+def run(clock: Callable[[], float] = time.time) -> None:
+    """Keep the tiles of the current schedule block published until Kodi exits."""
+
+    left = main(clock())
+    if left is None or not xbmc:
+        return
+    deadline = clock() + left
+    monitor = SkinMonitor()
+    invalidation.attach()
+
+    def config_changed(_key: str) -> None:
+        nonlocal deadline
+        deadline = clock() + main(clock())
+
+    invalidation.subscribe(invalidation.CONFIG, config_changed)
+    try:
+        while not monitor.abortRequested():
+            remaining = deadline - clock()
+            if remaining <= 0:
+                deadline = clock() + main(clock())
+                continue
+            if monitor.waitForAbort(min(remaining, WAKE_SECONDS)):
+                break
+    finally:
+        invalidation.unsubscribe(invalidation.CONFIG, config_changed)
+        invalidation.detach()
 
 
 if __name__ == "__main__":
-    main()
+    run()
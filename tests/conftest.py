@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+sys.path.append(str(repo_root))
+
+from one_tap import tracing
+from tools.fake_kodi import FakeKodi
+
+
+@pytest.fixture
+def kodi(tmp_path):
+    """A fake Kodi runtime installed for the duration of the test."""
+
+    fake = FakeKodi(tmp_path / "profile")
+    with fake.installed():
+        yield fake
+
+
+@pytest.fixture(autouse=True)
+def _reset_tracing():
+    """Drop spans left behind so the exit flush never writes into the cwd."""
+
+    yield
+    tracing.set_tap_id("")
+    del tracing._pending[:]
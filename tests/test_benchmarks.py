@@ -0,0 +1,34 @@
+import json
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root))
+
+from benchmarks import run as bench
+
+
+def test_compare_flags_only_slowdowns_beyond_tolerance():
+    baseline = {"a[100]": {"median": 1.0}, "b[100]": {"median": 1.0}}
+    results = {
+        "a[100]": {"median": 1.2},
+        "b[100]": {"median": 1.5},
+        "c[100]": {"median": 9.0},
+    }
+
+    regressions = bench.compare(results, baseline, tolerance=0.25)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("b[100]")
+
+
+def test_smoke_run_against_baseline(tmp_path):
+    output = tmp_path / "results.json"
+    baseline = tmp_path / "baseline.json"
+    args = ["--sizes", "100", "--repeat", "1", "--baseline", str(baseline)]
+
+    assert bench.main(args + ["--update-baseline"]) == 0
+    assert bench.main(args + ["--output", str(output), "--tolerance", "1000"]) == 0
+
+    results = json.loads(output.read_text())["results"]
+    assert set(results) == {f"{name}[100]" for name in bench.CASES}
@@ -0,0 +1,75 @@
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import bundle, config, db
+
+
+def _use_profile(monkeypatch, root: Path) -> None:
+    monkeypatch.setattr(config, "_resolve", lambda p: root / Path(p).name)
+
+
+def test_bundle_round_trip_merges_history(tmp_path, monkeypatch):
+    old_box = tmp_path / "old"
+    new_box = tmp_path / "new"
+    now = time.time()
+
+    _use_profile(monkeypatch, old_box)
+    config.save_config({"tiles": [{"show_id": "A", "path": "smb://nas/A"}], "mode": "order"})
+    with db._connect() as conn:
+        conn.executemany(
+            "INSERT INTO history(show_id, episode, played_at) VALUES (?, ?, ?)",
+            [("A", f"a{i}", now - 1000 + i) for i in range(5)] + [("B", "b0", now - 500)],
+        )
+    db.save_resume_points([("A", "a4", 300.0, 1320.0)])
+    dest = tmp_path / "backup.zip"
+    bundle.export_bundle(dest)
+    assert sorted(zipfile.ZipFile(dest).namelist()) == ["config.json", "manifest.json", "one_tap.db"]
+
+    _use_profile(monkeypatch, new_box)
+    # The replacement box was already used before the import.
+    with db._connect() as conn:
+        conn.executemany(
+            "INSERT INTO history(show_id, episode, played_at) VALUES (?, ?, ?)",
+            [("A", "a5", now), ("A", "a3", now - 997)],
+        )
+
+    assert bundle.import_bundle(dest) == 5
+    assert config.load_config()["tiles"][0]["show_id"] == "A"
+    # Histories are interleaved by play time; the shared play is kept once.
+    assert db.get_history("A") == ["a0", "a1", "a2", "a3", "a4", "a5"]
+    assert db.get_history("B") == ["b0"]
+    assert {s.key: s.plays for s in db.show_stats()} == {"A": 6, "B": 1}
+    assert db.get_resume("A") == ("a4", 300.0)
+
+    # Importing the same bundle again adds nothing.
+    assert bundle.import_bundle(dest) == 0
+    assert len(db.get_history("A")) == 6
+
+
+def test_import_keeps_history_max(tmp_path, monkeypatch):
+    now = time.time()
+    _use_profile(monkeypatch, tmp_path / "old")
+    config.save_config({"tiles": [], "history": {"max": 3}})
+    with db._connect() as conn:
+        conn.executemany(
+            "INSERT INTO history(show_id, episode, played_at) VALUES (?, ?, ?)",
+            [("A", f"a{i}", now - 100 + i) for i in range(3)],
+        )
+    dest = tmp_path / "backup.zip"
+    bundle.export_bundle(dest)
+
+    _use_profile(monkeypatch, tmp_path / "new")
+    with db._connect() as conn:
+        conn.executemany(
+            "INSERT INTO history(show_id, episode, played_at) VALUES (?, ?, ?)",
+            [("A", "a3", now), ("B", "b0", now)],
+        )
+
+    assert bundle.import_bundle(dest) == 3
+    assert db.get_history("A") == ["a1", "a2", "a3"]
+    assert db.get_history("B") == ["b0"]
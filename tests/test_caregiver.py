@@ -1,24 +1,40 @@
 import json
 import sys
+import zipfile
 from pathlib import Path
 
 repo_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
-sys.path.append(str(repo_root / "addons" / "script.one_tap.caregiver"))
 
+from one_tap import config, db
 
-def test_verify_pin(monkeypatch):
-    import default as caregiver
+ADDONS = repo_root / "addons"
 
-    monkeypatch.setattr(caregiver.config, "load_config", lambda: {"pin": "1234"})
+
+def _caregiver(kodi, name="caregiver"):
+    return kodi.load_addon(ADDONS / "script.one_tap.caregiver" / "default.py", name)
+
+
+def _answers(values):
+    answers = iter(values)
+    return lambda _prompt: next(answers)
+
+
+def test_verify_pin(kodi):
+    caregiver = _caregiver(kodi)
+
+    config.save_config({"pin": "1234"})
     assert caregiver.verify_pin(lambda _prompt: "1234") is True
     assert caregiver.verify_pin(lambda _prompt: "9999") is False
+    # Inside Kodi the PIN is asked for with the numeric dialog.
+    kodi.dialog_answers[:] = ["1234"]
+    assert caregiver.verify_pin() is True
 
 
-def test_verify_pin_not_set(monkeypatch):
-    import default as caregiver
+def test_verify_pin_not_set(kodi):
+    caregiver = _caregiver(kodi)
 
-    monkeypatch.setattr(caregiver.config, "load_config", lambda: {"pin": ""})
+    config.save_config({"pin": ""})
     called = False
 
     def fake_prompt(msg: str) -> str:
@@ -30,192 +46,172 @@ def test_verify_pin_not_set(monkeypatch):
     assert called is False
 
 
-def test_configure_updates_weights(monkeypatch):
-    import default as caregiver
-
-    cfg = {
-        "mode": "order",
-        "random": {},
-        "tiles": [
-            {"show_id": "s1", "weight": 1},
-            {"show_id": "s2", "weight": 1},
-        ],
-    }
-
-    inputs = iter(["n", "random", "5", "y", "1.5", "2.0", ""])
-
-    def fake_input(_prompt: str) -> str:
-        return next(inputs)
-
-    saved: dict = {}
-
-    monkeypatch.setattr(caregiver.config, "load_config", lambda: cfg)
+def test_configure_updates_weights(kodi):
+    caregiver = _caregiver(kodi)
 
-    def fake_save(updated: dict) -> None:
-        saved.update(updated)
-
-    monkeypatch.setattr(caregiver.config, "save_config", fake_save)
+    config.save_config(
+        {
+            "mode": "order",
+            "random": {},
+            "tiles": [
+                {"show_id": "s1", "weight": 1},
+                {"show_id": "s2", "weight": 1},
+            ],
+        }
+    )
 
-    caregiver.configure(fake_input)
+    caregiver.configure(_answers(["n", "random", "5", "y", "1.5", "2.0", ""]))
 
+    saved = config.load_config()
     assert saved["mode"] == "random"
     assert saved["random"]["use_comfort_weights"] is True
     assert saved["random"]["exclude_last_n"] == 5
     assert [t["weight"] for t in saved["tiles"]] == [1.5, 2.0]
 
 
-def test_configure_manages_tiles_and_history(monkeypatch):
-    import default as caregiver
-
-    cfg = {
-        "mode": "order",
-        "random": {},
-        "tiles": [{"show_id": "s1", "path": "p1"}],
-        "history": {"max": 50},
-    }
-
-    inputs = iter([
-        "y",  # manage tiles
-        "add",
-        "s2",
-        "p2",
-        "",  # label
-        "",  # default weight
-        "remove",
-        "s1",
-        "done",
-        "",  # mode unchanged
-        "75",  # history limit
-    ])
-
-    def fake_input(_prompt: str) -> str:
-        return next(inputs)
+def test_configure_manages_tiles_and_history(kodi):
+    caregiver = _caregiver(kodi)
 
-    saved: dict = {}
-
-    monkeypatch.setattr(caregiver.config, "load_config", lambda: cfg)
-
-    def fake_save(updated: dict) -> None:
-        saved.update(updated)
-
-    monkeypatch.setattr(caregiver.config, "save_config", fake_save)
+    config.save_config(
+        {
+            "mode": "order",
+            "random": {},
+            "tiles": [{"show_id": "s1", "path": "p1"}],
+            "history": {"max": 50},
+        }
+    )
 
-    caregiver.configure(fake_input)
+    caregiver.configure(
+        _answers(
+            [
+                "y",  # manage tiles
+                "add",
+                "s2",
+                "p2",
+                "",  # label
+                "",  # default weight
+                "remove",
+                "s1",
+                "done",
+                "",  # mode unchanged
+                "75",  # history limit
+            ]
+        )
+    )
 
+    saved = config.load_config()
     assert [t["show_id"] for t in saved["tiles"]] == ["s2"]
     assert saved["tiles"][0]["path"] == "p2"
     assert saved["history"]["max"] == 75
 
 
-def test_manage_tiles_edit_and_reorder(monkeypatch):
-    import default as caregiver
+def test_manage_tiles_edit_and_reorder(kodi):
+    caregiver = _caregiver(kodi)
 
-    cfg = {
-        "mode": "order",
-        "random": {},
-        "tiles": [
-            {"show_id": "s1", "path": "p1", "label": "L1"},
-            {"show_id": "s2", "path": "p2", "label": "L2"},
-        ],
-        "history": {"max": 50},
-    }
-
-    inputs = iter([
-        "y",  # manage tiles
-        "edit",
-        "s1",
-        "NL1",  # new label
-        "p1n",  # new path
-        "",  # weight unchanged
-        "reorder",
-        "s2",
-        "0",
-        "done",
-        "",  # mode unchanged
-        "",  # history unchanged
-    ])
-
-    def fake_input(_prompt: str) -> str:
-        return next(inputs)
-
-    saved: dict = {}
-
-    monkeypatch.setattr(caregiver.config, "load_config", lambda: cfg)
-
-    def fake_save(updated: dict) -> None:
-        saved.update(updated)
-
-    monkeypatch.setattr(caregiver.config, "save_config", fake_save)
+    config.save_config(
+        {
+            "mode": "order",
+            "random": {},
+            "tiles": [
+                {"show_id": "s1", "path": "p1", "label": "L1"},
+                {"show_id": "s2", "path": "p2", "label": "L2"},
+            ],
+            "history": {"max": 50},
+        }
+    )
 
-    caregiver.configure(fake_input)
+    caregiver.configure(
+        _answers(
+            [
+                "y",  # manage tiles
+                "edit",
+                "s1",
+                "NL1",  # new label
+                "p1n",  # new path
+                "",  # weight unchanged
+                "reorder",
+                "s2",
+                "0",
+                "done",
+                "",  # mode unchanged
+                "",  # history unchanged
+            ]
+        )
+    )
 
+    saved = config.load_config()
     assert [t["show_id"] for t in saved["tiles"]] == ["s2", "s1"]
     s1 = next(t for t in saved["tiles"] if t["show_id"] == "s1")
     assert s1["path"] == "p1n"
     assert s1["label"] == "NL1"
 
 
-def test_menu_runs_selected_actions(monkeypatch):
-    import default as caregiver
-
-    called: list[str] = []
-
-    monkeypatch.setattr(
-        caregiver, "configure", lambda _inp=None: called.append("config")
-    )
-    monkeypatch.setattr(
-        caregiver.db, "purge_history", lambda _show=None: called.append("purge")
+def test_menu_runs_selected_actions(kodi, tmp_path):
+    caregiver = _caregiver(kodi)
+
+    config.save_config({"mode": "order", "tiles": []})
+    db.update_history("A", "a1")
+    exported = tmp_path / "out.json"
+    backup = tmp_path / "backup.zip"
+
+    # The menu entries are picked in the select dialog, in order.
+    kodi.dialog_answers[:] = list(range(10))
+    caregiver.menu(
+        _answers(
+            [
+                "",  # configure: tiles unchanged
+                "",  # mode unchanged
+                "",  # history unchanged
+                "",  # purge all shows
+                "",  # regardless of age
+                str(exported),
+                str(exported),
+                "",  # statistics of all shows
+                str(backup),
+                str(backup),
+            ]
+        )
     )
-    monkeypatch.setattr(
-        caregiver,
-        "export_config",
-        lambda path: called.append(f"export:{path}") or True,
-    )
-    monkeypatch.setattr(
-        caregiver,
-        "import_config",
-        lambda path: called.append(f"import:{path}") or True,
-    )
-
-    inputs = iter([
-        "1",
-        "2",
-        "",
-        "3",
-        "out.json",
-        "4",
-        "out.json",
-        "5",
-    ])
-
-    def fake_input(_prompt: str) -> str:
-        return next(inputs)
-
-    caregiver.menu(fake_input)
 
-    assert called == ["config", "purge", "export:out.json", "import:out.json"]
+    assert db.get_history("A") == []
+    assert json.loads(exported.read_text())["mode"] == "order"
+    assert "one_tap.db" in zipfile.ZipFile(backup).namelist()
+    assert [m for m, _level in kodi.log_lines if m.startswith("textviewer")] == [
+        "textviewer: Latency report",
+        "textviewer: Profiling captures",
+        "textviewer: Play statistics",
+    ]
 
 
-def test_export_config_writes_file(tmp_path, monkeypatch):
-    import default as caregiver
+def test_export_config_writes_file(kodi, tmp_path):
+    caregiver = _caregiver(kodi)
 
-    cfg = {"mode": "order", "tiles": []}
-    monkeypatch.setattr(caregiver.config, "load_config", lambda: cfg)
+    config.save_config({"mode": "order", "tiles": []})
 
     dest = tmp_path / "cfg.json"
     assert caregiver.export_config(str(dest)) is True
-    assert json.loads(dest.read_text()) == cfg
+    assert json.loads(dest.read_text()) == config.load_config()
 
 
-def test_import_config_reads_file(tmp_path, monkeypatch):
-    import default as caregiver
+def test_import_config_reads_file(kodi, tmp_path):
+    caregiver = _caregiver(kodi)
 
     src = tmp_path / "cfg.json"
-    data = {"mode": "random"}
-    src.write_text(json.dumps(data))
-
-    saved: dict = {}
-    monkeypatch.setattr(caregiver.config, "save_config", lambda c: saved.update(c))
+    src.write_text(json.dumps({"mode": "random"}))
 
     assert caregiver.import_config(str(src)) is True
-    assert saved == data
+    assert config.load_config()["mode"] == "random"
+
+
+def test_stats_report_lists_counts(kodi):
+    caregiver = _caregiver(kodi)
+
+    assert caregiver.stats_report() == "No plays recorded yet."
+    for episode in ("a1", "a2", "a1"):
+        db.update_history("A", episode)
+    db.record_failure("A", "a3")
+
+    report = caregiver.stats_report()
+    assert report.startswith("A: plays=3 failures=1 last=")
+    assert not report.endswith("never")
+    assert caregiver.stats_report("A").splitlines()[0].startswith("a1: plays=2 failures=0")
@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import channel, config, db
+
+ADDONS = repo_root / "addons"
+
+
+def _stream(name, count, pulled):
+    for i in range(1, count + 1):
+        pulled.append(name)
+        yield f"{name}{i}"
+
+
+def test_interleave_is_a_lazy_weighted_merge():
+    pulled = []
+    merged = channel.interleave(
+        [("A", _stream("a", 1000, pulled), 1.0), ("B", _stream("b", 1000, pulled), 1.0)]
+    )
+    assert [next(merged) for _ in range(4)] == [("A", "a1"), ("B", "b1"), ("A", "a2"), ("B", "b2")]
+    assert len(pulled) == 4  # nothing beyond the heads that were due
+
+    weighted = channel.interleave(
+        [("A", iter(["a1", "a2", "a3", "a4"]), 2.0), ("B", iter(["b1", "b2"]), 1.0)],
+        passes={"A": 0.5},
+    )
+    # B starts ahead; then A plays twice per B until B runs out.
+    assert [e for _s, e in weighted] == ["b1", "a1", "a2", "b2", "a3", "a4"]
+
+
+def test_channel_tap_alternates_and_advances_each_show(kodi):
+    for show in "AB":
+        for i in range(1, 4):
+            kodi.vfs.add(f"smb://nas/{show}/S01E{i:02d}.mkv")
+    config.save_config(
+        {
+            "tiles": [
+                {"show_id": "A", "path": "smb://nas/A"},
+                {"show_id": "B", "path": "smb://nas/B"},
+                {"show_id": "mix", "channel": ["A", "B"]},
+            ],
+            "ui": {"tap_debounce_seconds": 0},
+        }
+    )
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "channel_plugin")
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "channel_service")
+    kodi.register_script("plugin.one_tap.play", plugin.main)
+
+    player = service.AutoAdvancePlayer()
+    kodi.execute_builtin("RunScript(plugin.one_tap.play,show_id=mix)")
+    kodi.advance(2 * (1320 + kodi.spawn_delay + kodi.start_delay) + 1)
+
+    assert kodi.opened[:3] == [
+        "smb://nas/A/S01E01.mkv",
+        "smb://nas/B/S01E01.mkv",
+        "smb://nas/A/S01E02.mkv",
+    ]
+    assert db.get_history("A") == ["smb://nas/A/S01E01.mkv", "smb://nas/A/S01E02.mkv"]
+    assert db.get_history("B") == ["smb://nas/B/S01E01.mkv"]
+
+    # A tap on a single show leaves the channel; its order is unaffected.
+    kodi.execute_builtin("RunScript(plugin.one_tap.play,show_id=B)")
+    kodi.advance(kodi.spawn_delay + kodi.start_delay)
+    assert kodi.opened[-1] == "smb://nas/B/S01E02.mkv"
+    assert kodi.windows[10000].get("one_tap.channel", "") == ""
+    del player
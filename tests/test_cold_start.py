@@ -0,0 +1,109 @@
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, db, random_state
+
+ADDONS = repo_root / "addons"
+PLUGIN_DIR = ADDONS / "plugin.one_tap.play"
+LIB_DIR = ADDONS / "script.module.one_tap" / "lib"
+# Cumulative import time of the plugin entry point, in microseconds.
+IMPORT_BUDGET_US = 150_000
+# Never needed to open a queued random pick.
+HEAVY_MODULES = {"sqlite3", "random", "one_tap.db", "one_tap.catalog", "one_tap.selection"}
+
+IMPORT = f"import sys; sys.path[:0] = [{str(LIB_DIR)!r}, {str(PLUGIN_DIR)!r}]; import default"
+
+# A tap on a random tile whose pick the service queued, in a fresh interpreter.
+TAP = textwrap.dedent(
+    """
+    import json, sys
+    from pathlib import Path
+    repo_root = Path({repo!r})
+    sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+    sys.path.append(str(repo_root))
+    from one_tap import tracing
+    from tools.fake_kodi import FakeKodi
+    kodi = FakeKodi(Path({profile!r}), spawn_delay=0.0, start_delay=0.0)
+    kodi.windows[10000] = {{"one_tap.service_ready": "1"}}
+    with kodi.installed():
+        plugin = kodi.load_addon(repo_root / "addons" / "plugin.one_tap.play" / "default.py", "tap")
+        sys.argv = ["plugin.one_tap.play", "show_id=A"]
+        plugin.main()
+        tracing.flush()
+    print(json.dumps({{
+        "opened": kodi.opened,
+        "heavy": sorted(m for m in {heavy!r} if m in sys.modules),
+        "pending": kodi.windows[10000].get("one_tap.pending_play"),
+    }}))
+    """
+)
+
+
+def _import_profile():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT],
+        capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def test_plugin_cold_start_stays_within_budget():
+    profiles = [_import_profile() for _ in range(3)]
+    assert min(p["default"] for p in profiles) < IMPORT_BUDGET_US
+    assert not HEAVY_MODULES & set(profiles[0])
+
+
+def test_queued_pick_opens_without_database_or_random(tmp_path, monkeypatch):
+    profile = tmp_path / "profile"
+    monkeypatch.setattr(
+        config, "_resolve", lambda p: profile / p.replace("special://profile/", "")
+    )
+    config.save_config(
+        {"tiles": [{"show_id": "A", "path": "smb://nas/A"}], "mode": "random"}
+    )
+    random_state.set("A", ["smb://nas/A/S01E0003.mkv", "smb://nas/A/S01E0001.mkv"])
+    script = TAP.format(repo=str(repo_root), profile=str(profile), heavy=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    tap = json.loads(out.strip().splitlines()[-1])
+    assert tap["opened"] == ["smb://nas/A/S01E0003.mkv"]
+    assert tap["heavy"] == []
+    assert json.loads(tap["pending"])[:2] == ["A", "smb://nas/A/S01E0003.mkv"]
+    assert random_state.get("A") == ["smb://nas/A/S01E0001.mkv"]
+
+
+def test_service_records_the_handed_over_play(kodi):
+    kodi.vfs.add_show("smb://nas/A", 3)
+    config.save_config(
+        {
+            "tiles": [{"show_id": "A", "path": "smb://nas/A"}],
+            "mode": "random",
+            "ui": {"tap_debounce_seconds": 0},
+        }
+    )
+    random_state.set("A", ["smb://nas/A/S01E0002.mkv"])
+    kodi.windows.setdefault(10000, {})["one_tap.service_ready"] = "1"
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "fast_service")
+    player = service.AutoAdvancePlayer()
+    plugin = kodi.load_addon(PLUGIN_DIR / "default.py", "fast_plugin")
+    sys.argv = ["plugin.one_tap.play", "show_id=A"]
+    plugin.main()
+    assert db.get_history("A") == []
+    kodi.advance(5)
+    assert db.get_history("A") == ["smb://nas/A/S01E0002.mkv"]
+    assert "one_tap.pending_play" not in kodi.windows[10000]
+    del player
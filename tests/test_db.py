@@ -1,4 +1,6 @@
 import json
+import sqlite3
+import time
 import sys
 from pathlib import Path
 
@@ -6,7 +8,7 @@ from pathlib import Path
 repo_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
 
-from one_tap import config, db
+from one_tap import config, db, invalidation
 
 
 def _fake_resolve(base: Path, path: str) -> Path:
@@ -91,3 +93,83 @@ def test_remove_last_history(tmp_path, monkeypatch):
     db.remove_last_history("show")
     assert db.get_history("show") == ["a"]
 
+
+
+def test_stats_survive_history_trimming(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: _fake_resolve(tmp_path, p))
+    monkeypatch.setattr(db, "DB_PATH", "history.db")
+
+    for i in range(12):
+        db.update_history("show", f"ep{i % 3}", max_history=5)
+    db.update_history("other", "x", max_history=5)
+    assert db.remove_last_history("show") == "ep2"
+    db.record_failure("show", "ep0")
+
+    assert len(db.get_history("show")) == 4
+    stats = {s.key: s for s in db.show_stats()}
+    assert stats["show"].plays == 11
+    assert stats["show"].failures == 2
+    assert stats["other"].plays == 1
+    episodes = {s.key: (s.plays, s.failures) for s in db.episode_stats("show")}
+    assert episodes == {"ep0": (4, 1), "ep1": (4, 0), "ep2": (3, 1)}
+
+    db.purge_history("show")
+    assert [s.key for s in db.show_stats()] == ["other"]
+
+
+def test_stats_backfilled_from_existing_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: _fake_resolve(tmp_path, p))
+    monkeypatch.setattr(db, "DB_PATH", "history.db")
+    conn = sqlite3.connect(str(tmp_path / "history.db"))
+    conn.executescript(db.SCHEMA[0])
+    conn.executemany(
+        "INSERT INTO history(show_id, episode, played_at) VALUES (?, ?, ?)",
+        [("show", "a", 10.0), ("show", "a", 20.0), ("show", "b", 30.0)],
+    )
+    conn.commit()
+    conn.close()
+
+    assert db.show_stats() == [db.PlayStats("show", 3, 30.0, 0)]
+    assert db.episode_stats("show")[0] == db.PlayStats("a", 2, 20.0, 0)
+
+
+def test_purge_older_than_runs_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: _fake_resolve(tmp_path, p))
+    monkeypatch.setattr(db, "DB_PATH", "history.db")
+    day = 86400
+    now = time.time()
+    with db._connect() as conn:
+        conn.executemany(
+            "INSERT INTO history(show_id, episode, played_at) VALUES (?, ?, ?)",
+            [("old", f"o{i}", now - 100 * day + i) for i in range(25)]
+            + [("show", f"s{i}", now - (40 - i) * day) for i in range(40)],
+        )
+    chunks = []
+    removed = db.purge_older_than(
+        30.5, chunk=10, should_stop=lambda: chunks.append(1) and False
+    )
+
+    # Everything older than 30.5 days except the latest entry of each show.
+    assert removed == 24 + 10
+    assert len(chunks) == 3
+    assert db.get_history("old") == ["o24"]
+    assert db.get_history("show") == [f"s{i}" for i in range(10, 40)]
+    assert db.purge_older_than(30.5, "show") == 0
+    # Statistics keep counting the purged plays.
+    assert {s.key: s.plays for s in db.show_stats()} == {"old": 25, "show": 40}
+
+
+def test_purge_keeps_the_latest_play_in_history_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: _fake_resolve(tmp_path, p))
+    monkeypatch.setattr(db, "DB_PATH", "history.db")
+    old = time.time() - 100 * 86400
+    with db._connect() as conn:
+        # A synced play inserted last but played before the local one.
+        conn.executemany(
+            "INSERT INTO history(show_id, episode, played_at) VALUES (?, ?, ?)",
+            [("show", "s2", old + 10), ("show", "s1", old)],
+        )
+    assert db.purge_older_than(30) == 1
+    assert db.get_history("show") == ["s2"]
+    # Other processes are told to drop the cached predictions.
+    assert invalidation._read()["events"][-1][1:] == [invalidation.HISTORY, ""]
@@ -0,0 +1,129 @@
+import struct
+import sys
+from pathlib import Path
+
+import pytest
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import catalog, config, durations, selection, vfs
+
+ADDONS = repo_root / "addons"
+
+
+def _atom(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _mp4(seconds, payload=1024 * 1024):
+    mvhd = _atom(b"mvhd", b"\0" * 12 + struct.pack(">II", 600, int(seconds * 600)) + b"\0" * 80)
+    moov = _atom(b"moov", _atom(b"iods", b"\0" * 16) + mvhd)
+    # The index sits behind the media data, as written by most encoders.
+    return _atom(b"ftyp", b"isom") + _atom(b"mdat", b"\0" * payload) + moov
+
+
+def _ebml(element_id, payload):
+    size = len(payload) | (0x01 << 56)  # eight byte size
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + size.to_bytes(8, "big") + payload
+
+
+def _mkv(seconds=None, clusters=(0, 5000), payload=512 * 1024, cues=()):
+    info = _ebml(durations.TIMECODE_SCALE, (1_000_000).to_bytes(3, "big"))
+    if seconds is not None:
+        info += _ebml(durations.DURATION, struct.pack(">d", seconds * 1000))
+    body = _ebml(0x114D9B74, b"\0" * 32) + _ebml(durations.INFO, info)
+    for timestamp in clusters:
+        cluster = _ebml(durations.CLUSTER_TIMESTAMP, timestamp.to_bytes(4, "big"))
+        body += _ebml(durations.CLUSTER, cluster + b"\0" * payload)
+    if cues:
+        points = b"".join(b"\xbb\x86\xb3\x84" + t.to_bytes(4, "big") for t in cues)
+        body += _ebml(0x1C53BB6B, points)
+    segment = durations.SEGMENT.to_bytes(4, "big") + b"\x01\xff\xff\xff\xff\xff\xff\xff" + body
+    return _ebml(durations.EBML, b"\x42\x82\x88matroska") + segment
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Count the bytes read through :func:`one_tap.vfs.open_read`."""
+
+    read = [0]
+    open_read = vfs.open_read
+
+    class Counting:
+        def __init__(self, path):
+            self._f = open_read(path)
+
+        def read(self, size=-1):
+            data = self._f.read(size)
+            read[0] += len(data)
+            return data
+
+        def seek(self, *args):
+            return self._f.seek(*args)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self._f.close()
+
+    monkeypatch.setattr(vfs, "open_read", Counting)
+    return read
+
+
+def test_headers_give_durations_from_a_few_kilobytes(tmp_path, counted):
+    (tmp_path / "a.mp4").write_bytes(_mp4(1322.5))
+    (tmp_path / "b.mkv").write_bytes(_mkv(1320.0))
+    (tmp_path / "c.mkv").write_bytes(_mkv(None, clusters=(0, 600_000, 1_200_000), payload=2048))
+    (tmp_path / "e.mkv").write_bytes(_mkv(None, clusters=(0, 900_000), cues=(0, 900_000, 1_250_000)))
+    (tmp_path / "d.avi").write_bytes(b"RIFF")
+
+    assert durations.probe(str(tmp_path / "a.mp4")) == pytest.approx(1322.5)
+    assert counted[0] < 1024
+    assert durations.probe(str(tmp_path / "b.mkv")) == pytest.approx(1320.0)
+    # Without a Duration element the last cluster in the tail is used.
+    counted[0] = 0
+    assert durations.probe(str(tmp_path / "c.mkv")) == pytest.approx(1200.0)
+    assert counted[0] <= durations.HEAD_BYTES + durations.TAIL_BYTES
+    # Large clusters: the cue index at the end still has the last time.
+    assert durations.probe(str(tmp_path / "e.mkv")) == pytest.approx(1250.0)
+    assert durations.probe(str(tmp_path / "d.avi")) is None
+
+
+def test_fit_budget_keeps_order_or_skips_long_episodes():
+    eps = ["e1", "e2", "e3", "e4"]
+    known = {"e1": 1200.0, "e2": 2400.0, "e3": 1200.0, "e4": 0.0}
+    assert selection.fit_budget(eps, known, 3000) == ["e1"]
+    assert selection.fit_budget(eps, known, 3000, contiguous=False) == ["e1", "e3"]
+    # e4 was not probed and counts as a typical (median) episode of the show.
+    assert selection.fit_budget(eps[2:], known, 2400) == ["e3", "e4"]
+    assert selection.fit_budget(eps[2:], known, 2000) == ["e3"]
+    assert selection.fit_budget(eps, {}, 50 * 60) == ["e1", "e2"]
+
+
+def test_time_budget_plays_what_fits_then_returns_home(kodi):
+    folder = "smb://nas/Shows/A"
+    for i in range(1, 4):
+        kodi.vfs.add(f"{folder}/S01E{i:02d}.mkv", data=_mkv(1320.0, payload=16))
+    config.save_config(
+        {
+            "tiles": [{"show_id": "A", "path": folder, "budget": {"minutes": 50}}],
+            "ui": {"tap_debounce_seconds": 0},
+        }
+    )
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "budget_plugin")
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "budget_service")
+    kodi.register_script("plugin.one_tap.play", plugin.main)
+    catalog.rescan(folder)
+    for _ in service.probe_durations():
+        pass
+    assert set(catalog.durations(folder).values()) == {1320.0}
+
+    player = service.AutoAdvancePlayer()
+    kodi.execute_builtin("RunScript(plugin.one_tap.play,show_id=A)")
+    kodi.advance(3 * (1320 + kodi.spawn_delay + kodi.start_delay))
+
+    assert kodi.opened == [f"{folder}/S01E01.mkv", f"{folder}/S01E02.mkv"]
+    assert kodi.builtins[-1] == "ActivateWindow(Home)"
+    del player
@@ -0,0 +1,60 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, db, selection
+from one_tap.episodes import EpisodeList
+
+PATHS = [
+    "smb://nas/Shows/A/S01E01.mkv",
+    "smb://nas/Shows/A/S01E02.mkv",
+    "smb://nas/Shows/B/E1.mkv",
+    "smb://nas/Shows/B/S01E1.mkv",
+    "smb://nas/Shows/B/Ünïcode.mp4",
+]
+
+
+def test_behaves_like_the_list_it_packs():
+    eps = EpisodeList.from_paths(PATHS)
+    assert len(eps) == len(PATHS)
+    assert list(eps) == PATHS
+    assert eps == PATHS
+    assert eps[-1] == PATHS[-1]
+    assert eps[1:4] == PATHS[1:4]
+    assert eps[::-2] == PATHS[::-2]
+    assert eps.index("smb://nas/Shows/B/S01E1.mkv") == 3
+    # A name that only occurs inside another name is not a match.
+    assert "smb://nas/Shows/B/1.mkv" not in eps
+    assert "smb://nas/Shows/A/E1.mkv" not in eps
+    assert PATHS[2] not in eps[3:]
+    with pytest.raises(IndexError):
+        eps[len(PATHS)]
+
+
+def test_views_share_the_packed_names():
+    eps = EpisodeList.from_listing("smb://nas/Shows/A", ["e1.mkv", "e2.mkv", "e3.mkv"])
+    assert list(eps) == [f"smb://nas/Shows/A/e{i}.mkv" for i in (1, 2, 3)]
+    assert eps.rotate(1) == [eps[1], eps[2], eps[0]]
+    assert eps.promote(eps[2]) == [eps[2], eps[0], eps[1]]
+    assert sorted(eps.shuffled()) == list(eps)
+    assert eps.without([0, 2]) == [eps[1]]
+    # An episode left out of the view is brought back in front.
+    assert eps.without([1]).promote(eps[1]) == [eps[1], eps[0], eps[2]]
+    assert eps.rotate(1)._names is eps._names
+
+
+def test_candidates_do_not_copy_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    eps = EpisodeList.from_paths(PATHS)
+    db.update_history("A", PATHS[1])
+    ordered = selection.episode_candidates("A", eps, "order")
+    assert ordered == PATHS[2:] + PATHS[:2]
+    assert ordered._names is eps._names
+    random.seed(1)
+    picks = selection.episode_candidates("A", eps, "random", {"exclude_last_n": 1})
+    assert sorted(picks) == sorted(p for p in PATHS if p != PATHS[1])
@@ -0,0 +1,101 @@
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import catalog, config, invalidation
+from one_tap.episodes import EpisodeList
+
+ADDONS = repo_root / "addons"
+
+# Another add-on process changing shared state.
+WRITER = textwrap.dedent(
+    """
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path({repo!r}) / "addons" / "script.module.one_tap" / "lib"))
+    from one_tap import config, db, invalidation
+    config._resolve = lambda p: Path({state!r}) / Path(p).name
+    config.save_config({{"tiles": [], "mode": {mode!r}}})
+    db.purge_history("A")
+    for _ in range({extra}):
+        invalidation.publish(invalidation.CATALOG, "smb://nas/A")
+    """
+)
+
+
+@pytest.fixture
+def bus(tmp_path, monkeypatch):
+    """A fresh bus with a recorder subscribed to every kind of event."""
+
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    monkeypatch.setattr(invalidation, "_seen", None)
+    monkeypatch.setattr(invalidation, "_stamp", None)
+    monkeypatch.setattr(invalidation, "_attached", False)
+    monkeypatch.setattr(
+        invalidation, "_subscribers", {k: list(v) for k, v in invalidation._subscribers.items()}
+    )
+    events = []
+    for kind in invalidation.KINDS:
+        invalidation.subscribe(kind, lambda key, kind=kind: events.append((kind, key)))
+    return events
+
+
+def _other_process(tmp_path, mode, extra=0):
+    script = WRITER.format(repo=str(repo_root), state=str(tmp_path), mode=mode, extra=extra)
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+
+def test_generation_file_reaches_processes_without_kodi(bus, tmp_path):
+    config.save_config({"tiles": [], "mode": "order"})
+    assert config.load_config()["mode"] == "order"
+    del bus[:]
+    _other_process(tmp_path, "random")
+    assert config.load_config()["mode"] == "random"
+    assert bus == [("config", ""), ("history", "A")]
+    # Nothing changed since: the file is not read again.
+    invalidation.refresh()
+    assert len(bus) == 2
+
+
+def test_missed_events_drop_everything(bus, tmp_path):
+    invalidation.refresh()
+    catalog._memo[(str(catalog._cache_path()), "smb://nas/B")] = (0, EpisodeList.from_paths([]))
+    _other_process(tmp_path, "order", extra=invalidation.KEEP)
+    invalidation.refresh()
+    assert bus == [(kind, "") for kind in invalidation.KINDS]
+    assert not catalog._memo
+
+
+def test_kodi_notifications_are_applied_without_reading_the_file(kodi, bus, monkeypatch):
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "bus_service")
+    monitor = service.ServiceMonitor()
+    invalidation.attach()
+    generation = invalidation.publish(invalidation.HISTORY, "A")
+    assert kodi.notifications[-1][1] == "Other." + invalidation.MESSAGE
+    assert bus == [("history", "A")]
+
+    # Events from other processes arrive as notifications only.
+    monkeypatch.setattr(invalidation, "_read", lambda: pytest.fail("file read"))
+    payload = {"generation": generation + 1, "kind": "catalog", "key": "smb://nas/A"}
+    kodi.notify(invalidation.SENDER, "Other." + invalidation.MESSAGE, json.dumps(payload))
+    assert bus[-1] == ("catalog", "smb://nas/A")
+    del monitor
+
+
+def test_hand_edited_config_is_read_again(bus, tmp_path):
+    invalidation.attach()  # like the service: no polling of the bus
+    try:
+        config.save_config({"tiles": [], "mode": "order"})
+        assert config.load_config()["mode"] == "order"
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps({"tiles": [], "mode": "random", "ui": {}}))
+        assert config.load_config()["mode"] == "random"
+    finally:
+        invalidation.detach()
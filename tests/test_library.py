@@ -0,0 +1,93 @@
+import json
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import catalog, config, library, media_cache, shares
+
+ADDONS = repo_root / "addons"
+PATH = library.PREFIX + "7"
+
+
+def test_library_tile_is_paged_and_refreshed_by_delta(kodi):
+    kodi.library.add_show(7, "smb://nas/Shows/Big", 30000)
+    kodi.library.add_show(8, "smb://nas/Shows/Other", 50)
+    found = catalog.rescan(PATH)
+    assert len(found) == 30000
+    assert found[0] == "smb://nas/Shows/Big/S01E01.mkv"
+    assert found[-1] == "smb://nas/Shows/Big/S300E100.mkv"
+    calls = kodi.library.calls
+    assert len(calls) == 30000 // library.PAGE_SIZE
+    assert all(params["properties"] == library.PROPERTIES for _m, params in calls)
+    assert shares.share_of(PATH) == ""
+
+    del calls[:]
+    kodi.library.add(7, "smb://nas/Shows/Big/S00E01.mkv", 0, 1, "2024-03-01 10:00:00")
+    found = catalog.rescan(PATH)
+    assert len(calls) == 1
+    assert calls[0][1]["filter"]["value"] == "2024-01-01 00:00:00"
+    assert found[0] == "smb://nas/Shows/Big/S00E01.mkv"
+    assert len(found) == 30001
+    assert catalog.episodes(PATH) == found
+
+
+def test_library_notifications_update_the_stored_listing(kodi):
+    ids = kodi.library.add_show(7, "smb://nas/Shows/Big", 3)
+    catalog.rescan(PATH)
+    service = kodi.load_addon(
+        ADDONS / "service.one_tap.random" / "service.py", "library_service"
+    )
+    monitor = service.ServiceMonitor()
+
+    del kodi.library.episodes[ids[0]]
+    kodi.notify("xbmc", "VideoLibrary.OnRemove", json.dumps({"id": ids[0], "type": "episode"}))
+    assert list(catalog.cached(PATH)) == [
+        "smb://nas/Shows/Big/S01E02.mkv",
+        "smb://nas/Shows/Big/S01E03.mkv",
+    ]
+
+    kodi.library.episodes[ids[2]]["file"] = "smb://nas/Shows/Big/S01E03.v2.mkv"
+    update = json.dumps({"item": {"id": ids[2], "type": "episode"}})
+    kodi.notify("xbmc", "VideoLibrary.OnUpdate", update)
+    assert catalog.cached(PATH)[-1] == "smb://nas/Shows/Big/S01E03.v2.mkv"
+
+    # Play count changes leave the stored listing alone.
+    stored = library._state_path(7).stat().st_mtime_ns
+    kodi.notify("xbmc", "VideoLibrary.OnUpdate", update)
+    assert library._state_path(7).stat().st_mtime_ns == stored
+    kodi.notify("xbmc", "VideoLibrary.OnUpdate", json.dumps({"item": {"id": 1, "type": "movie"}}))
+    del monitor
+
+
+def test_playing_library_episode_maps_back_to_its_tile(kodi, monkeypatch):
+    ids = kodi.library.add_show(7, "smb://nas/Shows/Big", 3)
+    for episode in kodi.library.episodes.values():
+        kodi.vfs.add(episode["file"])
+    catalog.rescan(PATH)
+    config.save_config(
+        {"tiles": [{"show_id": "A", "path": "smb://nas/Shows/A"}, {"show_id": "L", "path": PATH}]}
+    )
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "library_show")
+    player = service.AutoAdvancePlayer()
+    played = kodi.library.episodes[ids[1]]["file"]
+    kodi.play(played)
+    kodi.advance(kodi.start_delay)
+    assert player._current_show() == "L"
+
+    monkeypatch.setattr(
+        media_cache, "complete_sources", lambda: ["smb://nas/Shows/A/e1.mkv", played]
+    )
+    assert list(catalog.local_sources(PATH)) == [played]
+    assert catalog.owns("smb://nas/Shows/A", "smb://nas/Shows/A/e1.mkv")
+    assert not catalog.owns("smb://nas/Shows/A", "smb://nas/Shows/AB/e1.mkv")
+
+
+def test_modified_episode_does_not_hide_later_additions(kodi):
+    ids = kodi.library.add_show(7, "smb://nas/Shows/Big", 2)
+    kodi.library.episodes[ids[0]]["lastmodified"] = "2024-06-01 00:00:00"
+    catalog.rescan(PATH)
+
+    kodi.library.add(7, "smb://nas/Shows/Big/S01E03.mkv", 1, 3, "2024-03-01 10:00:00")
+    assert catalog.rescan(PATH)[-1] == "smb://nas/Shows/Big/S01E03.mkv"
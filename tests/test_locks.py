@@ -0,0 +1,71 @@
+import json
+import subprocess
+import sys
+import textwrap
+import threading
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, db, locks
+
+# One tile press: a fresh interpreter running the playback controller.
+TAP = textwrap.dedent(
+    """
+    import sys
+    from pathlib import Path
+    repo_root = Path({repo!r})
+    sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+    sys.path.append(str(repo_root))
+    from one_tap import tracing
+    from tools.fake_kodi import FakeKodi
+    kodi = FakeKodi(Path({profile!r}), spawn_delay=0.0, start_delay=0.0)
+    kodi.vfs.add_show("smb://nas/A", 5)
+    with kodi.installed():
+        plugin = kodi.load_addon(repo_root / "addons" / "plugin.one_tap.play" / "default.py", "tap")
+        sys.argv = ["plugin.one_tap.play", "show_id=A"]
+        plugin.main()
+        tracing.flush()
+    print(len(kodi.opened))
+    """
+)
+
+
+def test_claim_is_granted_once_per_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(locks.claim("tap:A", 10)))
+        for _ in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(results) == [False] * 19 + [True]
+    assert locks.claim("tap:B", 10)
+    assert locks.claim("tap:A", 0)
+
+
+def test_concurrent_taps_start_playback_once(tmp_path, monkeypatch):
+    profile = tmp_path / "profile"
+    cfg_path = profile / "addon_data" / "plugin.one_tap.play" / "config.json"
+    cfg_path.parent.mkdir(parents=True)
+    cfg_path.write_text(
+        json.dumps({"tiles": [{"show_id": "A", "path": "smb://nas/A"}], "mode": "order"})
+    )
+    script = TAP.format(repo=str(repo_root), profile=str(profile))
+    procs = [
+        subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True)
+        for _ in range(20)
+    ]
+    opened = [int(p.communicate(timeout=60)[0].strip().splitlines()[-1]) for p in procs]
+    assert all(p.returncode == 0 for p in procs)
+
+    assert sorted(opened) == [0] * 19 + [1]
+    monkeypatch.setattr(
+        config, "_resolve", lambda p: profile / p.replace("special://profile/", "")
+    )
+    assert db.get_history("A") == ["smb://nas/A/S01E0001.mkv"]
@@ -0,0 +1,71 @@
+import logging
+import sys
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import logging as one_tap_logging
+
+
+@pytest.fixture
+def kodi_log(monkeypatch):
+    lines = []
+    xbmc_stub = types.SimpleNamespace(
+        LOGDEBUG=0,
+        LOGINFO=1,
+        LOGWARNING=2,
+        LOGERROR=3,
+        log=lambda msg, level: lines.append((msg, level, threading.current_thread().name)),
+    )
+    monkeypatch.setattr(one_tap_logging, "xbmc", xbmc_stub)
+    monkeypatch.setattr(one_tap_logging, "_level", one_tap_logging.DEFAULT_LEVEL)
+    yield lines
+    one_tap_logging.stop_writer()
+
+
+def test_formats_arguments_and_fields(kodi_log):
+    logger = one_tap_logging.get_logger("test")
+
+    logger.info("Attempting to play %s", "ep1.mkv", show_id="s1", attempt=2)
+    logger.error("failed")
+
+    assert kodi_log == [
+        ("[test] Attempting to play ep1.mkv show_id=s1 attempt=2", 1, "MainThread"),
+        ("[test] failed", 3, "MainThread"),
+    ]
+
+
+def test_records_below_level_are_never_formatted(kodi_log):
+    formatted = []
+
+    class Expensive:
+        def __str__(self):
+            formatted.append(True)
+            return "expensive"
+
+    one_tap_logging.configure({"log": {"level": "warning"}})
+    logger = one_tap_logging.get_logger("test")
+    logger.debug("value %s", Expensive())
+    logger.info("value %s", Expensive())
+    logger.warning("value %s", Expensive())
+
+    assert formatted == [True]
+    assert [line[1] for line in kodi_log] == [2]
+    assert not logger.isEnabledFor(logging.INFO)
+
+
+def test_background_writer_flushes_on_stop(kodi_log):
+    logger = one_tap_logging.get_logger("test")
+
+    one_tap_logging.start_writer()
+    for i in range(20):
+        logger.info("record %d", i)
+    one_tap_logging.stop_writer()
+
+    assert [line[0] for line in kodi_log] == [f"[test] record {i}" for i in range(20)]
+    assert {line[2] for line in kodi_log} == {"one_tap.log"}
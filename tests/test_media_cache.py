@@ -0,0 +1,120 @@
+import os
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, media_cache
+
+
+def _setup(tmp_path, monkeypatch) -> Path:
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(config, "_resolve", lambda p: cache)
+    media = tmp_path / "media"
+    media.mkdir()
+    return media
+
+
+def _episode(media: Path, name: str, size: int) -> str:
+    path = media / name
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def test_fill_copies_in_chunks_and_serves_local_copy(tmp_path, monkeypatch):
+    media = _setup(tmp_path, monkeypatch)
+    ep = _episode(media, "ep1.mkv", 10_000)
+    reads = []
+    real_open = media_cache.vfs.open_read
+
+    class CountingFile:
+        def __init__(self, path):
+            self._f = real_open(path)
+
+        def read(self, size=-1):
+            reads.append(size)
+            return self._f.read(size)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self._f.close()
+
+    monkeypatch.setattr(media_cache.vfs, "open_read", CountingFile)
+
+    assert media_cache.local_path(ep) is None
+    assert media_cache.fill([ep], max_bytes=1_000_000, chunk_size=1024) == [ep]
+
+    assert max(reads) == 1024
+    local = media_cache.local_path(ep)
+    assert local and Path(local).read_bytes() == Path(ep).read_bytes()
+    # A second pass finds the verified copy and does nothing.
+    assert media_cache.fill([ep], max_bytes=1_000_000) == []
+
+
+def test_fill_evicts_least_recently_played(tmp_path, monkeypatch):
+    media = _setup(tmp_path, monkeypatch)
+    a = _episode(media, "a.mkv", 400)
+    b = _episode(media, "b.mkv", 400)
+    c = _episode(media, "c.mkv", 400)
+    media_cache.fill([a, b], max_bytes=1000)
+    os.utime(media_cache.local_path(a), (0, 0))
+    os.utime(media_cache.local_path(b), (100, 100))
+    media_cache.touch(a)
+
+    assert media_cache.fill([c], max_bytes=1000) == [c]
+
+    assert media_cache.local_path(a)
+    assert media_cache.local_path(b) is None
+    assert media_cache.local_path(c)
+
+
+def test_changed_source_is_recopied(tmp_path, monkeypatch):
+    media = _setup(tmp_path, monkeypatch)
+    ep = _episode(media, "ep.mp4", 500)
+    media_cache.fill([ep], max_bytes=10_000)
+
+    Path(ep).write_bytes(b"new" * 300)
+    os.utime(ep, (12345, 12345))
+
+    assert media_cache.fill([ep], max_bytes=10_000) == [ep]
+    assert Path(media_cache.local_path(ep)).read_bytes() == b"new" * 300
+
+
+def test_aborted_copy_is_never_served_and_resumed_later(tmp_path, monkeypatch):
+    media = _setup(tmp_path, monkeypatch)
+    ep = _episode(media, "ep.mkv", 5000)
+    calls = iter([False, False, False, True, True, True])
+
+    copied = media_cache.fill(
+        [ep], max_bytes=10_000, should_abort=lambda: next(calls), chunk_size=1000
+    )
+
+    assert copied == []
+    assert media_cache.local_path(ep) is None
+    parts = list((tmp_path / "cache").glob("*.part"))
+    assert [p.stat().st_size for p in parts] == [2000]
+
+    throttled = []
+    monkeypatch.setattr(media_cache.time, "sleep", throttled.append)
+    steps = media_cache.fill_steps(
+        [ep], max_bytes=10_000, should_throttle=lambda: True, chunk_size=1000
+    )
+    assert list(steps) == [ep]
+    assert Path(media_cache.local_path(ep)).read_bytes() == Path(ep).read_bytes()
+    # Only the missing chunks were copied, slowed down while "playing".
+    assert throttled == [media_cache.THROTTLE_DELAY] * 3
+    assert not list((tmp_path / "cache").glob("*.part"))
+
+
+def test_corrupt_index_is_treated_as_empty(tmp_path, monkeypatch):
+    media = _setup(tmp_path, monkeypatch)
+    ep = _episode(media, "ep.mkv", 500)
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / media_cache.INDEX_NAME).write_text('{"trunc')
+
+    assert media_cache.local_path(ep) is None
+    assert media_cache.fill([ep], max_bytes=10_000) == [ep]
+    assert media_cache.local_path(ep)
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, playback
+
+
+def test_transitions_are_idempotent_per_item(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+
+    playback.opening("ep1")
+    assert playback.transition(playback.STARTED, "ep1")
+    assert not playback.transition(playback.STARTED, "ep1")
+    assert playback.transition(playback.ENDED, "ep1")
+    # The second player reporting the same end is ignored.
+    assert not playback.transition(playback.ENDED, "ep1")
+    assert not playback.transition(playback.ERROR, None)
+
+    playback.opening("ep2")
+    # A stale end for the previous file does not advance again.
+    assert not playback.transition(playback.ENDED, "ep1")
+    # The second player's late error for the previous file is ignored ...
+    assert not playback.transition(playback.ERROR, "ep1")
+    # ... while failing to open reports an error without a start.
+    assert playback.transition(playback.ERROR, None)
+    assert playback.current() == playback.State(playback.ERROR, "ep2")
+
+    # Replaying the same file is a new playback.
+    assert playback.transition(playback.STARTED, "ep2")
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, profiling
+
+
+def _busy_main():
+    return sum(len(str(i)) for i in range(10_000))
+
+
+def test_run_stores_capture_and_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path)
+
+    assert profiling.run(_busy_main, trace_memory=True) == _busy_main()
+
+    [stamp] = profiling.list_captures()
+    assert (tmp_path / f"{stamp}.pstats").exists()
+    assert (tmp_path / f"{stamp}.alloc.txt").exists()
+    report = profiling.summary(stamp)
+    assert "_busy_main" in report
+    assert "Top allocations" in report
+
+
+def test_captures_are_rotated(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path)
+    for i in range(5):
+        (tmp_path / f"20240101-00000{i}-1.pstats").write_bytes(b"")
+        (tmp_path / f"20240101-00000{i}-1.alloc.txt").write_text("")
+
+    profiling.run(_busy_main, keep=3)
+
+    captures = profiling.list_captures()
+    assert len(captures) == 3
+    assert captures[1:] == ["20240101-000004-1", "20240101-000003-1"]
+    assert not (tmp_path / "20240101-000002-1.alloc.txt").exists()
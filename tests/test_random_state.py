@@ -0,0 +1,85 @@
+import json
+import sys
+import threading
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, random_state
+
+
+def _patch(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    monkeypatch.setattr(random_state, "_migrated", False)
+
+
+def test_queues_are_kept_per_show(tmp_path, monkeypatch):
+    _patch(tmp_path, monkeypatch)
+    random_state.set("smb://nas/A", ["a1", "a2"])
+    random_state.set("B", ["b1"])
+    assert random_state.pop_first("smb://nas/A") == "a1"
+    random_state.consume_first("B")
+    assert random_state.get("smb://nas/A") == ["a2"]
+    assert random_state.get("B") == []
+    assert random_state.load() == {"smb://nas/A": ["a2"]}
+    assert random_state.pop_first("B") is None
+    # A queue refilled since the head was read is left alone.
+    random_state.set("B", ["b2", "b3"])
+    random_state.consume_first("B", "b1")
+    assert random_state.pop_first("B", "b2") == "b2"
+    assert random_state.get("B") == ["b3"]
+
+
+def test_pop_compacts_consumed_entries(tmp_path, monkeypatch):
+    _patch(tmp_path, monkeypatch)
+    monkeypatch.setattr(random_state, "COMPACT_BYTES", 64)
+    items = [f"smb://nas/A/episode{i:03d}.mkv" for i in range(20)]
+    random_state.set("A", items)
+    path = random_state._queue("A")
+    full = path.stat().st_size
+    for item in items[:10]:
+        assert random_state.pop_first("A") == item
+    assert path.stat().st_size < full
+    assert random_state.get("A") == items[10:]
+
+
+def test_concurrent_pops_return_each_entry_once(tmp_path, monkeypatch):
+    _patch(tmp_path, monkeypatch)
+    items = [f"e{i}" for i in range(200)]
+    random_state.set("A", items)
+    popped = []
+
+    def worker():
+        while True:
+            item = random_state.pop_first("A")
+            if item is None:
+                return
+            popped.append(item)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(popped) == sorted(items)
+    assert random_state.get("A") == []
+
+
+def test_legacy_file_is_migrated(tmp_path, monkeypatch):
+    _patch(tmp_path, monkeypatch)
+    legacy = tmp_path / "preselected.json"
+    legacy.write_text(json.dumps({"A": ["a1", "a2"], "B": ["b1"]}))
+    assert random_state.get("A") == ["a1", "a2"]
+    assert random_state.get("B") == ["b1"]
+    assert not legacy.exists()
+
+
+def test_corrupt_legacy_file_is_discarded(tmp_path, monkeypatch):
+    _patch(tmp_path, monkeypatch)
+    legacy = tmp_path / "preselected.json"
+    legacy.write_text('{"A": ["a1"')
+    assert random_state.get("A") == []
+    assert not legacy.exists()
+    random_state.set("A", ["a2"])
+    assert random_state.get("A") == ["a2"]
@@ -0,0 +1,81 @@
+import struct
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import readahead, vfs
+
+
+def _atom(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", len(payload) + 8, kind) + payload
+
+
+def _write_mp4(path: Path, mdat_size: int) -> int:
+    """Write a fake MP4 with a trailing ``moov`` and return its offset."""
+
+    head = _atom(b"ftyp", b"isom" * 4) + _atom(b"mdat", b"\0" * mdat_size)
+    path.write_bytes(head + _atom(b"moov", b"m" * 1000))
+    return len(head)
+
+
+def _record_reads(monkeypatch) -> list:
+    reads: list = []
+    real_open = vfs.open_read
+
+    class Recorder:
+        def __init__(self, f):
+            self._f = f
+
+        def seek(self, offset, whence=0):
+            return self._f.seek(offset, whence)
+
+        def read(self, size=-1):
+            data = self._f.read(size)
+            reads.append((self._f.tell() - len(data), len(data)))
+            return data
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self._f.close()
+
+    monkeypatch.setattr(vfs, "open_read", lambda p: Recorder(real_open(p)))
+    return reads
+
+
+def test_find_trailing_moov(tmp_path):
+    path = tmp_path / "ep.mp4"
+    moov = _write_mp4(path, 50_000)
+    with path.open("rb") as f:
+        assert readahead.find_atom(f, path.stat().st_size, b"moov") == (moov, 1008)
+
+
+def test_prefetch_reads_head_and_moov(tmp_path, monkeypatch):
+    path = tmp_path / "ep.mp4"
+    moov = _write_mp4(path, 200_000)
+    reads = _record_reads(monkeypatch)
+
+    assert readahead.prefetch(str(path), head_bytes=4096, chunk_size=1024, delay=0)
+
+    data_reads = [r for r in reads if r[1] > 8]
+    assert sum(n for off, n in data_reads if off < 4096) == 4096
+    assert (moov, 1008) in data_reads
+    # Nothing from the middle of ``mdat`` is read.
+    assert not [r for r in data_reads if 4096 <= r[0] < moov]
+
+
+def test_prefetch_stops_when_playback_starts(tmp_path, monkeypatch):
+    path = tmp_path / "ep.mkv"
+    path.write_bytes(b"\0" * 100_000)
+    reads = _record_reads(monkeypatch)
+    calls = iter([False, False, True])
+
+    done = readahead.prefetch(
+        str(path), lambda: next(calls), head_bytes=50_000, chunk_size=1000, delay=0
+    )
+
+    assert done is False
+    assert len(reads) == 2
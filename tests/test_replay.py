@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+sys.path.append(str(repo_root))
+
+from one_tap import config, eventtrace
+from tools import replay_events
+
+CFG = {
+    "tiles": [
+        {"show_id": "A", "path": "smb://nas/A"},
+        {"show_id": "B", "path": "smb://nas/B"},
+    ],
+    "mode": "order",
+}
+
+
+def _write_trace(path: Path, lines) -> None:
+    path.write_text("".join("\t".join(map(str, line)) + "\n" for line in lines))
+
+
+def test_replay_odd_event_sequence(tmp_path):
+    trace = tmp_path / "events.tsv"
+    _write_trace(
+        trace,
+        [
+            (0.0, "plugin", "tap", "A"),
+            (1.0, "service", "started", "smb://nas/A/ep1.mkv"),
+            (1.0, "plugin", "started", "smb://nas/A/ep1.mkv"),
+            (1000.0, "service", "ended", "smb://nas/A/ep1.mkv"),
+            (1002.0, "service", "started", "smb://nas/B/ep1.mkv"),
+            (1005.0, "service", "error", "smb://nas/B/ep1.mkv"),
+            (1005.5, "service", "ended", "smb://nas/B/ep1.mkv"),
+        ],
+    )
+
+    report = replay_events.replay(eventtrace.load(trace), CFG, tmp_path / "profile")
+
+    # The duplicate start seen by the plugin's player is ignored.
+    assert report["player_events"] == 5
+    # One decision for the tap, the end of A and the error of B; the late
+    # end reported for the failed episode does not advance a second time.
+    assert report["decisions"] == 3
+    assert report["opens"] == 3
+    # Three history appends plus the revert for the failed episode.
+    assert report["db_writes"] == 4
+    assert report["decisions_per_second"] > 0
+
+
+def test_recorded_simulation_replays(kodi, tmp_path):
+    kodi.vfs.add_show("smb://nas/A", 5)
+    kodi.vfs.add_show("smb://nas/B", 5)
+    config.save_config(dict(CFG, diagnostics={"record_events": True}))
+    plugin = kodi.load_addon(repo_root / "addons" / "plugin.one_tap.play" / "default.py", "rec_plugin")
+    service = kodi.load_addon(repo_root / "addons" / "service.one_tap.random" / "service.py", "rec_service")
+    kodi.register_script("plugin.one_tap.play", plugin.main)
+    kodi.abort_at = 6 * 3600
+    kodi.execute_builtin("RunScript(plugin.one_tap.play,show_id=A)")
+    service.run()
+
+    events = eventtrace.load(config._resolve(eventtrace.EVENTS_PATH))
+    assert [e.event for e in events[:3]] == ["tap", "started", "ended"]
+    eventtrace.configure({})
+
+    report = replay_events.replay(events, CFG, tmp_path / "replay")
+
+    ended = sum(1 for e in events if e.event == "ended")
+    assert report["decisions"] == ended + 1
+    assert report["opens"] == report["decisions"]
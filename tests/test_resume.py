@@ -0,0 +1,88 @@
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, db, resume
+
+ADDONS = repo_root / "addons"
+
+
+def test_samples_are_coalesced_per_show(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    writes = []
+    real_save = db.save_resume_points
+    monkeypatch.setattr(
+        db,
+        "save_resume_points",
+        lambda points, cleared=(): writes.append((list(points), list(cleared)))
+        or real_save(points, cleared),
+    )
+    now = [0.0]
+    tracker = resume.ResumeTracker(flush_seconds=60, clock=lambda: now[0])
+
+    for second in range(40, 400, 10):
+        now[0] = second
+        tracker.sample("A", "a1", second, 1320)
+        tracker.sample("B", "b1", second, 1320)
+        tracker.flush()
+
+    # One batched write per interval covering both shows.
+    assert len(writes) == 6
+    assert all(len(points) == 2 for points, _ in writes)
+    assert db.get_resume("A") == ("a1", 340)
+
+    tracker.sample("A", "a1", 395, 1320)
+    tracker.finished("B")
+    tracker.flush(force=True)
+    assert db.get_resume("A") == ("a1", 395)
+    assert db.get_resume("B") is None
+
+
+def test_retap_resumes_stopped_episode(kodi):
+    episodes = kodi.vfs.add_show("smb://nas/A", 3)
+    config.save_config(
+        {
+            "tiles": [{"show_id": "A", "path": "smb://nas/A"}],
+            "mode": "order",
+            "ui": {"tap_debounce_seconds": 0},
+        }
+    )
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "resume_plugin")
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "resume_service")
+    kodi.register_script("plugin.one_tap.play", plugin.main)
+    tap = "RunScript(plugin.one_tap.play,show_id=A)"
+    kodi.execute_builtin(tap)
+    kodi.schedule(600, kodi.stop)
+    kodi.schedule(650, lambda: kodi.execute_builtin(tap))
+    kodi.abort_at = 700
+    service.run()
+
+    assert kodi.opened == [episodes[0], episodes[0]]
+    assert kodi.playing == episodes[0]
+    # Resumed at the last sample before the stop rather than from zero.
+    assert 580 <= kodi.position() - (700 - 651.5) <= 600
+    assert db.get_history("A") == [episodes[0]]
+
+
+def test_random_tap_resumes_episode_excluded_as_recent(kodi):
+    episodes = kodi.vfs.add_show("smb://nas/A", 4)
+    config.save_config(
+        {
+            "tiles": [{"show_id": "A", "path": "smb://nas/A"}],
+            "mode": "random",
+            "random": {"exclude_last_n": 2},
+            "ui": {"tap_debounce_seconds": 0},
+        }
+    )
+    db.update_history("A", episodes[1])
+    db.save_resume_points([("A", episodes[1], 300.0, 1320.0)])
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "random_resume_plugin")
+    kodi.register_script("plugin.one_tap.play", plugin.main)
+    kodi.execute_builtin("RunScript(plugin.one_tap.play,show_id=A)")
+    kodi.advance(5)
+
+    # The latest play is excluded from random picks but still resumed.
+    assert kodi.opened == [episodes[1]]
+    assert kodi.position() >= 300
@@ -0,0 +1,112 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import catalog, config, random_state, schedule
+from one_tap.config import CONFIG_PATH
+
+ADDONS = repo_root / "addons"
+RULES = [
+    {"from": "06:00", "to": "12:00", "tiles": ["A"]},
+    {"from": "19:00", "to": "06:00", "tiles": ["B"]},
+    {"from": "11:00", "to": "13:00", "tiles": ["C"]},
+]
+
+
+def _today(hour, minute):
+    return time.mktime(time.localtime()[:3] + (hour, minute, 0, 0, 0, -1))
+
+
+def test_rules_compile_into_interval_table():
+    table = schedule.compile_rules(RULES)
+    # The earlier rule wins where windows overlap; B wraps past midnight.
+    assert table["starts"] == [0, 360, 720, 780, 1140]
+    assert table["tiles"] == [["B"], ["A"], ["C"], None, ["B"]]
+    assert schedule.block_at(table, _today(11, 30))[1:] == (["A"], 30 * 60)
+    assert schedule.block_at(table, _today(12, 30))[1] == ["C"]
+    assert schedule.block_at(table, _today(23, 0))[1] == ["B"]
+    # The evening block continues after midnight until 06:00.
+    assert schedule.upcoming(table, _today(18, 0)) == (3600, ["B"])
+    assert schedule.upcoming(table, _today(20, 0)) == (10 * 3600, ["A"])
+    assert schedule.upcoming(schedule.compile_rules([]), _today(9, 0)) is None
+
+    with pytest.raises(ValueError):
+        schedule.compile_rules([{"from": "25:00", "to": "06:00", "tiles": ["A"]}])
+    with pytest.raises(ValueError):
+        schedule.compile_rules([{"from": "06:00", "to": "07:00", "tiles": "A"}])
+
+
+def _config(**extra):
+    return {
+        "tiles": [
+            {"show_id": "A", "label": "A", "path": "smb://nas/A"},
+            {"show_id": "B", "label": "B", "path": "smb://nas/B"},
+            {"show_id": "C", "label": "C", "path": "smb://nas/C"},
+        ],
+        "schedule": RULES,
+        **extra,
+    }
+
+
+def test_skin_switches_tiles_at_block_boundaries(kodi, monkeypatch):
+    config.save_config(_config())
+    assert config.load_config()["schedule_table"] == schedule.compile_rules(RULES)
+    skin = kodi.load_addon(repo_root / "skin.tile_only" / "service.py", "schedule_skin")
+    published = []
+    main = skin.main
+    monkeypatch.setattr(skin, "main", lambda now: published.append(now) or main(now))
+    base = _today(11, 50)
+    window = kodi.windows.setdefault(10000, {})
+    seen = []
+    kodi.schedule(5 * 60, lambda: seen.append(window["tile.1.show_id"]))
+    kodi.abort_at = 2 * 3600
+    skin.run(clock=lambda: base + kodi.clock.now)
+
+    # Published at start, at 12:00 and at 13:00 only.
+    assert [round(p - base) for p in published] == [0, 600, 4200]
+    assert seen == ["A"]
+    assert window["tile.count"] == "3"
+    assert [window[f"tile.{i}.show_id"] for i in (1, 2, 3)] == ["A", "B", "C"]
+
+
+def test_next_blocks_tiles_are_prewarmed(kodi):
+    for show in "ABC":
+        kodi.vfs.add_show(f"smb://nas/{show}", 3)
+    config.save_config(_config(mode="random"))
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "schedule_service")
+
+    list(service.prewarm_schedule(_today(18, 0)))
+    assert catalog.cached("smb://nas/B") is None
+
+    list(service.prewarm_schedule(_today(18, 50)))
+    assert len(catalog.cached("smb://nas/B")) == 3
+    assert len(random_state.get("B")) == 3
+    assert catalog.cached("smb://nas/A") is None
+
+
+def test_hand_edited_rules_are_used_and_bad_ones_show_all_tiles(kodi):
+    config.save_config(_config())
+    skin = kodi.load_addon(repo_root / "skin.tile_only" / "service.py", "schedule_skin_edit")
+    path = config._resolve(CONFIG_PATH)
+    window = kodi.windows.setdefault(10000, {})
+
+    def edit(rules):
+        data = json.loads(path.read_text())
+        data["schedule"] = rules
+        path.write_text(json.dumps(data))
+        config.forget()
+
+    # The stored table no longer matches the edited rules.
+    edit([{"from": "06:00", "to": "12:00", "tiles": ["C"]}])
+    skin.main(_today(9, 0))
+    assert window["tile.1.show_id"] == "C" and window["tile.count"] == "1"
+
+    edit([{"from": "6 am", "to": "12:00", "tiles": ["C"]}])
+    assert skin.main(_today(9, 0)) is not None
+    assert window["tile.count"] == "3"
@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, random_state, scheduler
+
+ADDONS = repo_root / "addons"
+
+
+def test_jobs_are_sliced_prioritised_and_persisted(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    now = [1000.0]
+    ticks = [0.0]
+    playing = [False]
+    done = []
+
+    def job(name, steps):
+        def run():
+            for i in range(steps):
+                ticks[0] += 1
+                done.append(f"{name}{i}")
+                yield
+
+        return run
+
+    jobs = [
+        scheduler.Job("low", 3600, 5, job("low", 2)),
+        scheduler.Job("high", 60, 0, job("high", 3)),
+    ]
+    sched = scheduler.Scheduler(
+        jobs, lambda: playing[0], slice_seconds=2, clock=lambda: now[0], timer=lambda: ticks[0]
+    )
+
+    # Two steps fit in a slice; the high priority job goes first.
+    assert sched.run() == "high"
+    assert done == ["high0", "high1"]
+    playing[0] = True
+    assert sched.run() == "high"
+    playing[0] = False
+    assert sched.run() == "low"
+    assert done == ["high0", "high1", "high2", "low0"]
+    assert sched.run() is None
+    assert done[-1] == "low1"
+
+    # Nothing is due until an interval elapses, even after a restart.
+    restarted = scheduler.Scheduler(jobs, lambda: False, clock=lambda: now[0] + 120)
+    assert [j.name for j in restarted.due()] == ["high"]
+    assert scheduler.load_state() == {"high": 1000.0, "low": 1000.0}
+
+
+def test_preselected_random_pick_is_played(kodi):
+    episodes = kodi.vfs.add_show("smb://nas/A", 10)
+    config.save_config(
+        {"tiles": [{"show_id": "A", "path": "smb://nas/A"}], "mode": "random"}
+    )
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "job_service")
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "job_plugin")
+    kodi.register_script("plugin.one_tap.play", plugin.main)
+    for name in ("catalog_rescan", "preselect"):
+        job = next(j for j in service.maintenance_jobs(lambda: False) if j.name == name)
+        list(job.run())
+
+    queued = random_state.get("A")
+    assert len(queued) == service.PRESELECT_COUNT
+    assert set(queued) <= set(episodes)
+
+    kodi.execute_builtin("RunScript(plugin.one_tap.play,show_id=A)")
+    kodi.advance(1)
+    assert kodi.opened == [queued[0]]
+    assert random_state.get("A") == queued[1:]
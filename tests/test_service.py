@@ -1,98 +1,82 @@
 import sys
-import types
 from pathlib import Path
 
 repo_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
 
+from one_tap import config, db
 
-def test_auto_advance_error(monkeypatch, tmp_path):
-    commands = []
+ADDONS = repo_root / "addons"
 
-    class DummyPlayer:
-        def __init__(self, *args, **kwargs):
-            pass
 
-        def getPlayingFile(self):
-            return str(tmp_path / "show" / "ep1.mkv")
+def _service(kodi, name):
+    return kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", name)
 
-    class DummyMonitor:
-        def abortRequested(self):
-            return True
 
-        def waitForAbort(self, t):
-            return True
-
-    xbmc_stub = types.SimpleNamespace(
-        Player=DummyPlayer,
-        Monitor=DummyMonitor,
-        executebuiltin=lambda cmd: commands.append(cmd),
-        log=lambda msg, level: None,
-    )
-
-    monkeypatch.setitem(sys.modules, "xbmc", xbmc_stub)
-    sys.path.append(str(repo_root / "addons" / "service.one_tap.random"))
-    import importlib
-
-    service = importlib.import_module("service")
-    importlib.reload(service)
-    monkeypatch.setattr(
-        service.config,
-        "load_config",
-        lambda: {"tiles": [{"show_id": "show", "path": str(tmp_path / "show")}]},
-    )
-    monkeypatch.setattr(
-        service.db, "remove_last_history", lambda s: commands.append(f"remove:{s}")
-    )
+def test_auto_advance_error(kodi, monkeypatch):
+    episodes = kodi.vfs.add_show("smb://nas/show", 2)
+    config.save_config({"tiles": [{"show_id": "show", "path": "smb://nas/show"}]})
+    service = _service(kodi, "error_service")
+    monkeypatch.setattr(service.tracing, "new_tap_id", lambda: "tap1")
 
     player = service.AutoAdvancePlayer()
-    player.onPlayBackError()
-
-    assert commands == [
-        "remove:show",
-        'RunPlugin("plugin://plugin.one_tap.play?show_id=show")',
+    db.update_history("show", episodes[0])
+    kodi.play(episodes[0])
+    kodi.advance(kodi.start_delay)
+    kodi.inject("error", episodes[0])
+
+    # The play recorded on open is undone and the next tap requested.
+    assert db.get_history("show") == []
+    assert kodi.builtins == [
+        'RunPlugin("plugin://plugin.one_tap.play?show_id=show&tap_id=tap1")',
     ]
+    del player
 
 
-def test_weighted_selection(monkeypatch, tmp_path):
-    commands = []
-
-    class DummyPlayer:
-        def __init__(self, *args, **kwargs):
-            pass
-
-        def getPlayingFile(self):
-            return str(tmp_path / "A" / "ep1.mkv")
-
-    xbmc_stub = types.SimpleNamespace(
-        Player=DummyPlayer,
-        Monitor=lambda: None,
-        executebuiltin=lambda cmd: commands.append(cmd),
-        log=lambda msg, level: None,
-    )
-
-    monkeypatch.setitem(sys.modules, "xbmc", xbmc_stub)
-    sys.path.append(str(repo_root / "addons" / "service.one_tap.random"))
-    import importlib
-
-    service = importlib.import_module("service")
-    importlib.reload(service)
-    monkeypatch.setattr(
-        service.config,
-        "load_config",
-        lambda: {
+def test_weighted_selection(kodi, monkeypatch):
+    for show in "AB":
+        kodi.vfs.add_show(f"smb://nas/{show}", 2)
+    config.save_config(
+        {
             "tiles": [
-                {"show_id": "A", "path": str(tmp_path / "A"), "weight": 1},
-                {"show_id": "B", "path": str(tmp_path / "B"), "weight": 3},
+                {"show_id": "A", "path": "smb://nas/A", "weight": 1},
+                {"show_id": "B", "path": "smb://nas/B", "weight": 3},
             ],
             "random": {"use_comfort_weights": True},
-        },
+        }
     )
+    service = _service(kodi, "weighted_service")
     monkeypatch.setattr(service.random, "choices", lambda ids, weights, k: [ids[0]])
+    monkeypatch.setattr(service.tracing, "new_tap_id", lambda: "tap1")
 
     player = service.AutoAdvancePlayer()
+    kodi.play("smb://nas/A/S01E0001.mkv")
+    kodi.advance(kodi.start_delay)
     player._play_next()
 
-    assert commands == [
-        'RunPlugin("plugin://plugin.one_tap.play?show_id=B")',
+    # The show playing is left out of the weighted draw.
+    assert kodi.builtins == [
+        'RunPlugin("plugin://plugin.one_tap.play?show_id=B&tap_id=tap1")',
     ]
+    del player
+
+
+def test_warm_next_episodes_prefetches_prediction(kodi, monkeypatch):
+    episodes = kodi.vfs.add_show("smb://nas/show", 2)
+    kodi.vfs.add("smb://nas/show/notes.txt")
+    db.update_history("show", episodes[0])
+    service = _service(kodi, "warm_service")
+    fetched = []
+    monkeypatch.setattr(
+        service.readahead,
+        "prefetch",
+        lambda path, should_pause, head_bytes: fetched.append(path) or True,
+    )
+
+    cfg = {"tiles": [{"show_id": "show", "path": "smb://nas/show"}]}
+    warmed: dict = {}
+    service.warm_next_episodes(cfg, lambda: False, warmed)
+    service.warm_next_episodes(cfg, lambda: False, warmed)
+
+    assert fetched == [episodes[1]]
+    assert warmed == {"show": episodes[1]}
@@ -0,0 +1,167 @@
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import catalog, config, db, media_cache, shares
+
+ADDONS = repo_root / "addons"
+
+
+@pytest.fixture
+def share_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    now = [1000.0]
+    clock = types.SimpleNamespace(time=lambda: now[0])
+    monkeypatch.setattr(shares, "time", clock)
+    monkeypatch.setattr(shares.locks, "time", clock)
+    monkeypatch.setattr(shares, "NEGATIVE_TTL", 0.0)
+    shares.configure({"shares": {"failure_threshold": 2, "cooldown_seconds": 30}})
+    calls = []
+    down = [True]
+
+    def listdir(path):
+        calls.append(path)
+        if down[0]:
+            raise OSError("Host is down")
+        return [], ["e1.mkv"]
+
+    monkeypatch.setattr(shares.vfs, "listdir", listdir)
+    yield now, calls, down
+    shares.configure({})
+
+
+def test_breaker_opens_probes_once_and_closes(share_env):
+    now, calls, down = share_env
+    for _ in range(2):
+        with pytest.raises(OSError):
+            shares.listdir("smb://nas/A")
+    assert shares.state("smb://nas/B/e1.mkv") == shares.OPEN
+    # Open: fails without touching the share.
+    with pytest.raises(shares.ShareUnavailable):
+        shares.listdir("smb://nas/A")
+    assert len(calls) == 2
+    # Half open: a failed probe doubles the cooldown.
+    now[0] += 31
+    with pytest.raises(OSError):
+        shares.listdir("smb://nas/A")
+    now[0] += 31
+    assert shares.state("smb://nas/A") == shares.OPEN
+    now[0] += 30
+    down[0] = False
+    assert shares.available("smb://nas/A")
+    assert not shares.available("smb://nas/A")
+    assert shares.state("/storage/cache/e1.mkv") == shares.CLOSED
+    shares.record_success("smb://nas/A/e1.mkv")
+    assert shares.listdir("smb://nas/A") == ([], ["e1.mkv"])
+    assert shares.state("smb://nas/A") == shares.CLOSED
+
+
+def test_slow_listing_times_out_and_is_not_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    release = threading.Event()
+    calls = []
+
+    def listdir(path):
+        calls.append(path)
+        release.wait(5)
+        return [], []
+
+    monkeypatch.setattr(shares.vfs, "listdir", listdir)
+    started = time.monotonic()
+    with pytest.raises(shares.ShareUnavailable):
+        shares.listdir("smb://nas/A", timeout=0.05)
+    with pytest.raises(shares.ShareUnavailable):
+        shares.listdir("smb://nas/A", timeout=0.05)
+    release.set()
+    assert time.monotonic() - started < 1
+    assert calls == ["smb://nas/A"]
+
+
+def test_catalog_falls_back_to_stored_and_local_episodes(share_env, monkeypatch):
+    _now, _calls, down = share_env
+    down[0] = False
+    assert list(catalog.rescan("smb://nas/A")) == ["smb://nas/A/e1.mkv"]
+    down[0] = True
+    assert list(catalog.episodes("smb://nas/A")) == ["smb://nas/A/e1.mkv"]
+    monkeypatch.setattr(
+        media_cache, "sources_under", lambda folder: [folder + "/e2.mkv"]
+    )
+    assert list(catalog.episodes("smb://nas/B")) == ["smb://nas/B/e2.mkv"]
+
+
+def test_tap_on_dead_share_returns_at_once(kodi, monkeypatch):
+    monkeypatch.setattr(shares, "NEGATIVE_TTL", 0.0)
+    kodi.vfs.add_show("smb://nas/A", 3)
+    kodi.vfs.offline.add("smb://nas/")
+    config.save_config(
+        {
+            "tiles": [{"show_id": "A", "path": "smb://nas/A"}],
+            "ui": {"tap_debounce_seconds": 0},
+        }
+    )
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "share_plugin")
+    for _ in range(shares.DEFAULT_FAILURE_THRESHOLD):
+        sys.argv = ["plugin.one_tap.play", "show_id=A"]
+        plugin.main()
+        kodi.advance(30)
+    calls = kodi.vfs.calls
+    sys.argv = ["plugin.one_tap.play", "show_id=A"]
+    plugin.main()
+    assert kodi.vfs.calls == calls
+    assert kodi.opened == []
+    props = kodi.windows[10000]
+    assert props["one_tap.share_state.a"] == shares.OPEN
+    assert props["one_tap.share_state"] == shares.OPEN
+
+
+def test_tap_on_dead_share_plays_cached_copy(kodi, monkeypatch):
+    monkeypatch.setattr(shares, "NEGATIVE_TTL", 0.0)
+    episodes = kodi.vfs.add_show("smb://nas/A", 3)
+    config.save_config(
+        {
+            "tiles": [{"show_id": "A", "path": "smb://nas/A"}],
+            "ui": {"tap_debounce_seconds": 0},
+        }
+    )
+    assert media_cache.fill(episodes[1:2], max_bytes=10_000_000) == episodes[1:2]
+    kodi.vfs.offline.add("smb://nas/")
+    for _ in range(shares.DEFAULT_FAILURE_THRESHOLD):
+        shares.record_failure("smb://nas/A", "Host is down")
+    assert not shares.available("smb://nas/A")
+
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "cached_plugin")
+    sys.argv = ["plugin.one_tap.play", "show_id=A"]
+    plugin.main()
+    # The folder tile falls back to the episode copied before the share died.
+    assert kodi.opened == [media_cache.local_path(episodes[1])]
+
+
+def test_files_failing_to_open_do_not_open_the_breaker(kodi):
+    kodi.vfs.add_show("smb://nas/A", 3)
+    config.save_config(
+        {
+            "tiles": [{"show_id": "A", "path": "smb://nas/A"}],
+            "ui": {"tap_debounce_seconds": 0},
+        }
+    )
+
+    def unsupported(params):
+        kodi.opened.append(params["item"]["file"])
+        raise ValueError("unsupported file")
+
+    kodi.jsonrpc_handlers["Player.Open"] = unsupported
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "broken_plugin")
+    sys.argv = ["plugin.one_tap.play", "show_id=A"]
+    plugin.main()
+
+    # Each file counts as a failed episode; the share stays available.
+    assert len(kodi.opened) == 3
+    assert shares.state("smb://nas/A") == shares.CLOSED
+    assert [s.failures for s in db.show_stats()] == [3]
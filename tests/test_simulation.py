@@ -0,0 +1,82 @@
+import sys
+import time
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, db, tracing
+
+ADDONS = repo_root / "addons"
+
+
+def _setup(kodi, episodes_per_show=30):
+    shows = {}
+    for show_id in ["A", "B"]:
+        folder = f"smb://nas/Shows/{show_id}"
+        shows[show_id] = kodi.vfs.add_show(folder, episodes_per_show)
+    config.save_config(
+        {
+            "tiles": [
+                {"show_id": s, "label": f"Show {s}", "path": f"smb://nas/Shows/{s}"}
+                for s in shows
+            ],
+            "mode": "order",
+            "history": {"max": 1000},
+        }
+    )
+    plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "sim_plugin")
+    service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "sim_service")
+    skin = kodi.load_addon(repo_root / "skin.tile_only" / "service.py", "sim_skin")
+    kodi.register_script("plugin.one_tap.play", plugin.main)
+    return shows, plugin, service, skin
+
+
+def test_tile_press_starts_next_episode(kodi, monkeypatch):
+    monkeypatch.setattr(tracing, "_pending", [])
+    shows, _plugin, service, skin = _setup(kodi)
+    skin.main()
+    assert kodi.windows[10000]["tile.1.show_id"] == "A"
+
+    service.AutoAdvancePlayer()
+    kodi.execute_builtin("RunScript(plugin.one_tap.play,show_id=A,tap_id=tap42)")
+    kodi.advance(5)
+
+    assert kodi.playing == shows["A"][0]
+    assert db.get_history("A") == [shows["A"][0]]
+    stages = {s.stage for s in tracing.read_spans() if s.tap_id == "tap42"}
+    assert {"config_load", "episode_listing", "play_file", "playback_started"} <= stages
+
+
+def test_hundreds_of_viewing_hours_auto_advance(kodi):
+    shows, _plugin, service, _skin = _setup(kodi)
+    hours = 200
+    kodi.abort_at = hours * 3600
+    kodi.execute_builtin("RunScript(plugin.one_tap.play,show_id=A)")
+
+    wall = time.perf_counter()
+    service.run()
+    wall = time.perf_counter() - wall
+
+    plays = len(db.get_history("A")) + len(db.get_history("B"))
+    per_episode = 1320 + kodi.spawn_delay + kodi.start_delay
+    assert plays >= int(hours * 3600 / per_episode) - 1
+    # Ordered mode wraps around each show's episodes without skipping.
+    history = db.get_history("A")
+    expected = [shows["A"][i % len(shows["A"])] for i in range(len(history))]
+    assert history == expected
+    assert wall < 30
+
+
+def test_players_share_one_advance_per_event(kodi):
+    shows, plugin, service, _skin = _setup(kodi, episodes_per_show=5)
+    service.AutoAdvancePlayer()
+    plugin.AutoAdvancePlayer("A", shows["A"], config.load_config())
+    episodes = 4
+    kodi.advance(episodes * (1320 + kodi.spawn_delay + kodi.start_delay))
+
+    # Both players saw every end, yet each one caused a single open and a
+    # single history entry.
+    assert len(kodi.opened) == episodes + 1
+    plays = len(db.get_history("A")) + len(db.get_history("B"))
+    assert plays == len(kodi.opened)
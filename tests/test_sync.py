@@ -0,0 +1,95 @@
+import os
+import sys
+from pathlib import Path
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, db, sync
+
+
+class Boxes:
+    """Switch the database between several simulated boxes."""
+
+    def __init__(self, tmp_path, monkeypatch):
+        self.tmp_path = tmp_path
+        self.monkeypatch = monkeypatch
+        self.folder = str(tmp_path / "shared")
+
+    def use(self, name):
+        root = self.tmp_path / name
+        self.monkeypatch.setattr(config, "_resolve", lambda p: root / Path(p).name)
+
+
+def test_boxes_converge_on_the_same_history(tmp_path, monkeypatch):
+    boxes = Boxes(tmp_path, monkeypatch)
+    boxes.use("a")
+    db.update_history("A", "a1")
+    db.update_history("A", "a2")
+    db.update_history("B", "b1")
+    assert sync.publish(boxes.folder) == 3
+    boxes.use("b")
+    db.update_history("A", "a3")
+    db.remove_last_history("A")
+    db.update_history("A", "a4")
+    assert sync.publish(boxes.folder) == 4
+    assert sync.pull(boxes.folder) == 3
+    history_b = db.get_history("A")
+    boxes.use("a")
+    assert sync.pull(boxes.folder) == 4
+    assert db.get_history("A") == history_b
+    assert sorted(history_b) == ["a1", "a2", "a4"]
+    stats = {s.key: s for s in db.episode_stats("A")}
+    assert stats["a3"].plays == 0 and stats["a3"].failures == 1
+    assert db.get_history("B") == ["b1"]
+
+
+def test_pull_reads_only_new_segments(tmp_path, monkeypatch):
+    boxes = Boxes(tmp_path, monkeypatch)
+    boxes.use("a")
+    db.update_history("A", "a1")
+    sync.publish(boxes.folder)
+    device = db.device_id()
+    boxes.use("b")
+    assert sync.pull(boxes.folder) == 1
+    # Applied segments are never read again.
+    first = os.listdir(os.path.join(boxes.folder, device))[0]
+    os.remove(os.path.join(boxes.folder, device, first))
+    assert sync.pull(boxes.folder) == 0
+    boxes.use("a")
+    assert sync.publish(boxes.folder) == 0
+    db.update_history("A", "a2")
+    sync.publish(boxes.folder)
+    boxes.use("b")
+    assert sync.pull(boxes.folder) == 1
+    assert db.get_history("A") == ["a1", "a2"]
+
+
+def test_pull_waits_for_missing_segments(tmp_path, monkeypatch):
+    boxes = Boxes(tmp_path, monkeypatch)
+    boxes.use("a")
+    db.update_history("A", "a1")
+    sync.publish(boxes.folder)
+    db.update_history("A", "a2")
+    sync.publish(boxes.folder)
+    device = db.device_id()
+    target = Path(boxes.folder) / device
+    first, second = sorted(os.listdir(target))
+    held = (target / first).read_bytes()
+    (target / first).unlink()
+    boxes.use("b")
+    assert sync.pull(boxes.folder) == 0
+    (target / first).write_bytes(held)
+    assert sync.pull(boxes.folder) == 2
+    assert db.get_history("A") == ["a1", "a2"]
+
+
+def test_change_log_is_pruned_without_publishing(tmp_path, monkeypatch):
+    Boxes(tmp_path, monkeypatch).use("a")
+    for i in range(5):
+        db.update_history("A", f"a{i}")
+    assert db.prune_changes(2) == 3
+    assert [c.episode for c in db.pending_changes()] == ["a3", "a4"]
+    assert db.prune_changes() == 2
+    assert db.pending_changes() == []
+    assert db.get_history("A") == [f"a{i}" for i in range(5)]
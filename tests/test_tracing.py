@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+
+from one_tap import config, db, tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "_resolve", lambda p: tmp_path / Path(p).name)
+    monkeypatch.setattr(db, "DB_PATH", "history.db")
+    monkeypatch.setattr(tracing, "_pending", [])
+    monkeypatch.setattr(tracing, "_tap_id", "")
+    return tmp_path / "trace.bin"
+
+
+def test_spans_require_a_tap_id(trace_file):
+    with tracing.span("config_load"):
+        pass
+    db.update_history("show", "ep1")
+    tracing.flush()
+
+    assert not trace_file.exists()
+
+
+def test_spans_are_correlated_by_tap_id(trace_file):
+    tracing.set_tap_id("tap1")
+    with tracing.span("config_load"):
+        pass
+    db.update_history("show", "ep1")
+    db.get_history("show")
+    tracing.record("playback_started", 0.0, 1.5, tap_id="tap1")
+    tracing.flush()
+
+    spans = tracing.read_spans()
+    assert [s.stage for s in spans] == [
+        "config_load",
+        "db_write",
+        "db_read",
+        "playback_started",
+    ]
+    assert {s.tap_id for s in spans} == {"tap1"}
+
+
+def test_ring_buffer_keeps_latest_records(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "CAPACITY", 10)
+    for i in range(25):
+        tracing.record("play_file", float(i), i / 100, tap_id=f"tap{i}")
+        if i % 7 == 0:
+            tracing.flush()
+    tracing.flush()
+
+    spans = tracing.read_spans()
+    assert [s.tap_id for s in spans] == [f"tap{i}" for i in range(15, 25)]
+    assert trace_file.stat().st_size == 8 + 10 * 56
+
+
+def test_stage_percentiles():
+    spans = [tracing.Span("t", "play_file", 0.0, i / 100) for i in range(1, 101)]
+
+    report = tracing.stage_percentiles(spans)
+
+    assert report["play_file"]["count"] == 100
+    assert report["play_file"]["p50"] == pytest.approx(0.50)
+    assert report["play_file"]["p95"] == pytest.approx(0.95)
+    assert report["play_file"]["p99"] == pytest.approx(0.99)
@@ -0,0 +1,4 @@
+"""Fake Kodi runtime for end-to-end simulation of the One-Tap add-ons."""
+from .runtime import FakeKodi, FakeVFS, FakeVideoLibrary, MediaFile, VirtualClock
+
+__all__ = ["FakeKodi", "FakeVFS", "FakeVideoLibrary", "MediaFile", "VirtualClock"]
@@ -0,0 +1,673 @@
+"""In-process stand-in for the Kodi Python API.
+
+:class:`FakeKodi` builds ``xbmc``, ``xbmcgui``, ``xbmcvfs`` and ``xbmcaddon``
+modules sharing one simulated runtime:
+
+* a :class:`VirtualClock` and an event queue, so hours of playback run in
+  milliseconds;
+* a simulated player which fires ``onPlayBackStarted``, ``onAVStarted``,
+  ``onPlayBackEnded``, ``onPlayBackStopped`` and ``onPlayBackError`` on
+  every :class:`xbmc.Player` instance, like Kodi does;
+* an in-memory ``executeJSONRPC`` with pluggable method handlers;
+* a fake VFS with per-call latency charged to the virtual clock;
+* a fake video library answering ``VideoLibrary.GetEpisodes`` and
+  ``VideoLibrary.GetEpisodeDetails``;
+* ``RunScript``/``RunPlugin`` builtins dispatched to registered entry
+  points after a configurable spawn delay.
+
+Profile paths (``special://profile/...``) are translated into a real
+directory so the SQLite and JSON state used by the add-ons works unchanged.
+"""
+from __future__ import annotations
+
+import heapq
+import importlib.util
+import itertools
+import json
+import re
+import sys
+import types
+import urllib.parse
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+MODULE_NAMES = ("xbmc", "xbmcgui", "xbmcvfs", "xbmcaddon")
+
+LOGDEBUG, LOGINFO, LOGWARNING, LOGERROR, LOGFATAL = range(5)
+
+PLAYER_CALLBACKS = (
+    "onPlayBackStarted",
+    "onAVStarted",
+    "onPlayBackEnded",
+    "onPlayBackStopped",
+    "onPlayBackError",
+)
+
+
+class VirtualClock:
+    """Monotonic simulated time in seconds."""
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += max(seconds, 0.0)
+
+
+@dataclass
+class MediaFile:
+    """A file known to the fake VFS."""
+
+    size: int = 0
+    mtime: float = 0.0
+    duration: float = 1320.0
+    broken: bool = False
+    data: Optional[bytes] = None
+
+    def content(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        return b"\0" * self.size
+
+
+class FakeVFS:
+    """Flat in-memory file tree addressed by Kodi style paths."""
+
+    def __init__(self, clock: VirtualClock) -> None:
+        self.clock = clock
+        self.files: Dict[str, MediaFile] = {}
+        self.latency = 0.0
+        self.share_latency: Dict[str, float] = {}
+        # Path prefixes of shares that are switched off.
+        self.offline: Set[str] = set()
+        self.calls = 0
+
+    def add(self, path: str, **kwargs: Any) -> MediaFile:
+        media = MediaFile(**kwargs)
+        self.files[path] = media
+        return media
+
+    def add_show(self, folder: str, count: int, ext: str = ".mkv", **kwargs: Any) -> List[str]:
+        """Add ``count`` episodes to ``folder`` and return their paths."""
+
+        paths = [f"{folder.rstrip('/')}/S01E{i:04d}{ext}" for i in range(1, count + 1)]
+        for path in paths:
+            self.add(path, **kwargs)
+        return paths
+
+    def charge(self, path: str) -> None:
+        """Advance the clock by the latency configured for ``path``."""
+
+        self.calls += 1
+        latency = self.latency
+        for prefix, value in self.share_latency.items():
+            if path.startswith(prefix):
+                latency = value
+        self.clock.advance(latency)
+
+    def is_offline(self, path: str) -> bool:
+        return any(path.startswith(prefix) for prefix in self.offline)
+
+    def listdir(self, path: str) -> Tuple[List[str], List[str]]:
+        self.charge(path)
+        if self.is_offline(path):
+            raise OSError(f"Host is down: {path}")
+        prefix = path.rstrip("/") + "/"
+        dirs, files = set(), []
+        for name in self.files:
+            if not name.startswith(prefix):
+                continue
+            rest = name[len(prefix):]
+            if "/" in rest:
+                dirs.add(rest.split("/", 1)[0])
+            else:
+                files.append(rest)
+        return sorted(dirs), files
+
+
+class FakeVideoLibrary:
+    """Scraped TV show episodes served through the video library JSON-RPC API."""
+
+    def __init__(self) -> None:
+        self.episodes: Dict[int, Dict[str, Any]] = {}
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+        self._ids = itertools.count(1)
+
+    def add(self, tvshowid: int, file: str, season: int, episode: int,
+            dateadded: str = "2024-01-01 00:00:00") -> int:
+        episodeid = next(self._ids)
+        self.episodes[episodeid] = {
+            "episodeid": episodeid,
+            "tvshowid": tvshowid,
+            "label": f"{season}x{episode:02d}",
+            "file": file,
+            "season": season,
+            "episode": episode,
+            "dateadded": dateadded,
+            "lastmodified": dateadded,
+            "plot": "x" * 200,
+        }
+        return episodeid
+
+    def add_show(self, tvshowid: int, folder: str, count: int,
+                 dateadded: str = "2024-01-01 00:00:00") -> List[int]:
+        """Add ``count`` episodes, 100 per season, and return their ids."""
+
+        return [
+            self.add(tvshowid, f"{folder}/S{i // 100 + 1:02d}E{i % 100 + 1:02d}.mkv",
+                     i // 100 + 1, i % 100 + 1, dateadded)
+            for i in range(count)
+        ]
+
+    @staticmethod
+    def _matches(episode: Dict[str, Any], rule: Optional[Dict[str, Any]]) -> bool:
+        if not rule:
+            return True
+        if "and" in rule:
+            return all(FakeVideoLibrary._matches(episode, r) for r in rule["and"])
+        if "or" in rule:
+            return any(FakeVideoLibrary._matches(episode, r) for r in rule["or"])
+        value = str(episode.get(rule["field"], ""))
+        if rule["operator"] == "after":
+            return value > rule["value"]
+        if rule["operator"] == "is":
+            return value == rule["value"]
+        raise ValueError(f"unsupported filter {rule!r}")
+
+    def _project(self, episode: Dict[str, Any], properties: List[str]) -> Dict[str, Any]:
+        item = {"episodeid": episode["episodeid"], "label": episode["label"]}
+        for name in properties:
+            item[name] = episode[name]
+        return item
+
+    def get_episodes(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls.append(("VideoLibrary.GetEpisodes", params))
+        found = [
+            e for e in self.episodes.values()
+            if ("tvshowid" not in params or e["tvshowid"] == params["tvshowid"])
+            and self._matches(e, params.get("filter"))
+        ]
+        method = (params.get("sort") or {}).get("method")
+        if method == "episode":
+            found.sort(key=lambda e: (e["season"], e["episode"]))
+        elif method:
+            found.sort(key=lambda e: e[method])
+        limits = params.get("limits") or {}
+        start = limits.get("start", 0)
+        end = limits.get("end", -1)
+        page = found[start:] if end < 0 else found[start:end]
+        properties = params.get("properties") or []
+        result: Dict[str, Any] = {
+            "limits": {"start": start, "end": start + len(page), "total": len(found)}
+        }
+        if page:  # Kodi leaves the key out of empty results
+            result["episodes"] = [self._project(e, properties) for e in page]
+        return result
+
+    def get_episode_details(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls.append(("VideoLibrary.GetEpisodeDetails", params))
+        episode = self.episodes.get(params["episodeid"])
+        if episode is None:
+            raise ValueError("Invalid params.")
+        return {"episodedetails": self._project(episode, params.get("properties") or [])}
+
+
+class FakeKodi:
+    """A simulated Kodi instance exposing fake API modules."""
+
+    def __init__(self, profile_dir: Path, spawn_delay: float = 0.5, start_delay: float = 1.0) -> None:
+        self.profile_dir = Path(profile_dir)
+        self.clock = VirtualClock()
+        self.vfs = FakeVFS(self.clock)
+        self.library = FakeVideoLibrary()
+        self.spawn_delay = spawn_delay
+        self.start_delay = start_delay
+        self.windows: Dict[int, Dict[str, str]] = {}
+        self.settings: Dict[str, Dict[str, str]] = {}
+        self.log_lines: List[Tuple[str, int]] = []
+        self.builtins: List[str] = []
+        self.notifications: List[Tuple[str, str, Any]] = []
+        # Answers returned by dialogs in turn; once used up they are cancelled.
+        self.dialog_answers: List[Any] = []
+        self.jsonrpc_handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "Player.Open": self._rpc_player_open,
+            "Player.Stop": lambda params: self.stop() or "OK",
+            "JSONRPC.NotifyAll": self._rpc_notify_all,
+            "VideoLibrary.GetEpisodes": self.library.get_episodes,
+            "VideoLibrary.GetEpisodeDetails": self.library.get_episode_details,
+        }
+        self.scripts: Dict[str, Callable[[], Any]] = {}
+        self.players: List[Any] = []
+        self.monitors: List[Any] = []
+        # With ``simulate_playback`` off ``Player.Open`` only records the file
+        # and events are supplied through :meth:`inject`, as during replay.
+        self.simulate_playback = True
+        self.opened: List[str] = []
+        self.playing: Optional[str] = None
+        self.position_base = 0.0
+        self.started_at = 0.0
+        self.abort_at: Optional[float] = None
+        self._aborted = False
+        self._events: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._generation = 0
+        self.modules = self._build_modules()
+
+    # -- event loop -------------------------------------------------------
+    def schedule(self, delay: float, callback: Callable[[], None]) -> None:
+        heapq.heappush(self._events, (self.clock.now + delay, next(self._seq), callback))
+
+    def run_until(self, until: float) -> None:
+        """Process events due up to ``until`` and move the clock there."""
+
+        while self._events and self._events[0][0] <= until:
+            when, _seq, callback = heapq.heappop(self._events)
+            self.clock.now = max(self.clock.now, when)
+            callback()
+        self.clock.now = max(self.clock.now, until)
+
+    def advance(self, seconds: float) -> None:
+        self.run_until(self.clock.now + seconds)
+
+    def request_abort(self) -> None:
+        self._aborted = True
+
+    def aborted(self) -> bool:
+        if self.abort_at is not None and self.clock.now >= self.abort_at:
+            self._aborted = True
+        return self._aborted
+
+    # -- player -----------------------------------------------------------
+    def _fire(self, callback: str) -> None:
+        for player in list(self.players):
+            getattr(player, callback)()
+
+    def play(self, path: str, offset: float = 0.0) -> None:
+        """Start ``path`` ``offset`` seconds in, replacing whatever is playing."""
+
+        self.opened.append(path)
+        if not self.simulate_playback:
+            return
+        if self.playing:
+            self.playing = None
+            self._generation += 1
+            self._fire("onPlayBackStopped")
+        self._generation += 1
+        generation = self._generation
+        media = self.vfs.files.get(path)
+
+        def started() -> None:
+            if generation != self._generation:
+                return
+            if media is None or media.broken or self.vfs.is_offline(path):
+                self._generation += 1
+                self._fire("onPlayBackError")
+                return
+            self.playing = path
+            self.position_base = offset
+            self.started_at = self.clock.now
+            self._fire("onPlayBackStarted")
+            self._fire("onAVStarted")
+            self.schedule(max(media.duration - offset, 0.0), ended)
+
+        def ended() -> None:
+            if generation != self._generation:
+                return
+            self.playing = None
+            self._generation += 1
+            self._fire("onPlayBackEnded")
+
+        self.schedule(self.start_delay, started)
+
+    def inject(self, event: str, path: str = "") -> None:
+        """Fire a recorded player ``event`` (started/ended/stopped/error)."""
+
+        self._generation += 1
+        if event == "started":
+            self.playing = path or None
+            self.position_base = 0.0
+            self.started_at = self.clock.now
+            self._fire("onPlayBackStarted")
+            self._fire("onAVStarted")
+            return
+        self.playing = None
+        callback = {
+            "ended": "onPlayBackEnded",
+            "stopped": "onPlayBackStopped",
+            "error": "onPlayBackError",
+        }.get(event)
+        if callback:
+            self._fire(callback)
+
+    def stop(self) -> None:
+        if self.playing:
+            self.playing = None
+            self._generation += 1
+            self._fire("onPlayBackStopped")
+
+    def position(self) -> float:
+        if not self.playing:
+            return 0.0
+        return self.position_base + self.clock.now - self.started_at
+
+    # -- JSON-RPC ---------------------------------------------------------
+    def _rpc_player_open(self, params: Dict[str, Any]) -> str:
+        resume = (params.get("options") or {}).get("resume") or {}
+        offset = 0.0
+        if isinstance(resume, dict):
+            offset = (
+                resume.get("hours", 0) * 3600
+                + resume.get("minutes", 0) * 60
+                + resume.get("seconds", 0)
+                + resume.get("milliseconds", 0) / 1000.0
+            )
+        self.play(params["item"]["file"], offset)
+        return "OK"
+
+    def _rpc_notify_all(self, params: Dict[str, Any]) -> str:
+        sender = params.get("sender", "")
+        method = f"Other.{params.get('message', '')}"
+        data = json.dumps(params.get("data"))
+        self.notify(sender, method, data)
+        return "OK"
+
+    def notify(self, sender: str, method: str, data: str) -> None:
+        """Deliver a notification to every monitor."""
+
+        self.notifications.append((sender, method, data))
+        for monitor in list(self.monitors):
+            monitor.onNotification(sender, method, data)
+
+    def execute_jsonrpc(self, request: str) -> str:
+        req = json.loads(request)
+        handler = self.jsonrpc_handlers.get(req.get("method"))
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": req.get("id")}
+        if handler is None:
+            response["error"] = {"code": -32601, "message": "Method not found."}
+        else:
+            try:
+                response["result"] = handler(req.get("params") or {})
+            except Exception as exc:  # mirror Kodi reporting handler errors
+                response["error"] = {"code": -32602, "message": str(exc)}
+        return json.dumps(response)
+
+    # -- builtins ---------------------------------------------------------
+    def register_script(self, addon_id: str, entry: Callable[[], Any]) -> None:
+        """Run ``entry`` for ``RunScript``/``RunPlugin`` of ``addon_id``."""
+
+        self.scripts[addon_id] = entry
+
+    def execute_builtin(self, command: str) -> None:
+        self.builtins.append(command)
+        match = re.match(r"Run(Script|Plugin)\((.*)\)$", command.strip())
+        if not match:
+            return
+        kind, body = match.groups()
+        if kind == "Plugin":
+            url = body.strip().strip('"')
+            parts = urllib.parse.urlsplit(url)
+            addon_id = parts.netloc
+            argv = [url, "-1", f"?{parts.query}"]
+        else:
+            args = [a.strip() for a in body.split(",")]
+            addon_id = args[0]
+            argv = [addon_id, *args[1:]]
+        entry = self.scripts.get(addon_id)
+        if entry is None:
+            return
+
+        def spawn() -> None:
+            saved = sys.argv
+            sys.argv = argv
+            try:
+                entry()
+            finally:
+                sys.argv = saved
+
+        self.schedule(self.spawn_delay, spawn)
+
+    # -- paths ------------------------------------------------------------
+    def translate_path(self, path: str) -> str:
+        if path.startswith("special://profile/"):
+            return str(self.profile_dir / path[len("special://profile/"):])
+        if path.startswith("special://"):
+            return str(self.profile_dir / path[len("special://"):])
+        return path
+
+    # -- module construction ----------------------------------------------
+    def _build_modules(self) -> Dict[str, types.ModuleType]:
+        kodi = self
+
+        xbmc = types.ModuleType("xbmc")
+        xbmc.LOGDEBUG, xbmc.LOGINFO, xbmc.LOGWARNING = LOGDEBUG, LOGINFO, LOGWARNING
+        xbmc.LOGERROR, xbmc.LOGFATAL = LOGERROR, LOGFATAL
+        xbmc.log = lambda msg, level=LOGDEBUG: kodi.log_lines.append((msg, level))
+        xbmc.executebuiltin = lambda command, wait=False: kodi.execute_builtin(command)
+        xbmc.executeJSONRPC = kodi.execute_jsonrpc
+        xbmc.sleep = lambda ms: kodi.advance(ms / 1000.0)
+        xbmc.getCondVisibility = lambda condition: False
+        xbmc.getInfoLabel = lambda label: ""
+
+        class Player:
+            def __init__(self) -> None:
+                kodi.players.append(self)
+
+            def play(self, item: Any = None, *args: Any, **kwargs: Any) -> None:
+                kodi.play(item)
+
+            def stop(self) -> None:
+                kodi.stop()
+
+            def isPlaying(self) -> bool:
+                return kodi.playing is not None
+
+            isPlayingVideo = isPlaying
+
+            def getPlayingFile(self) -> str:
+                if kodi.playing is None:
+                    raise RuntimeError("Kodi is not playing any file")
+                return kodi.playing
+
+            def getTime(self) -> float:
+                if kodi.playing is None:
+                    raise RuntimeError("Kodi is not playing any media file")
+                return kodi.position()
+
+            def getTotalTime(self) -> float:
+                if kodi.playing is None:
+                    raise RuntimeError("Kodi is not playing any media file")
+                return kodi.vfs.files[kodi.playing].duration
+
+            def seekTime(self, seconds: float) -> None:
+                kodi.position_base = seconds
+                kodi.started_at = kodi.clock.now
+
+        for name in PLAYER_CALLBACKS:
+            setattr(Player, name, lambda self: None)
+
+        class Monitor:
+            def __init__(self) -> None:
+                kodi.monitors.append(self)
+
+            def abortRequested(self) -> bool:
+                return kodi.aborted()
+
+            def waitForAbort(self, timeout: float = 0) -> bool:
+                if kodi.aborted():
+                    return True
+                target = kodi.clock.now + (timeout or 0)
+                if kodi.abort_at is not None:
+                    target = min(target, kodi.abort_at)
+                kodi.run_until(target)
+                return kodi.aborted()
+
+            def onNotification(self, sender: str, method: str, data: str) -> None:
+                pass
+
+        xbmc.Player = Player
+        xbmc.Monitor = Monitor
+
+        xbmcgui = types.ModuleType("xbmcgui")
+
+        class Window:
+            def __init__(self, window_id: int = 10000) -> None:
+                self._props = kodi.windows.setdefault(window_id, {})
+
+            def getProperty(self, key: str) -> str:
+                return self._props.get(key.lower(), "")
+
+            def setProperty(self, key: str, value: str) -> None:
+                self._props[key.lower()] = value
+
+            def clearProperty(self, key: str) -> None:
+                self._props.pop(key.lower(), None)
+
+        class Dialog:
+            def __init__(self) -> None:
+                pass
+
+            def notification(self, *args: Any, **kwargs: Any) -> None:
+                kodi.log_lines.append((f"notification: {args}", LOGINFO))
+
+            def textviewer(self, heading: str, text: str, *args: Any) -> None:
+                kodi.log_lines.append((f"textviewer: {heading}", LOGINFO))
+
+            def select(self, heading: str, options: List[str], *args: Any) -> int:
+                return kodi.dialog_answers.pop(0) if kodi.dialog_answers else -1
+
+            def input(self, heading: str, *args: Any, **kwargs: Any) -> str:
+                return kodi.dialog_answers.pop(0) if kodi.dialog_answers else ""
+
+            def numeric(self, kind: int, heading: str, *args: Any) -> str:
+                return kodi.dialog_answers.pop(0) if kodi.dialog_answers else ""
+
+        xbmcgui.Window = Window
+        xbmcgui.Dialog = Dialog
+
+        xbmcvfs = types.ModuleType("xbmcvfs")
+
+        class File:
+            def __init__(self, path: str, mode: str = "r") -> None:
+                kodi.vfs.charge(path)
+                media = kodi.vfs.files.get(path)
+                if media is None:
+                    raise OSError(f"No such file: {path}")
+                self._data = media.content()
+                self._pos = 0
+
+            def readBytes(self, count: int = 0) -> bytearray:
+                end = len(self._data) if count <= 0 else self._pos + count
+                chunk = self._data[self._pos:end]
+                self._pos += len(chunk)
+                return bytearray(chunk)
+
+            def seek(self, offset: int, whence: int = 0) -> int:
+                base = {0: 0, 1: self._pos, 2: len(self._data)}[whence]
+                self._pos = max(0, base + offset)
+                return self._pos
+
+            def size(self) -> int:
+                return len(self._data)
+
+            def close(self) -> None:
+                pass
+
+        class Stat:
+            def __init__(self, path: str) -> None:
+                kodi.vfs.charge(path)
+                media = kodi.vfs.files.get(path)
+                if media is None:
+                    raise OSError(f"No such file: {path}")
+                self._media = media
+
+            def st_size(self) -> int:
+                return self._media.size
+
+            def st_mtime(self) -> float:
+                return self._media.mtime
+
+        xbmcvfs.File = File
+        xbmcvfs.Stat = Stat
+        xbmcvfs.listdir = kodi.vfs.listdir
+        xbmcvfs.exists = lambda path: path in kodi.vfs.files or Path(kodi.translate_path(path)).exists()
+        xbmcvfs.translatePath = kodi.translate_path
+
+        xbmcaddon = types.ModuleType("xbmcaddon")
+
+        class Addon:
+            def __init__(self, addon_id: str = "plugin.one_tap.play") -> None:
+                self._settings = kodi.settings.setdefault(addon_id, {})
+                self._id = addon_id
+
+            def getSetting(self, key: str) -> str:
+                return self._settings.get(key, "")
+
+            def setSetting(self, key: str, value: str) -> None:
+                self._settings[key] = value
+
+            def getAddonInfo(self, key: str) -> str:
+                return {"id": self._id, "profile": f"special://profile/addon_data/{self._id}/"}.get(key, "")
+
+        xbmcaddon.Addon = Addon
+
+        return {"xbmc": xbmc, "xbmcgui": xbmcgui, "xbmcvfs": xbmcvfs, "xbmcaddon": xbmcaddon}
+
+    # -- installation -----------------------------------------------------
+    @contextmanager
+    def installed(self) -> Iterator["FakeKodi"]:
+        """Expose the fake modules to code importing or already holding them.
+
+        ``one_tap`` modules bind ``xbmc``/``xbmcvfs``/``xbmcgui`` at import
+        time, so module globals of that name in already imported ``one_tap``
+        modules are swapped as well and restored afterwards.
+        """
+
+        saved_modules = {name: sys.modules.get(name) for name in MODULE_NAMES}
+        originals: Dict[Tuple[str, str], Any] = {}
+        sys.modules.update(self.modules)
+        for mod_name, module in self._one_tap_modules():
+            for name in MODULE_NAMES:
+                if name in vars(module):
+                    originals[(mod_name, name)] = getattr(module, name)
+                    setattr(module, name, self.modules[name])
+        try:
+            yield self
+        finally:
+            # Modules imported while installed bound the fakes too; return
+            # them to what a plain import outside Kodi would have produced.
+            fakes = {id(m): name for name, m in self.modules.items()}
+            for mod_name, module in self._one_tap_modules():
+                for name in MODULE_NAMES:
+                    value = vars(module).get(name)
+                    if value is not None and id(value) in fakes:
+                        setattr(module, name, originals.get((mod_name, name), saved_modules[name]))
+            for name, module in saved_modules.items():
+                if module is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = module
+
+    @staticmethod
+    def _one_tap_modules() -> List[Tuple[str, types.ModuleType]]:
+        return [
+            (name, module)
+            for name, module in list(sys.modules.items())
+            if module is not None and (name == "one_tap" or name.startswith("one_tap."))
+        ]
+
+    def load_addon(self, path: Path, module_name: str) -> types.ModuleType:
+        """Import an add-on entry script from ``path`` under ``module_name``.
+
+        The fake modules must be installed so the script binds to them.
+        """
+
+        spec = importlib.util.spec_from_file_location(module_name, str(path))
+        module = importlib.util.module_from_spec(spec)
+        assert spec.loader is not None
+        spec.loader.exec_module(module)
+        return module
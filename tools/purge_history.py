@@ -15,12 +15,20 @@ from one_tap import db  # noqa: E402
 def main() -> None:
     parser = argparse.ArgumentParser(description="Remove playback history")
     parser.add_argument("show_id", nargs="?", help="Optional show ID to purge")
+    parser.add_argument(
+        "--older-than",
+        type=float,
+        metavar="DAYS",
+        help="Only remove entries played more than DAYS days ago",
+    )
     args = parser.parse_args()
+    target = f"for {args.show_id}" if args.show_id else "for all shows"
+    if args.older_than is not None:
+        removed = db.purge_older_than(args.older_than, args.show_id)
+        print(f"Purged {removed} entries older than {args.older_than:g} days {target}")
+        return
     db.purge_history(args.show_id)
-    if args.show_id:
-        print(f"Purged history for {args.show_id}")
-    else:
-        print("Purged history for all shows")
+    print(f"Purged history {target}")
 
 
 if __name__ == "__main__":
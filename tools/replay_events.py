@@ -0,0 +1,148 @@
+"""Replay a recorded player event trace through the real add-on code.
+
+Recordings are written by ``one_tap.eventtrace`` when
+``diagnostics.record_events`` is enabled.  The replay loads the playback
+controller and the randomizer service into a fake Kodi runtime whose player
+only reports what is injected, so every tap and player callback runs the
+real selection and history code at full speed::
+
+    python tools/replay_events.py events.tsv --config config.json
+
+The report lists selection decisions per second, history writes per event
+and the time from an ``ended``/``error`` event to the next ``Player.Open``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Ensure the one_tap package is importable when running from the repo root
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(repo_root / "addons" / "script.module.one_tap" / "lib"))
+sys.path.append(str(repo_root))
+
+from one_tap import config, db, eventtrace, selection  # noqa: E402
+from tools.fake_kodi import FakeKodi  # noqa: E402
+
+ADDONS = repo_root / "addons"
+ADVANCE_EVENTS = {"ended", "error"}
+# Controller invocations; only taps are replayed, advances are re-derived
+# from the player events by the service.
+INVOCATIONS = {"tap", "advance", "tap_ignored"}
+
+
+def _player_source(events: List[eventtrace.Event]) -> str:
+    """Pick one recording source so events seen by both players count once."""
+
+    sources = {e.source for e in events if e.event not in INVOCATIONS}
+    return "service" if "service" in sources or not sources else sorted(sources)[0]
+
+
+def replay(
+    events: List[eventtrace.Event], cfg: Dict[str, Any], profile_dir: Path
+) -> Dict[str, float]:
+    """Feed ``events`` through the add-ons and return replay statistics."""
+
+    kodi = FakeKodi(profile_dir, spawn_delay=0.0, start_delay=0.0)
+    kodi.simulate_playback = False
+    source = _player_source(events)
+    events = [
+        e
+        for e in events
+        if e.event == "tap" or (e.event not in INVOCATIONS and e.source == source)
+    ]
+    counts = {"decisions": 0, "db_writes": 0}
+    originals = {
+        (selection, "episode_candidates"): selection.episode_candidates,
+        (db, "update_history"): db.update_history,
+        (db, "remove_last_history"): db.remove_last_history,
+    }
+
+    def counting(func, key):
+        def wrapper(*args, **kwargs):
+            counts[key] += 1
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    with kodi.installed():
+        # Recorded taps already passed the debounce window in the field.
+        ui = dict(cfg.get("ui", {}), tap_debounce_seconds=0)
+        cfg = dict(cfg, ui=ui, diagnostics={"record_events": False})
+        config.save_config(cfg)
+        for event in events:
+            if event.event not in INVOCATIONS and event.detail:
+                kodi.vfs.add(event.detail)
+        plugin = kodi.load_addon(ADDONS / "plugin.one_tap.play" / "default.py", "replay_plugin")
+        service = kodi.load_addon(ADDONS / "service.one_tap.random" / "service.py", "replay_service")
+        kodi.register_script("plugin.one_tap.play", plugin.main)
+        service.AutoAdvancePlayer()
+
+        for (module, name), func in originals.items():
+            key = "decisions" if module is selection else "db_writes"
+            setattr(module, name, counting(func, key))
+        latencies: List[float] = []
+        busy = 0.0
+        try:
+            base = events[0].time if events else 0.0
+            for event in events:
+                kodi.run_until(event.time - base)
+                opened = len(kodi.opened)
+                start = time.perf_counter()
+                if event.event == "tap":
+                    kodi.execute_builtin(f"RunScript(plugin.one_tap.play,show_id={event.detail})")
+                else:
+                    kodi.inject(event.event, event.detail)
+                kodi.run_until(kodi.clock.now)
+                elapsed = time.perf_counter() - start
+                busy += elapsed
+                if event.event in ADVANCE_EVENTS and len(kodi.opened) > opened:
+                    latencies.append(elapsed)
+        finally:
+            for (module, name), func in originals.items():
+                setattr(module, name, func)
+
+    player_events = sum(1 for e in events if e.event != "tap")
+    latencies.sort()
+    return {
+        "events": len(events),
+        "player_events": player_events,
+        "decisions": counts["decisions"],
+        "db_writes": counts["db_writes"],
+        "opens": len(kodi.opened),
+        "decisions_per_second": counts["decisions"] / busy if busy else 0.0,
+        "db_writes_per_event": counts["db_writes"] / player_events if player_events else 0.0,
+        "advance_latency_p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "advance_latency_max_ms": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a player event recording")
+    parser.add_argument("trace", help="Recording written by one_tap.eventtrace")
+    parser.add_argument("--config", help="Caregiver configuration JSON (default: current)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.config:
+        cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    else:
+        cfg = config.load_config()
+    events = eventtrace.load(Path(args.trace))
+    with tempfile.TemporaryDirectory() as tmp:
+        report = replay(events, cfg, Path(tmp))
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return
+    for key, value in report.items():
+        print(f"{key:26} {value:.3f}" if isinstance(value, float) else f"{key:26} {value}")
+
+
+if __name__ == "__main__":
+    main()